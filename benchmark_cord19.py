@@ -0,0 +1,629 @@
+################################################################################
+#                                                                              #
+#    CS 7740/8740                                                              #
+#    Fall 2020 - Spring 2021                                                   #
+#                                                                              #
+#    Class Project - Benchmark CORD-19 Corpus Reader                           #
+#    benchmark_cord19.py                                                       #
+#                                                                              #
+#    Started: Alex Morehead                                                    #
+#    2021-4-19                                                                 #
+#                                                                              #
+################################################################################
+
+'''
+Benchmarks for the CORD-19 corpus reader. The benchmarks run on a synthetic
+corpus written to a temporary directory, so the real dataset isn't needed.
+
+Run all the benchmarks with:
+
+python benchmark_cord19.py
+
+Or a single benchmark with, e.g.:
+
+python benchmark_cord19.py metadata --rows 100000
+
+The accessors benchmark times every accessor of the corpus reader on a
+synthetic corpus with metadata.csv and pdf_json/pmc_json parses, and compares
+the times with a stored baseline:
+
+python benchmark_cord19.py accessors --documents 10000 --save-baseline
+python benchmark_cord19.py accessors --documents 10000
+
+'''
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import nltk.data
+
+from nltk.tokenize import PunktSentenceTokenizer, WordPunctTokenizer
+
+import cord19
+from cord19 import CORD19CorpusReader, CORD19Document, CORD19MetadataIndex, CORD19SpanTokenizer
+
+# Peak memory is read from the operating system where it can be.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The columns of metadata.csv in the 2021 releases of CORD-19.
+METADATA_FIELDNAMES = ['cord_uid', 'sha', 'source_x', 'title', 'doi', 'pmcid', 'pubmed_id', 'license',
+                       'abstract', 'publish_time', 'authors', 'journal', 'mag_id', 'who_covidence_id',
+                       'arxiv_id', 'pdf_json_files', 'pmc_json_files', 'url', 's2_id']
+
+# Words used to make up synthetic text.
+VOCABULARY = ['coronavirus', 'patients', 'infection', 'respiratory', 'ACE2', 'receptor', 'binding', 'protein',
+              'the', 'of', 'and', 'in', 'with', 'was', 'were', 'cells', 'viral', 'replication', 'clinical',
+              'outcomes', 'SARS-CoV-2', 'severe', 'disease', 'treatment', 'vaccine', 'antibody', 'response']
+
+
+def synthetic_text(random_generator, word_count):
+    """
+    :return: Some made up sentences with roughly word_count words.
+    :rtype: str
+    """
+
+    words = [random_generator.choice(VOCABULARY) for i in range(word_count)]
+
+    # End a sentence every dozen words or so.
+    for i in range(11, word_count, 12):
+        words[i] += '.'
+
+    return ' '.join(words).capitalize() + '.'
+
+
+def write_synthetic_metadata(path, row_count, seed=0):
+    """
+    Writes a metadata.csv with row_count rows that look like the real ones.
+    About half the papers get a PDF parse, a third a PMC parse, and a few
+    cord_uids appear in more than one row.
+    """
+
+    random_generator = random.Random(seed)
+
+    with open(path, 'w', newline='', encoding='utf8') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=METADATA_FIELDNAMES)
+        csv_writer.writeheader()
+
+        for row_number in range(row_count):
+
+            # Every twentieth row repeats the previous paper's cord_uid.
+            if (row_number % 20 == 19):
+                cord_uid = 'x%07d' % (row_number - 1)
+            else:
+                cord_uid = 'x%07d' % row_number
+
+            sha = '%040x' % random_generator.getrandbits(160) if random_generator.random() < 0.5 else ''
+            pmcid = 'PMC%d' % (7000000 + row_number) if random_generator.random() < 0.33 else ''
+
+            csv_writer.writerow({
+                'cord_uid': cord_uid,
+                'sha': sha,
+                'source_x': random_generator.choice(['PMC', 'Medline', 'Elsevier; Medline; PMC', 'WHO', 'MedRxiv']),
+                'title': synthetic_text(random_generator, 12),
+                'doi': '10.1016/j.x.2020.%06d' % row_number,
+                'pmcid': pmcid,
+                'pubmed_id': str(32000000 + row_number),
+                'license': random_generator.choice(['cc-by', 'cc-by-nc', 'els-covid', 'no-cc', 'unk']),
+                'abstract': synthetic_text(random_generator, random_generator.randint(0, 250)),
+                'publish_time': '2020-%02d-%02d' % (random_generator.randint(1, 12), random_generator.randint(1, 28)),
+                'authors': '; '.join('Author, %d.' % random_generator.randint(0, 50000) for i in range(4)),
+                'journal': random_generator.choice(['Nature', 'Lancet', 'BMJ', 'Virology', 'PLoS One', '']),
+                'mag_id': '',
+                'who_covidence_id': '',
+                'arxiv_id': '',
+                'pdf_json_files': 'document_parses/pdf_json/%s.json' % sha if sha else '',
+                'pmc_json_files': 'document_parses/pmc_json/%s.xml.json' % pmcid if pmcid else '',
+                'url': 'https://doi.org/10.1016/j.x.2020.%06d' % row_number,
+                's2_id': str(random_generator.randint(1, 1 << 30)),
+            })
+
+
+def synthetic_document(random_generator, paper_id):
+    """
+    :return: A made up document parse, shaped like the ones in document_parses,
+        with about as many sections, citations, and figures as a typical paper.
+    :rtype: dict
+    """
+
+    def section(name):
+        text = synthetic_text(random_generator, random_generator.randint(40, 250))
+        return {
+            'text': text,
+            'cite_spans': [
+                {'start': i, 'end': i + 3, 'text': '[%d]' % i, 'ref_id': 'BIBREF%d' % i}
+                for i in range(0, min(len(text) - 3, 200), 40)
+            ],
+            'ref_spans': [],
+            'section': name,
+        }
+
+    def author():
+        return {'first': 'A', 'middle': [], 'last': 'Author%d' % random_generator.randint(0, 50000), 'suffix': ''}
+
+    return {
+        'paper_id': paper_id,
+        'metadata': {'title': synthetic_text(random_generator, 12), 'authors': [author() for i in range(5)]},
+        'abstract': [section('Abstract') for i in range(random_generator.randint(0, 2))],
+        'body_text': [section('Section %d' % i) for i in range(random_generator.randint(5, 60))],
+        'bib_entries': {
+            'BIBREF%d' % i: {
+                'ref_id': 'b%d' % i,
+                'title': synthetic_text(random_generator, 12),
+                'authors': [author() for j in range(4)],
+                'year': random_generator.randint(1990, 2021),
+                'venue': random_generator.choice(['Nature', 'Lancet', 'BMJ', 'Virology']),
+                'volume': str(random_generator.randint(1, 500)),
+                'issn': '',
+                'pages': '%d-%d' % (i, i + 10),
+                'other_ids': {'DOI': ['10.1016/j.x.2020.%06d' % random_generator.randint(0, 999999)]},
+            }
+            for i in range(random_generator.randint(10, 80))
+        },
+        'ref_entries': {
+            'FIGREF%d' % i: {'text': synthetic_text(random_generator, 40), 'latex': None, 'type': 'figure'}
+            for i in range(random_generator.randint(0, 8))
+        },
+        'back_matter': [section('Acknowledgements')],
+    }
+
+
+def write_synthetic_corpus(directory, row_count, seed=0):
+    """
+    Writes a synthetic corpus to directory: a metadata.csv with row_count
+    rows, and a pdf_json or pmc_json parse for every file named in it.
+
+    :return: The number of parse files and their total size in bytes.
+    :rtype: tuple(int, int)
+    """
+
+    metadata_path = os.path.join(directory, 'metadata.csv')
+    write_synthetic_metadata(metadata_path, row_count, seed)
+
+    random_generator = random.Random(seed)
+    file_count = 0
+    total_bytes = 0
+
+    with open(metadata_path, 'r', newline='', encoding='utf8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            for (column, paper_id) in (('pdf_json_files', row['sha']), ('pmc_json_files', row['pmcid'])):
+
+                # Check if the row has a parse of this kind.
+                if (not row[column]):
+                    continue
+
+                path = os.path.join(directory, row[column])
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                with open(path, 'wb') as parse_file:
+                    file_bytes = cord19.json_dumps(synthetic_document(random_generator, paper_id))
+                    parse_file.write(file_bytes)
+
+                file_count += 1
+                total_bytes += len(file_bytes)
+
+    return (file_count, total_bytes)
+
+
+def measure(function):
+    """
+    :return: The result of calling function, the seconds it took, and the
+        bytes of memory still allocated by it when it returned.
+    :rtype: tuple(object, float, int)
+    """
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function()
+    elapsed_time = time.perf_counter() - start_time
+    (allocated_bytes, peak_bytes) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (result, elapsed_time, allocated_bytes)
+
+
+def load_metadata_dictionary(path):
+    """
+    :return: metadata.csv loaded the way metadata(fileids_only = False) used to,
+        as a dictionary of cord_uid to a list of row dictionaries.
+    :rtype: dict(list(dict))
+    """
+
+    metadata_dictionary = defaultdict(list)
+
+    with open(path, 'r', newline='', encoding='utf8') as csv_file:
+        for row in csv.DictReader(csv_file):
+            metadata_dictionary[row['cord_uid']].append(row)
+
+    return metadata_dictionary
+
+
+def benchmark_metadata(arguments):
+    """
+    Compares the memory held by the old dictionary of row dictionaries with
+    the columnar metadata index and its row views.
+    """
+
+    directory = tempfile.mkdtemp()
+
+    try:
+        metadata_path = directory + '/metadata.csv'
+        write_synthetic_metadata(metadata_path, arguments.rows)
+
+        (result, dictionary_time, dictionary_bytes) = measure(lambda: load_metadata_dictionary(metadata_path))
+        del result
+
+        (index, index_time, index_bytes) = measure(lambda: CORD19MetadataIndex.from_csv(metadata_path, 'utf8'))
+
+        # Views over every row, like metadata(fileids_only = False, compact = True) returns.
+        (views, views_time, views_bytes) = measure(
+            lambda: {cord_uid: index.row_views(row_numbers) for (cord_uid, row_numbers) in index.cord_uid_rows.items()})
+
+        print('metadata (%d rows):' % arguments.rows)
+        print('\tdict of row dicts:  %8.1f MB  %6.2f s' % (dictionary_bytes / 1e6, dictionary_time))
+        print('\tcolumnar index:     %8.1f MB  %6.2f s' % (index_bytes / 1e6, index_time))
+        print('\t  + row views:      %8.1f MB  %6.2f s' % (views_bytes / 1e6, views_time))
+        print('\tmemory saved:       %7.1f%%' % (100 * (1 - (index_bytes + views_bytes) / dictionary_bytes)))
+
+    finally:
+        shutil.rmtree(directory)
+
+
+def benchmark_decoding(arguments):
+    """
+    Compares decoding whole document parses with json, like every accessor
+    used to, with decoding just the parts each accessor needs.
+    """
+
+    random_generator = random.Random(0)
+    file_texts = [json.dumps(synthetic_document(random_generator, str(i))) for i in range(arguments.documents)]
+    total_bytes = sum(len(file_text) for file_text in file_texts)
+
+    # The parts of the documents each accessor uses.
+    accessors = [
+        ('raw/words/sents/paras', lambda document: (document.title, document.abstract, document.body_text)),
+        ('citations', lambda document: document.bib_entries),
+        ('title only', lambda document: document.title),
+    ]
+
+    # Time decoding everything, with json and with the reader's backend.
+    start_time = time.perf_counter()
+    for file_text in file_texts:
+        json.loads(file_text)
+    full_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for file_text in file_texts:
+        cord19.json_loads(file_text)
+    backend_time = time.perf_counter() - start_time
+
+    backend = cord19.json_loads.__module__
+
+    print('decoding (%d documents, %.1f MB):' % (arguments.documents, total_bytes / 1e6))
+    print('\t%-22s %8.1f MB  %6.3f s' % ('whole file (json)', total_bytes / 1e6, full_time))
+    print('\t%-22s %8.1f MB  %6.3f s' % ('whole file (%s)' % backend, total_bytes / 1e6, backend_time))
+
+    for (name, accessor) in accessors:
+        decoded_bytes = 0
+
+        start_time = time.perf_counter()
+        for file_text in file_texts:
+            document = CORD19Document(None, file_text)
+            accessor(document)
+            decoded_bytes += sum(end - start for (key, (start, end)) in document._spans.items() if key in document._values)
+        selective_time = time.perf_counter() - start_time
+
+        print('\t%-22s %8.1f MB  %6.3f s  (%.1fx faster)' % (
+            name, decoded_bytes / 1e6, selective_time, full_time / selective_time))
+
+
+def benchmark_tokenization(arguments):
+    """
+    Compares tokenizing every sentence of every section on its own, the way
+    paras() used to, with tokenizing whole documents in one pass.
+    """
+
+    random_generator = random.Random(0)
+    documents = [synthetic_document(random_generator, str(i)) for i in range(arguments.documents)]
+    sections = [
+        [document['metadata']['title']] + [section['text'] for section in document['abstract'] + document['body_text']]
+        for document in documents
+    ]
+
+    # Punkt's default parameters, so the benchmark doesn't need the trained English model.
+    word_tokenizer = WordPunctTokenizer()
+    sent_tokenizer = PunktSentenceTokenizer()
+    span_tokenizer = CORD19SpanTokenizer(word_tokenizer, sent_tokenizer)
+
+    start_time = time.perf_counter()
+    loop_paragraphs = [
+        [[word_tokenizer.tokenize(sentence) for sentence in sent_tokenizer.tokenize(section)] for section in document_sections]
+        for document_sections in sections
+    ]
+    loop_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    span_paragraphs = [span_tokenizer.tokenize(document_sections).paragraphs() for document_sections in sections]
+    span_time = time.perf_counter() - start_time
+
+    # Time finding just the offsets of every token, without making the words.
+    start_time = time.perf_counter()
+    offset_spans = [
+        span_tokenizer.tokenize(document_sections, offsets=True).word_spans() for document_sections in sections
+    ]
+    offset_time = time.perf_counter() - start_time
+
+    # Every way has to give the same words.
+    assert span_paragraphs == loop_paragraphs
+    assert [len(spans) for spans in offset_spans] == [
+        sum(len(sentence) for paragraph in paragraphs for sentence in paragraph) for paragraphs in loop_paragraphs
+    ]
+
+    # Time splitting the sentences on their own, by the sentence tokenizer and by a span tokenizer that
+    # remembers Punkt's decisions, to see how much of the difference comes from each half.
+    sentence_times = []
+    for tokenizer in (sent_tokenizer, CORD19SpanTokenizer(word_tokenizer, sent_tokenizer)._sent_tokenizer):
+        start_time = time.perf_counter()
+        for document_sections in sections:
+            for section in document_sections:
+                list(tokenizer.span_tokenize(section))
+        sentence_times.append(time.perf_counter() - start_time)
+
+    token_count = sum(len(sentence) for paragraphs in loop_paragraphs for paragraph in paragraphs for sentence in paragraph)
+
+    print('tokenization (%d documents, %d tokens):' % (arguments.documents, token_count))
+    print('\tper sentence loop:      %6.3f s  %8.0f tokens/s' % (loop_time, token_count / loop_time))
+    print('\twhole documents:        %6.3f s  %8.0f tokens/s  (%.1fx faster)' % (
+        span_time, token_count / span_time, loop_time / span_time))
+    print('\t  just token offsets:   %6.3f s  %8.0f tokens/s' % (offset_time, token_count / offset_time))
+    print('\tsentence splitting:     %6.3f s -> %6.3f s' % tuple(sentence_times))
+    print('\tword tokenizing:        %6.3f s -> %6.3f s' % (loop_time - sentence_times[0], span_time - sentence_times[1]))
+
+
+def sentence_tokenizer():
+    """
+    :return: The sentence tokenizer for the accessors benchmark: the reader's
+        default, the trained English Punkt model, if it's installed, or else
+        Punkt's default parameters, so the benchmark runs offline.
+    :rtype: PunktSentenceTokenizer
+    """
+
+    try:
+        return nltk.data.load('tokenizers/punkt/english.pickle')
+    except LookupError:
+        return PunktSentenceTokenizer()
+
+
+def count_statistics(reader):
+    """
+    :return: The number of documents, after printing the corpus statistics
+        somewhere they won't be seen.
+    :rtype: int
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader.statistics()
+
+    return len(reader.fileids())
+
+
+# The accessors of the corpus reader the accessors benchmark times, each
+# returning how many items it gave (characters, words, sentences, ...).
+ACCESSORS = {
+    'construction': lambda reader: len(reader.fileids()),
+    'fileids': lambda reader: len(reader.fileids()),
+    'raw': lambda reader: sum(len(reader.raw(fileid)) for fileid in reader.fileids()),
+    'words': lambda reader: sum(1 for word in reader.words()),
+    'sents': lambda reader: sum(1 for sentence in reader.sents()),
+    'paras': lambda reader: sum(1 for paragraph in reader.paras()),
+    'metadata': lambda reader: len(reader.metadata(reader.fileids())),
+    'citations': lambda reader: sum(len(citations) for citations in reader.citations().values()),
+    'statistics': count_statistics,
+}
+
+
+def peak_memory():
+    """
+    :return: The most resident memory this process has used, in bytes, or
+        None if the operating system can't tell.
+    :rtype: int
+    """
+
+    if (resource is None):
+        return None
+
+    # Linux counts in kilobytes, macOS in bytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if (sys.platform == 'darwin') else peak * 1024
+
+
+def time_accessor(root, name):
+    """
+    Makes a corpus reader with an empty cache directory and times one of
+    the ACCESSORS on it. Runs in a spawned process of its own, so the peak
+    memory is just what the reader and the accessor used.
+
+    :return: The seconds the accessor took, how many items it gave, and the peak memory of the process.
+    :rtype: tuple(float, int, int)
+    """
+
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        start_time = time.perf_counter()
+        reader = CORD19CorpusReader(root, r'.*\.json', sent_tokenizer=sentence_tokenizer(), cache_dir=cache_dir)
+        construction_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        item_count = ACCESSORS[name](reader)
+        elapsed_time = time.perf_counter() - start_time
+
+        # Making the reader is the accessor being timed by construction.
+        if (name == 'construction'):
+            elapsed_time = construction_time
+
+        return (elapsed_time, item_count, peak_memory())
+
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def benchmark_accessors(arguments):
+    """
+    Times every accessor of the corpus reader on a synthetic corpus, each in
+    a fresh process with an empty cache, and compares the times and peak
+    memory with a stored baseline.
+
+    :return: The names of the accessors that got slower or bigger than the
+        baseline by more than the tolerance.
+    :rtype: list(str)
+    """
+
+    # Check if a corpus was given that's already been written.
+    directory = arguments.corpus or tempfile.mkdtemp()
+    corpus_info_path = os.path.join(directory, 'synthetic_corpus.json')
+    corpus_info = {'rows': arguments.documents}
+
+    try:
+        # Load what was recorded about a corpus already written there, if any.
+        stored_info = None
+        if (os.path.exists(corpus_info_path)):
+            with open(corpus_info_path) as corpus_info_file:
+                stored_info = json.load(corpus_info_file)
+
+        # Check if it's the same size, so it can be used again.
+        if (stored_info is not None and stored_info.get('rows') == arguments.documents):
+            corpus_info = stored_info
+
+        # Otherwise, write the synthetic corpus.
+        else:
+            os.makedirs(directory, exist_ok=True)
+            start_time = time.perf_counter()
+            (corpus_info['files'], corpus_info['bytes']) = write_synthetic_corpus(directory, arguments.documents)
+            print('wrote %d files (%.1f MB) in %.1f s' % (
+                corpus_info['files'], corpus_info['bytes'] / 1e6, time.perf_counter() - start_time))
+
+            with open(corpus_info_path, 'w') as corpus_info_file:
+                json.dump(corpus_info, corpus_info_file)
+
+        names = arguments.accessors.split(',') if (arguments.accessors) else list(ACCESSORS)
+
+        # Time each accessor in a process of its own. It's spawned rather than forked, since a forked process starts
+        # out with the peak memory of this one.
+        results = {}
+        for name in names:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                (seconds, item_count, peak_bytes) = executor.submit(time_accessor, directory, name).result()
+
+            results[name] = {'seconds': seconds, 'items': item_count, 'peak_rss': peak_bytes}
+
+    finally:
+        if (arguments.corpus is None):
+            shutil.rmtree(directory)
+
+    # Load the baseline, if it's for a corpus of the same size.
+    baseline = {}
+    if (os.path.exists(arguments.baseline)):
+        with open(arguments.baseline) as baseline_file:
+            stored = json.load(baseline_file)
+
+        if (stored.get('rows') == arguments.documents):
+            baseline = stored['results']
+        else:
+            print('baseline %s is for %d rows, not comparing' % (arguments.baseline, stored.get('rows')))
+
+    print('accessors (%d rows, %d files, %.1f MB):' % (arguments.documents, corpus_info['files'], corpus_info['bytes'] / 1e6))
+    print('\t%-13s %9s %10s %8s %12s %10s  %s' % ('accessor', 'seconds', 'files/s', 'MB/s', 'items/s', 'peak RSS', 'vs baseline'))
+
+    regressions = []
+    for (name, result) in results.items():
+        seconds = max(result['seconds'], 1e-9)
+        peak_rss = '%8.1f MB' % (result['peak_rss'] / 1e6) if (result['peak_rss'] is not None) else '       n/a'
+
+        # Compare with the baseline.
+        comparison = ''
+        if (name in baseline):
+            time_ratio = result['seconds'] / max(baseline[name]['seconds'], 1e-9)
+            comparison = '%+6.1f%% time' % (100 * (time_ratio - 1))
+
+            # Accessors taking hundredths of a second vary more than that, so they don't count as regressions.
+            regressed = (time_ratio > 1 + arguments.tolerance and result['seconds'] - baseline[name]['seconds'] > 0.01)
+
+            if (result['peak_rss'] is not None and baseline[name]['peak_rss']):
+                memory_ratio = result['peak_rss'] / baseline[name]['peak_rss']
+                comparison += ' %+6.1f%% memory' % (100 * (memory_ratio - 1))
+                regressed = regressed or memory_ratio > 1 + arguments.tolerance
+
+            if (regressed):
+                comparison += '  REGRESSION'
+                regressions.append(name)
+
+        print('\t%-13s %9.3f %10.0f %8.1f %12.0f %s  %s' % (
+            name, result['seconds'], corpus_info['files'] / seconds, corpus_info['bytes'] / 1e6 / seconds,
+            result['items'] / seconds, peak_rss, comparison))
+
+    # Check whether to store these results as the new baseline.
+    if (arguments.save_baseline):
+        with open(arguments.baseline, 'w') as baseline_file:
+            json.dump({'rows': arguments.documents, 'results': results}, baseline_file, indent=1, sort_keys=True)
+
+        print('saved baseline to %s' % arguments.baseline)
+
+    return regressions
+
+
+# The benchmarks that can be run, by name.
+BENCHMARKS = {
+    'accessors': benchmark_accessors,
+    'decoding': benchmark_decoding,
+    'metadata': benchmark_metadata,
+    'tokenization': benchmark_tokenization,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the CORD-19 corpus reader on a synthetic corpus.')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help='Benchmarks to run: %s (default: all of them).' % ', '.join(sorted(BENCHMARKS)))
+    parser.add_argument('--rows', type=int, default=100000, help='Rows in the synthetic metadata.csv.')
+    parser.add_argument('--documents', type=int, default=1000,
+                        help='Documents in the synthetic corpus (rows of metadata.csv for accessors).')
+    parser.add_argument('--accessors', help='Comma separated accessors to time: %s (default: all of them).' % ', '.join(ACCESSORS))
+    parser.add_argument('--corpus', help='Directory to write the synthetic corpus to and keep, or reuse if it has the same size.')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json'),
+                        help='File of accessor results to compare with.')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the accessor results as the baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='How much slower or bigger than the baseline counts as a regression (default: 0.2).')
+    arguments = parser.parse_args()
+
+    for name in arguments.benchmarks:
+        if (name not in BENCHMARKS):
+            parser.error('unknown benchmark: %s' % name)
+
+    if (arguments.accessors):
+        for name in arguments.accessors.split(','):
+            if (name not in ACCESSORS):
+                parser.error('unknown accessor: %s' % name)
+
+    # Run the benchmarks, and fail if any of them found a regression.
+    regressions = []
+    for name in (arguments.benchmarks or sorted(BENCHMARKS)):
+        regressions.extend(BENCHMARKS[name](arguments) or [])
+
+    if (regressions):
+        sys.exit('regressions: %s' % ', '.join(regressions))
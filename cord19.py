@@ -18,696 +18,5901 @@
 A reader for the CORD-19 corpus.
 """
 
+import array
+import bisect
+import copy
 import csv
 import json
+import functools
+import gzip
+import hashlib
+import io
+import itertools
+import mmap
+import os
+import pickle
+import re
+import shutil
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import nltk.data
+from nltk.data import FileSystemPathPointer, GzipFileSystemPathPointer, PathPointer, SeekableUnicodeStreamReader
 from nltk.corpus.reader.api import *
 from nltk.corpus.reader.util import *
+from nltk.probability import FreqDist
+from nltk.text import ConcordanceLine
 from nltk.tokenize import *
+from nltk.tokenize.util import align_tokens
 
 
-class CORD19CorpusReader(CorpusReader):
+def file_signature(path):
     """
-    Reader for the CORD19 corpus:
-    https://www.kaggle.com/allen-institute-for-ai/CORD-19-research-challenge .
-
-    Documents in the CORD-19 corpus are stored as JSON in text files, so the
-    implementation of this reader is based on the implementation of the 
-    PlaintextCorpusReader in NLTK.
+    :return: The size and modification time of a file, which change whenever
+        the file is rewritten, so they're used to tell when cached indexes are stale.
+    :rtype: tuple(int, int)
     """
 
-    CorpusView = StreamBackedCorpusView
+    # Grab the information about the file.
+    file_stat = os.stat(path)
 
-    def __init__(
-            self,
-            root,
-            # Don't allow files to be explicitly specified anymore.
-            # TODO: Make it where it's alright for a list of files?
-            fileids,
-            word_tokenizer=WordPunctTokenizer(),
-            sent_tokenizer=nltk.data.LazyLoader("tokenizers/punkt/english.pickle"),
-            para_block_reader=read_blankline_block,
-            encoding="utf8",
-            include_titles=True,
-            include_abstracts=True,
-            include_bodies=True,
-            # TODO: What to include for the bibliographies?
-            # include_bibliographies = True,
-            prefer_pdf_parses=True,
-            prefer_pmc_parses=False
-    ):
-        # TODO: Gather up the list of fileids to pass into the constructor.
+    return (file_stat.st_size, file_stat.st_mtime_ns)
 
-        CorpusReader.__init__(self, root, fileids, encoding)
 
-        # print('self.fileids:', self._fileids)
+# Decode and encode JSON with orjson if it's installed, since it's a lot faster than json.
+try:
+    from orjson import dumps as json_dumps
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-        self._word_tokenizer = word_tokenizer
-        self._sent_tokenizer = sent_tokenizer
-        self._para_block_reader = para_block_reader
+    def json_dumps(value):
+        """
+        :return: value encoded as compact JSON in UTF-8, like orjson.dumps().
+        :rtype: bytes
+        """
 
-        self._include_titles = include_titles
-        self._include_abstracts = include_abstracts
-        self._include_bodies = include_bodies
-        # self._include_bibliographies = include_bibliographies
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf8')
 
-        # Save location of the metadata.csv file.
-        self._metadata_file = root + 'metadata.csv'
 
-        # Record encoding scheme
-        self._encoding = encoding
+# The kinds of precomputed outputs written by generate_corpus_computations.py.
+PRECOMPUTED_KINDS = ('sents', 'words', 'lemmae', 'citations', 'metadata')
 
-        # Check if don't want both PDF parses and PMC parses.
-        if (not (prefer_pdf_parses and prefer_pmc_parses)):
 
-            # Make an empty dictionary to hold the metadata.
-            metadata_dictionary = defaultdict(list)
+def precomputed_location(directory, kind, fileid, compressed=False):
+    """
+    :return: The location of a kind of precomputed output for a fileid,
+        under directory. The outputs are stored in a directory for each
+        kind, with the same layout as the corpus.
+    :rtype: str
+    """
 
-            # Open the CSV file.
-            csv_file = open(self._metadata_file, 'r', newline='', encoding=self._encoding)
+    location = os.path.join(directory, kind, os.path.splitext(fileid)[0] + '.jsonl')
 
-            # Try finding the dialect.
-            dialect = csv.Sniffer().sniff(csv_file.read())
+    # Check if the output is compressed.
+    if (compressed):
+        location += '.gz'
 
-            # Reset to the beginning of the file.
-            csv_file.seek(0)
+    return location
 
-            # Setup a CSV reader on the file.
-            csv_reader = csv.DictReader(csv_file, dialect=dialect)
 
-            # Go through each row in the metadata.
-            for row in csv_reader:
-                # Use the cord_uid as the key and append the row.
-                # The entries are lists sense a cord_uid can appear in multiple rows.
-                metadata_dictionary[row['cord_uid']].append(row)
+def encode_precomputed(records, compressed=False):
+    """
+    :return: The contents of a precomputed output file holding records, which
+        is each record as a line of JSON, gzip compressed if compressed is True.
+        Files like this can be read a line at a time, so they're read lazily,
+        and nothing has to be evaluated to read them.
+    :rtype: bytes
+    """
 
-            # for (key, value) in metadata_dictionary.items():
-            #     if (len(value) > 1):
-            #         print(key, 'has > 1 list')
+    data = b''.join(json_dumps(record) + b'\n' for record in records)
 
-            # print(metadata_dictionary['soow2ehe'])
+    # Check if the data should be compressed.
+    # The modification time is left out so the same records always give the same file.
+    if (compressed):
+        data = gzip.compress(data, mtime=0)
 
-            # TODO: Probably faster to construct a new list of files rather than remove unwanted ones?
-            # Make an empty list to hold the new fileids list.
-            new_fileids_list = []
+    return data
 
-            # Go through all the entries in metadata.
-            for (entry_key, entry_value) in metadata_dictionary.items():
 
-                # TODO: Collpase this with the handling for list size of one?
-                # Check if there's multiple items in this entry.
-                if (len(entry_value) > 1):
+def _describe(value):
+    """
+    :return: A description of a value that's the same in every process, for
+        fingerprinting. Unlike pickles, the description doesn't depend on
+        the order of sets and dictionaries, and it leaves out compiled regular
+        expressions, which tokenizers only cache from their other attributes.
+    :rtype: str
+    """
 
-                    has_pdf_parse = False
-                    has_pmc_parse = False
-                    pdf_parse_value = ''
-                    pmc_parse_value = ''
+    # Check for simple values.
+    if (value is None or isinstance(value, (bool, int, float, str, bytes))):
+        return repr(value)
 
-                    # Gotta go through the entries in here.
-                    for entry in entry_value:
+    # Check for classes.
+    elif isinstance(value, type):
+        return value.__module__ + '.' + value.__qualname__
 
-                        # Check if there's a PDF parse.
-                        if (entry['pdf_json_files'] != ''):
-                            # Set that there is.
-                            has_pdf_parse = True
+    # Check for sequences.
+    elif isinstance(value, (list, tuple)):
+        return '[' + ','.join(_describe(item) for item in value) + ']'
 
-                            # Store off the value.
-                            pdf_parse_value = entry['pdf_json_files']
+    # Check for sets, which have to be sorted.
+    elif isinstance(value, (set, frozenset)):
+        return '{' + ','.join(sorted(_describe(item) for item in value)) + '}'
 
-                        # Check if there's a PMC parse.
-                        if (entry['pmc_json_files'] != ''):
-                            # Set that there is.
-                            has_pmc_parse = True
+    # Check for dictionaries, which also have to be sorted.
+    elif isinstance(value, dict):
+        return '{' + ','.join(sorted(
+            _describe(key) + ':' + _describe(item)
+            for (key, item) in value.items()
+            if not (item is None or isinstance(item, re.Pattern))
+        )) + '}'
 
-                            # Store off the value.
-                            pmc_parse_value = entry['pmc_json_files']
+    # Check for a resource that hasn't been loaded yet, like the default sentence tokenizer.
+    elif isinstance(value, nltk.data.LazyLoader):
 
-                    # Check if there was neither a PDF parse nor a PMC parse.
-                    if (not has_pdf_parse and not has_pmc_parse):
+        # Looking up an attribute the loader doesn't have loads the resource, and the loader turns into it.
+        getattr(value, 'tokenize', None)
 
-                        # Just go to the next one.
-                        continue
+        return _describe(value)
 
-                    # Check if there's PDF parses, but not PMC parses.
-                    elif (has_pdf_parse and not has_pmc_parse):
+    # Otherwise, describe the class and the attributes.
+    else:
+        return _describe(type(value)) + _describe(getattr(value, '__dict__', {}))
 
-                        # The PDF parses can actually be a list of files.
-                        # So, get the list of PDF parse files.
-                        pdf_parses_file_list = pdf_parse_value.split('; ')
 
-                        # Go through each file.
-                        for pdf_parse_file in pdf_parses_file_list:
-                            # Append this file to the new list.
-                            new_fileids_list.append(pdf_parse_file)
+def tokenizer_fingerprint(tokenizer):
+    """
+    :return: A hash of a tokenizer's class and settings, which changes if the
+        tokenizer would split text differently.
+    :rtype: str
+    """
 
-                    # Check if there's PMC parses, but not PDF parses.
-                    elif (has_pmc_parse and not has_pdf_parse):
+    return hashlib.blake2b(_describe(tokenizer).encode('utf8'), digest_size=16).hexdigest()
 
-                        # Append this file to the new list.
-                        new_fileids_list.append(pmc_parse_value)
 
-                    # There must be both PDF parses and PMC parses.
-                    else:
+class CORD19Profile(object):
+    """
+    The wall time, number of calls, and bytes of each stage of reading the
+    corpus, added up while a corpus reader is being profiled. The stages are
+    opening and reading files ('open'), decoding JSON ('json'), splitting
+    sections into sentences ('sentences'), splitting text into words
+    ('words'), and parsing metadata.csv ('csv'), along with the accessors
+    that use them ('raw', 'citations', 'metadata', and 'blocks' for the files
+    read by the views of words(), sents(), and paras()), whose times include
+    the stages under them. The bytes of the tokenizing stages are characters
+    of text.
+    """
 
-                        # Check if prefer PDF parses.
-                        if (prefer_pdf_parses):
+    STAGES = ('open', 'json', 'sentences', 'words', 'csv', 'raw', 'citations', 'metadata', 'blocks')
 
-                            # The PDF parses can actually be a list of files.
-                            # So, get the list of PDF parse files.
-                            pdf_parses_file_list = pdf_parse_value.split('; ')
+    def __init__(self):
 
-                            # Go through each file.
-                            for pdf_parse_file in pdf_parses_file_list:
-                                # Append this file to the new list.
-                                new_fileids_list.append(pdf_parse_file)
+        # Functions called with the stage, seconds, and bytes of every call.
+        self.callbacks = []
 
-                        # Check if prefer PMC parses.
-                        elif (prefer_pmc_parses):
+        # Stages can be added to from the prefetcher's threads.
+        self._lock = threading.Lock()
+        self.reset()
 
-                            # Append this file to the new list.
-                            new_fileids_list.append(pmc_parse_value)
+    def add(self, stage, seconds, byte_count=0):
+        """
+        Adds a call to a stage that took seconds and went through byte_count bytes.
+        """
 
-                # Otherwise, only one entry.
-                else:
+        with self._lock:
+            counters = self._counters[stage]
+            counters[0] += 1
+            counters[1] += seconds
+            counters[2] += byte_count
 
-                    # Grab the entry, which is the first thing on the list.
-                    entry = entry_value[0]
+        for callback in self.callbacks:
+            callback(stage, seconds, byte_count)
 
-                    # Check if there was neither a PDF parse nor a PMC parse.
-                    if (entry['pdf_json_files'] == '' and entry['pmc_json_files'] == ''):
+    def reset(self):
+        """
+        Sets every stage back to zero.
+        """
 
-                        # Just go to the next one.
-                        continue
+        # Dictionary of stage to its calls, seconds, and bytes.
+        self._counters = {stage: [0, 0.0, 0] for stage in self.STAGES}
 
-                    # Check if there's PDF parses, but not PMC parses.
-                    elif (entry['pdf_json_files'] != '' and entry['pmc_json_files'] == ''):
+    def stats(self):
+        """
+        :return: Dictionary of each stage to its 'calls', 'seconds', and 'bytes'.
+        :rtype: dict(dict)
+        """
 
-                        # The PDF parses can actually be a list of files.
-                        # So, get the list of PDF parse files.
-                        pdf_parses_file_list = entry['pdf_json_files'].split('; ')
+        with self._lock:
+            return {
+                stage: {'calls': calls, 'seconds': seconds, 'bytes': byte_count}
+                for (stage, (calls, seconds, byte_count)) in self._counters.items()
+            }
 
-                        # Go through each file.
-                        for pdf_parse_file in pdf_parses_file_list:
-                            # Append this file to the new list.
-                            new_fileids_list.append(pdf_parse_file)
+    def report(self):
+        """
+        :return: A table of the stages that were called, one a line.
+        :rtype: str
+        """
 
-                    # Check if there's PMC parses, but not PDF parses.
-                    elif (entry['pmc_json_files'] != '' and entry['pdf_json_files'] == ''):
+        lines = ['%-10s %10s %10s %12s %10s' % ('stage', 'calls', 'seconds', 'MB', 'MB/s')]
 
-                        # Append this file to the new list.
-                        new_fileids_list.append(entry['pmc_json_files'])
+        for (stage, counters) in self.stats().items():
 
-                    # There must be both PDF parses and PMC parses.
-                    else:
+            # Check if the stage was called.
+            if (counters['calls'] > 0):
+                lines.append('%-10s %10d %10.3f %12.1f %10.1f' % (
+                    stage, counters['calls'], counters['seconds'], counters['bytes'] / 1e6,
+                    counters['bytes'] / 1e6 / max(counters['seconds'], 1e-9),
+                ))
 
-                        # Check if prefer PDF parses.
-                        if (prefer_pdf_parses):
+        return '\n'.join(lines)
 
-                            # The PDF parses can actually be a list of files.
-                            # So, get the list of PDF parse files.
-                            pdf_parses_file_list = entry['pdf_json_files'].split('; ')
+    def __getstate__(self):
 
-                            # Go through each file.
-                            for pdf_parse_file in pdf_parses_file_list:
-                                # Append this file to the new list.
-                                new_fileids_list.append(pdf_parse_file)
+        # Locks can't be pickled, so a copy gets a lock of its own.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
 
-                        # Check if prefer PMC parses.
-                        elif (prefer_pmc_parses):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
-                            # Append this file to the new list.
-                            new_fileids_list.append(entry['pmc_json_files'])
 
-            # print('len(new_fileids_list):', len(new_fileids_list))
-            # print('new_fileids_list:', new_fileids_list)
-            # print('len(new_fileids_list):', len(new_fileids_list))
-            # print(type(self._fileids))
+def profiled(stage):
+    """
+    :return: A decorator for a corpus reader method that adds the time each
+        call takes to the reader's profile under stage, when it's being
+        profiled, along with the length of the result if it's a string.
+    :rtype: function
+    """
 
-            # Update self._fileids to the new list.
-            self._fileids = sorted(new_fileids_list)
+    def decorator(method):
 
-    def raw(self, fileids=None):
+        @functools.wraps(method)
+        def profiled_method(self, *args, **kwargs):
 
-        """
-        :return: Returns the text of the specified files as a single string.
-        :rtype: str
-        """
+            # Check if the reader isn't being profiled, which is the usual case, so it costs as little as possible.
+            profile = self._profile
+            if (profile is None):
+                return method(self, *args, **kwargs)
 
-        # Check if no fileids are specified.
-        if (fileids is None):
+            start_time = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            profile.add(stage, time.perf_counter() - start_time, len(result) if (isinstance(result, str)) else 0)
 
-            # Use the fileids in this corpus.
-            fileids = self._fileids
+            return result
 
-        # Check if the fileids is actually a string.
-        elif isinstance(fileids, str):
+        return profiled_method
 
-            # Make a list containing that string.
-            fileids = [fileids]
+    return decorator
 
-        # Make a list to store the raw texts.
-        raw_texts = []
 
-        # Go through each file ID in the list.
-        for fileid in fileids:
+class CORD19Document(object):
+    """
+    A document from the CORD-19 corpus, parsed from its JSON file once so
+    the title, sections, and citations can all be used without parsing the
+    file again.
+
+    Parts of the document are only decoded the first time they're used. A
+    single scan of the file finds where the value of each top-level key
+    (metadata, abstract, body_text, bib_entries, ...) starts and ends, so
+    words() never decodes the citations and citations() never decodes the
+    body text. If the file doesn't look like the usual layout, the whole
+    file is decoded instead.
+    """
 
-            # Open the file.
-            # TODO: Should use self.open() here from CorpusReader like PlaintextCorpusReader?
-            file_in = open(self.root + '/' + fileid, 'r')
+    __slots__ = ('fileid', 'profile', '_digest', '_text', '_spans', '_values')
 
-            # Read the contents of the file.
-            file_text = file_in.read()
+    # The keys at the top level of the JSON files, in the order they're usually in.
+    TOP_LEVEL_KEYS = ('paper_id', 'metadata', 'abstract', 'body_text', 'bib_entries', 'ref_entries', 'back_matter')
 
-            # Close the file.
-            file_in.close()
+    def __init__(self, fileid, file_text, profile=None):
+        """
+        :param fileid: The fileid of the document.
+        :param file_text: The contents of the document's JSON file.
+        :param profile: The CORD19Profile to add the time spent decoding to, if any.
+        """
 
-            # Make a JSON object from the text.
-            json_object = json.loads(file_text)
+        self.fileid = fileid
+        self.profile = profile
+        self._digest = None
+        self._text = file_text
 
-            # Set the paper as en empty string.
-            paper = ""
+        # Dictionary of key to the start and end of its value in the text, found the first time a value is needed.
+        self._spans = None
 
-            # print(json_object)
+        # Dictionary of key to its decoded value.
+        self._values = {}
 
-            # Check whether to include titles or not.
-            if (self._include_titles):
-                # Concatenate the title.
-                paper += json_object['metadata']['title'] + '\n'
+    @property
+    def digest(self):
+        # A hash of the contents of the file, which changes if the file changes.
+        if (self._digest is None):
+            self._digest = hashlib.blake2b(self._text.encode('utf8'), digest_size=20).digest()
 
-                # print("TITLE: " + json_object['metadata']['title'])
+        return self._digest
 
-            # Check whether to include abstracts or not.
-            if (self._include_abstracts):
+    @property
+    def paper_id(self):
+        return self._value('paper_id', '')
 
-                # Make sure there is an entry for the abstract.
-                if ('abstract' in json_object):
+    @property
+    def title(self):
+        return self._value('metadata', None)['title']
 
-                    # Go through each section of the abstract.
-                    for section in json_object['abstract']:
-                        # Concatenate the section.
-                        paper += section['text'] + '\n'
+    @property
+    def abstract(self):
+        # A list of sections, each a dictionary with the text of the section along with its name and spans.
+        # Not every document has an abstract.
+        return self._value('abstract', [])
 
-            # Check whether to include body_text or not.
-            if (self._include_bodies):
+    @property
+    def body_text(self):
+        return self._value('body_text', None)
 
-                # Go through each section of the paper.
-                for section in json_object['body_text']:
-                    # Concatenate the section.
-                    paper += section['text'] + '\n'
+    @property
+    def back_matter(self):
+        return self._value('back_matter', [])
 
-            # Read the contents of the file and append to the list of raw texts.
-            raw_texts.append(paper)
+    @property
+    def bib_entries(self):
+        # A dictionary of the citations.
+        return self._value('bib_entries', {})
 
-        # Concatenate the items in the list and return the result.
-        return concat(raw_texts)
+    @property
+    def ref_entries(self):
+        # A dictionary of the figures and tables.
+        return self._value('ref_entries', {})
 
-    def words(self, fileids=None):
+    def _value(self, key, default):
         """
-        :return: List of words and punctuation from the specified files.
-        :rtype: list(str)
+        :return: The decoded value of a top-level key, or default if the document doesn't have the key.
         """
 
-        # print("fileids = ")
-        # print(fileids)
-        # print("self.abspaths() =")
-        # print(self.abspaths(fileids, True, True))
+        # Check if the value has already been decoded.
+        if (key in self._values):
+            return self._values[key]
 
-        # Return the concatenation of all the lists.
-        return concat(
-
-            # Do a list comprehension.
-            [
-                self.CorpusView(path, self._read_word_block, encoding=encoding)
-                for (path, encoding, fileid) in self.abspaths(fileids, True, True)
-            ]
-        )
+        # Check if decoding is being profiled, and time it.
+        if (self.profile is not None):
+            start_time = time.perf_counter()
+            value = self._decode_value(key, default)
 
-    def sents(self, fileids=None):
-        """
-        :return: List of sentences from the specified files.
-        :rtype: list(list(str))
-        """
+            # Count the bytes of the value, or of the whole file if it all had to be decoded.
+            if (self._spans):
+                (start, end) = self._spans.get(key, (0, 0))
+                byte_count = end - start
+            else:
+                byte_count = len(self._text)
 
-        # Check that there's a sentence tokenizer.
-        if (self._sent_tokenizer is None):
-            # Raise an error.
-            raise ValueError("No sentence tokenizer for this corpus reader")
+            self.profile.add('json', time.perf_counter() - start_time, byte_count)
 
-        # Return the concatenation of all the lists.
-        return concat(
+            return value
 
-            # Do a list comprehension.
-            [
-                self.CorpusView(path, self._read_sent_block, encoding=encoding)
-                for (path, encoding, fileid) in self.abspaths(fileids, True, True)
-            ]
-        )
+        return self._decode_value(key, default)
 
-    # TODO: Warning! Currently, paras() treats a section of the paper as a paragraph,
-    # which may or may not be acceptable. If we want to work at a paragraph level,
-    # we may need to revisit this implementation and make some adjustments.
-    def paras(self, fileids=None):
+    def _decode_value(self, key, default):
         """
-        :return: List of paragraphs, which is each a list of sentences, which is each a list of words.
-        :rtype: list(list(list(str)))
+        :return: The value of a top-level key, decoded from the text, or default if the document doesn't have the key.
         """
 
-        # Check that there's a sentence tokenizer.
-        if (self._sent_tokenizer is None):
-            # Raise an error.
-            raise ValueError("No sentence tokenizer for this corpus reader")
+        # Find where the values are, if that hasn't been done yet.
+        if (self._spans is None):
+            self._spans = self._find_spans()
 
-        # Return the concatenation of all the lists.
-        return concat(
+            # Check if the whole file had to be decoded to do that.
+            if (not self._spans):
+                return self._values.get(key, default)
 
-            # Do a list comprehension.
-            [
-                self.CorpusView(path, self._read_para_block, encoding=encoding)
-                for (path, encoding, fileid) in self.abspaths(fileids, True, True)
-            ]
-        )
+        # Check if the key isn't in the document.
+        if (key not in self._spans):
+            return default
 
-    # def journals(self, fileids = None):
-    #     """
-    #     :return: List of journals the papers were published in from metadata.csv.
-    #     :rtype: list(str)
-    #     """
+        (start, end) = self._spans[key]
 
-    # def publish_times(self, fileids = None):
-    #     """
-    #     :return: List of dates the papers were published from metadata.csv.
-    #     :rtype: list(str)
-    #     """
+        try:
+            # Decode just the value of this key.
+            self._values[key] = json_loads(self._text[start:end])
 
-    # def authors(self, fileids = None):
-    #     """
-    #     :return: List of authors for the papers from metadata.csv.
-    #     For each paper, a list is returned. A paper may have multiple authors.
-    #     Or, a paper might not have any authors listed.
-    #     :rtype: list(list(str))
-    #     """
+        except ValueError:
+            # The layout wasn't what was expected, so decode the whole file.
+            self._decode_all()
 
-    # def countries(self, fileids = None):
-    #     """
-    #     :return: List of countries of the authors for the papers from metadata.csv.
-    #     For each paper, a list is returned. A paper may have multiple authors and thus multiple countries.
-    #     Or, a paper might not have any authors listed.
-    #     :rtype: list(list(str))
-    #     """
+            return self._values.get(key, default)
 
-    # def institutions(self, fileids = None):
-    #     """
-    #     :return: List of institutions of the authors for the papers from metadata.csv.
-    #     For each paper, a list is returned. A paper may have multiple authors and thus multiple institutions.
-    #     Or, a paper might not have any authors listed.
-    #     :rtype: list(list(str))
-    #     """
+        return self._values[key]
 
-    def metadata(self, fileids=None, fileids_only=True):
+    def _find_spans(self):
         """
-        :return: Dictionary of metadata from metadata.csv for the specified list of files. Set fileids_only = False if you want all metadata (even if the actual paper isn't in the corpus).
-        :rtype: dict(list(dict))
+        :return: Dictionary of each top-level key to the start and end of its
+            value in the text, which is empty if the file had to be decoded
+            all at once.
+        :rtype: dict(tuple(int, int))
         """
 
-        # Check if no fileids are specified.
-        if (fileids is None):
-
-            # Use the fileids in this corpus.
-            fileids = self._fileids
-
-        # Check if the fileids is actually a string.
-        elif isinstance(fileids, str):
-
-            # Make a list containing that string.
-            fileids = [fileids]
+        # List of the position of each key, the key, and where its value starts.
+        keys = []
 
-        # Check if fileids_only is False.
-        if (not fileids_only):
+        # Find each key. A quote followed by a colon can't be inside a JSON string, so each match is a key,
+        # but it might be a key nested in some other value. That makes the values around it fail to decode.
+        search_start = 0
+        for key in self.TOP_LEVEL_KEYS:
+            key_text = '"' + key + '":'
 
-            # Make an empty dictionary to hold the metadata.
-            metadata_dictionary = defaultdict(list)
+            # Look after the previous key, since keys are usually in order.
+            position = self._text.find(key_text, search_start)
 
-            # Open the CSV file.
-            csv_file = open(self._metadata_file, 'r', newline='', encoding=self._encoding)
+            # Otherwise, look through the whole file.
+            if (position == -1 and search_start > 0):
+                position = self._text.find(key_text)
 
-            # Try finding the dialect.
-            dialect = csv.Sniffer().sniff(csv_file.read())
+            if (position != -1):
+                keys.append((position, key, position + len(key_text)))
+                search_start = position + len(key_text)
 
-            # Reset to the beginning of the file.
-            csv_file.seek(0)
+        # Check if there's no keys, in which case this isn't the usual layout.
+        if (not keys):
+            self._decode_all()
+            return {}
 
-            # Setup a CSV reader on the file.
-            csv_reader = csv.DictReader(csv_file, dialect=dialect)
+        # Put the keys in the order they're in the file.
+        keys.sort()
 
-            # Go through each row in the metadata.
-            for row in csv_reader:
-                # Use the cord_uid as the key and append the row.
-                # The entries are lists sense a cord_uid can appear in multiple rows.
-                metadata_dictionary[row['cord_uid']].append(row)
+        spans = {}
 
-            # Return the metadata dictionary.
-            return metadata_dictionary
+        # Each value runs until the next key, or the end of the object for the last one.
+        for (i, (position, key, start)) in enumerate(keys):
 
-        # Otherwise, make a dictionary of just the wanted stuff.
-        else:
+            if (i + 1 < len(keys)):
+                end = keys[i + 1][0]
+            else:
+                end = self._text.rindex('}')
 
-            # Make an empty dictionary to hold the metadata.
-            metadata_dictionary = defaultdict(list)
+            # Back up over the comma and whitespace between the value and the next key.
+            while (end > start and self._text[end - 1] in ' \t\r\n,'):
+                end -= 1
 
-            # Open the CSV file.
-            csv_file = open(self._metadata_file, 'r', newline='', encoding=self._encoding)
+            spans[key] = (start, end)
 
-            # Try finding the dialect.
-            dialect = csv.Sniffer().sniff(csv_file.read())
+        return spans
 
-            # Reset to the beginning of the file.
-            csv_file.seek(0)
+    def _decode_all(self):
+        """
+        Decodes the whole file at once.
+        """
 
-            # Setup a CSV reader on the file.
-            csv_reader = csv.DictReader(csv_file, dialect=dialect)
+        self._values = json_loads(self._text)
+        self._spans = {}
 
-            # Go through each row in the metadata.
-            for row in csv_reader:
 
-                # Check if this entry has a PCM parse file.
-                if (row['pmc_json_files'] != ''):
-                    # Add the row to the dictionary.
-                    metadata_dictionary[row['pmc_json_files']].append(row)
+class CORD19DocumentRecord(object):
+    """
+    A lightweight record of one document, made by
+    CORD19CorpusReader.iter_documents(), holding just the text of the
+    document and where it came from rather than the whole parsed file.
+    """
 
-                # Check if this row has a PDF parse file.
-                if (row['pdf_json_files'] != ''):
+    __slots__ = ('fileid', 'cord_uid', 'title', 'sections', 'tokens')
 
-                    # The PDF parses can actually be a list of files.
-                    # So, get the list of PDF parse files.
-                    pdf_parses_file_list = row['pdf_json_files'].split('; ')
+    def __init__(self, fileid, cord_uid, title, sections, tokens=None):
+        """
+        :param fileid: The fileid of the document.
+        :param cord_uid: The cord_uid of the paper in metadata.csv, or None if it isn't in it.
+        :param title: The title of the paper.
+        :param sections: List of the (part, name, text) of each section, where part is 'abstract' or 'body_text'.
+        :param tokens: The tokens of the document, if they were asked for.
+        """
 
-                    # Go through each file.
-                    for pdf_parse_file in pdf_parses_file_list:
-                        # Add the row to the dictionary.
-                        metadata_dictionary[row['pdf_json_files']].append(row)
+        self.fileid = fileid
+        self.cord_uid = cord_uid
+        self.title = title
+        self.sections = sections
+        self.tokens = tokens
 
-            # Make an empty dictionary to hold the metadata just for the fileids.
-            fileids_metadata_dictionary = defaultdict(list)
+    def __repr__(self):
+        return 'CORD19DocumentRecord(%r, %r, %d sections)' % (self.fileid, self.cord_uid, len(self.sections))
 
-            # Go through each fileid.
-            for fileid in fileids:
-                # Add the entry for this fileid over.
-                fileids_metadata_dictionary[fileid] = metadata_dictionary[fileid]
 
-            # Return the metadata for the fileids.
-            return fileids_metadata_dictionary
+class CORD19SpanView(AbstractLazySequence):
+    """
+    A view of the (section, start, end) of each word or sentence of a
+    document, over the flat arrays of offsets in a CORD19TokenSpans. The
+    tuples are only made as they're used, and the view doesn't hold onto the
+    text of the document.
+    """
 
-    def statistics(self):
+    def __init__(self, bounds, section_offsets, section_starts):
         """
-        :return: Nothing. Prints some information about the entries in metadata.csv and files present in the corpus.
-        :rtype: ???
+        :param bounds: The start and end offset of each span in the text of the document, one after another.
+        :param section_offsets: The offset in the text each section starts at.
+        :param section_starts: The number of the span each section starts at, ending with the number of spans.
         """
 
-        # Open the CSV file.
-        csv_file = open(self._metadata_file, 'r', newline='', encoding=self._encoding)
+        self._bounds = bounds
+        self._section_offsets = section_offsets
+        self._section_starts = section_starts
 
-        # Try finding the dialect.
-        dialect = csv.Sniffer().sniff(csv_file.read())
+    def __len__(self):
+        return len(self._bounds) // 2
 
-        # Reset to the beginning of the file.
-        csv_file.seek(0)
+    def iterate_from(self, start):
 
-        # Setup a CSV reader on the file.
-        csv_reader = csv.DictReader(csv_file, dialect=dialect)
-
-        unique_cord_uid_dictionary = {}
-        metadata_row_count = 0
-        metadata_pdf_count = 0
-        metadata_total_pdf_count = 0
-        metadata_pmc_count = 0
-        metadata_pdf_no_pmc_count = 0
-        metadata_pmc_no_pdf_count = 0
-        metadata_both_count = 0
-        metadata_neither_count = 0
-
-        pdf_parse_has_more = 0
-        pmc_parse_has_more = 0
-        both_parses_same = 0
+        bounds = self._bounds
+        section_starts = self._section_starts
 
-        # Go through each row in the metadata.
-        for row in csv_reader:
+        # Check if there are any spans from the start on.
+        start = max(0, start)
+        if (start >= len(self)):
+            return
 
-            # Increment the row count.
-            metadata_row_count += 1
+        # Start from the section holding the start span, and make each span's offsets count from its section.
+        for section in range(bisect.bisect_right(section_starts, start) - 1, len(section_starts) - 1):
+            offset = self._section_offsets[section]
+            for i in range(max(start, section_starts[section]), section_starts[section + 1]):
+                yield (section, bounds[2 * i] - offset, bounds[2 * i + 1] - offset)
 
-            # Add the cord_uid to the dictionary.
-            unique_cord_uid_dictionary[row['cord_uid']] = 0
 
-            # Check if there is both a PDF parse and a PMC parse for this paper.
-            if (row['pdf_json_files'] != '' and row['pmc_json_files'] != ''):
-                metadata_both_count += 1
+class CORD19TokenSpans(object):
+    """
+    Where the sentences and tokens of the sections of a document are, as flat
+    arrays of offsets into the text of the sections joined by newlines, made
+    by CORD19SpanTokenizer. Sentence i has the tokens from sentence_starts[i]
+    up to sentence_starts[i + 1], and section i has the sentences from
+    section_starts[i] up to section_starts[i + 1], so words, sentences, and
+    paragraphs are all slices of the same arrays. Unless the tokenizers gave
+    the words, they're only sliced out of the text once they're asked for.
+    """
 
-                # This portion takes a long time to run.
-                # Compare the PDF parse with the PMC parse and see which has more characters.
-                # if (os.path.exists(self._root + row['pdf_json_files']) and os.path.exists(self._root + row['pmc_json_files'])):
+    def __init__(self, text, section_offsets, sentence_bounds, sentence_starts, section_starts, token_bounds, sentences=None):
+        """
+        :param text: The text of the sections joined by newlines.
+        :param section_offsets: The offset in text each section starts at, ending with len(text) + 1.
+        :param sentence_bounds: The start and end offset in text of each sentence, one after another.
+        :param sentence_starts: The token number each sentence starts at, ending with the number of tokens.
+        :param section_starts: The sentence number each section starts at, ending with the number of sentences.
+        :param token_bounds: The start and end offset in text of each token, one after another, or None if they weren't asked for.
+        :param sentences: The words of each sentence, or None to slice them out of text by the offsets of the tokens.
+        """
 
-                #     # Get contents of the PDF parse.
-                #     pdf_parse_file = open(self._root + row['pdf_json_files'], 'r')
-                #     pdf_parse_text = pdf_parse_file.read()
-                #     pdf_parse_file.close()
+        self.text = text
+        self.section_offsets = section_offsets
+        self.sentence_bounds = sentence_bounds
+        self.sentence_starts = sentence_starts
+        self.section_starts = section_starts
+        self.token_bounds = token_bounds
+        self._sentences = sentences
 
-                #     # Get contents of the PMC parse.
-                #     pmc_parse_file = open(self._root + row['pmc_json_files'], 'r')
-                #     pmc_parse_text = pmc_parse_file.read()
-                #     pmc_parse_file.close()
+    @classmethod
+    def from_tokenizers(cls, sections, word_tokenizer, sent_tokenizer):
+        """
+        :return: The sentences and tokens of the sections, with the offsets of
+            the tokens, found by calling the tokenizers on each section and
+            sentence, for tokenizers CORD19SpanTokenizer can't stand in for.
+            The offsets come from the tokenizers' span_tokenize(), or from
+            finding each token in the text if they don't have one.
+        :rtype: CORD19TokenSpans
+        """
 
-                #     # Check which file has more.
-                #     if (len(pdf_parse_text) > len(pmc_parse_text)):
-                #         pdf_parse_has_more += 1
+        text = '\n'.join(sections)
+        section_offsets = array.array('Q')
+        sentence_bounds = array.array('Q')
+        sentence_starts = array.array('Q')
+        section_starts = array.array('Q')
+        token_bounds = array.array('Q')
+        sentences = []
 
-                #     elif (len(pdf_parse_text) < len(pmc_parse_text)):
-                #         pmc_parse_has_more += 1
+        offset = 0
+        for section in sections:
+            section_offsets.append(offset)
+            section_starts.append(len(sentences))
 
-                #     else:
-                #         both_parses_same += 1
+            # Find each sentence, and each word in it.
+            for (start, end) in cls._spans(sent_tokenizer, section):
+                sentence_bounds.extend((offset + start, offset + end))
+                sentence_starts.append(len(token_bounds) // 2)
 
-            # Check if there is neither a PDF parse and a PMC parse for this paper.
-            if (row['pdf_json_files'] == '' and row['pmc_json_files'] == ''):
-                metadata_neither_count += 1
+                sentence = section[start:end]
+                for (word_start, word_end) in cls._spans(word_tokenizer, sentence):
+                    token_bounds.extend((offset + start + word_start, offset + start + word_end))
 
-            # Check if there is a PDF parse, but a PMC parse for this paper.
-            if (row['pdf_json_files'] != '' and row['pmc_json_files'] == ''):
-                metadata_pdf_no_pmc_count += 1
+                # Keep the words the tokenizer gives, which aren't always the text they came from (e.g., quotes).
+                sentences.append(word_tokenizer.tokenize(sentence))
 
-            # Check if there is not a PDF parse, but is a PMC parse for this paper.
-            if (row['pdf_json_files'] == '' and row['pmc_json_files'] != ''):
-                metadata_pmc_no_pdf_count += 1
+            # The next section starts after the newline.
+            offset += len(section) + 1
 
-            # Check if there is both a PDF parse for this paper.
-            if (row['pdf_json_files'] != ''):
-                metadata_pdf_count += 1
+        section_offsets.append(offset)
+        section_starts.append(len(sentences))
+        sentence_starts.append(len(token_bounds) // 2)
 
-                # Get the list of PDF parse files.
-                pdf_parses_file_list = row['pdf_json_files'].split('; ')
+        return cls(text, section_offsets, sentence_bounds, sentence_starts, section_starts, token_bounds, sentences)
 
-                # Check if there's more than one file.
-                if (len(pdf_parses_file_list) > 0):
+    @staticmethod
+    def _spans(tokenizer, text):
+        """
+        :return: The start and end of each token a tokenizer finds in text.
+        :rtype: list(tuple(int, int))
+        """
 
-                    # Go through each file.
-                    for pdf_parse_file in pdf_parses_file_list:
-                        # Increment the count for total number of PDFs parses.
-                        metadata_total_pdf_count += 1
+        try:
+            return list(tokenizer.span_tokenize(text))
 
-            # Check if there is both a PMC parse for this paper.
-            if (row['pmc_json_files'] != ''):
-                metadata_pmc_count += 1
+        # Not every tokenizer can give offsets, so find where its tokens are in the text.
+        except NotImplementedError:
+            return align_tokens(tokenizer.tokenize(text), text)
 
-        # Print information about corpus from metadata.csv.
-        print('metadata.csv:')
-        print('\tRows:', metadata_row_count)
-        print('\tUnique cord_uids:', len(unique_cord_uid_dictionary.items()))
-        print('\tRows with PDF Parses:', metadata_pdf_count)
-        print('\tRows with PMC Parses:', metadata_pmc_count)
-        print('\tRows with PDF Parses and No PMC Parses:', metadata_pdf_no_pmc_count)
-        print('\tRows with PMC Parses and No PDF Parses:', metadata_pmc_no_pdf_count)
-        print('\tRows with Both:', metadata_both_count)
-        print('\tRows with Neither:', metadata_neither_count)
-        print('\tTotal PDF Parse File:', metadata_total_pdf_count)
+    def section_text(self, section):
+        """
+        :return: The text of a section, by its number.
+        :rtype: str
+        """
 
-        # Print information for the parse directories.
-        print('Parse Directories:')
-        pdf_parse_list = os.listdir(self._root + 'document_parses/pdf_json/')
-        print('\tpdf_json:', len(pdf_parse_list))
-        pmc_parse_list = os.listdir(self._root + 'document_parses/pmc_json/')
-        print('\tpmc_json:', len(pmc_parse_list))
-        # print('\tpdf_parse_has_more:', pdf_parse_has_more)
-        # print('\tpmc_parse_has_more:', pmc_parse_has_more)
-        # print('\tboth_parses_same:', both_parses_same)
+        return self.text[self.section_offsets[section]:self.section_offsets[section + 1] - 1]
 
-    def citations(self, fileids=None):
+    def sentence_spans(self):
         """
-        :return: Returns the citations for a fileid, list of fileids, or all the fileids.
-        :rtype: dict(dict)
+        :return: The (section, start, end) of each sentence, where section is
+            the number of the section the sentence is in, and start and end
+            are offsets into the text of that section.
+        :rtype: CORD19SpanView
         """
 
-        # Check if no fileids are specified.
-        if (fileids is None):
+        return CORD19SpanView(self.sentence_bounds, self.section_offsets, self.section_starts)
 
-            # Use the fileids in this corpus.
-            fileids = self._fileids
+    def word_spans(self):
+        """
+        :return: The (section, start, end) of each word, where section is the
+            number of the section the word is in, and start and end are
+            offsets into the text of that section.
+        :rtype: CORD19SpanView
+        """
 
-        # Check if the fileids is actually a string.
-        elif isinstance(fileids, str):
+        # Check that the offsets of the tokens were found.
+        if (self.token_bounds is None):
+            raise ValueError('The offsets of the tokens were not found; tokenize with offsets=True')
 
-            # Make a list containing that string.
-            fileids = [fileids]
+        # The token number each section starts at.
+        section_token_starts = array.array('Q', map(self.sentence_starts.__getitem__, self.section_starts))
 
-        # Make a dictionry to store the raw texts.
-        citations_dictionary = {}
+        return CORD19SpanView(self.token_bounds, self.section_offsets, section_token_starts)
 
-        # Go through each file ID in the list.
-        for fileid in fileids:
+    def words(self):
+        """
+        :return: List of the words of every sentence, one after another.
+        :rtype: list(str)
+        """
 
-            # Open the file.
-            # TODO: Should use self.open() here from CorpusReader like PlaintextCorpusReader?
-            file_in = open(self.root + '/' + fileid, 'r')
+        # Check if the words were given, instead of being the text between the offsets of the tokens.
+        if (self._sentences is not None):
+            return list(itertools.chain.from_iterable(self._sentences))
 
-            # Read the contents of the file.
-            file_text = file_in.read()
+        token_bounds = self.token_bounds
 
-            # Close the file.
-            file_in.close()
+        return list(map(self.text.__getitem__, map(slice, token_bounds[0::2], token_bounds[1::2])))
 
-            # Make a JSON object from the text.
-            json_object = json.loads(file_text)
-            # print(str(json_object))
+    def sentences(self):
+        """
+        :return: List of sentences, which are each a list of words.
+        :rtype: list(list(str))
+        """
 
-            # Put an empty dictionary for this entry.
-            citations_dictionary[fileid] = {}
+        # Check if the sentences haven't been sliced out of the text yet.
+        if (self._sentences is None):
+            words = self.words()
+            sentence_starts = self.sentence_starts
+            self._sentences = [
+                words[sentence_starts[i]:sentence_starts[i + 1]] for i in range(len(sentence_starts) - 1)
+            ]
 
-            # print(json_object)
+        return self._sentences
 
-            # Check whether this JSON object has a key for the citations.
-            if ('bib_entries' in json_object):
-                # Concatenate the title.
-                citations_dictionary[fileid] = json_object['bib_entries']
+    def paragraphs(self):
+        """
+        :return: List of paragraphs, one for each section, which are each a
+            list of sentences, which are each a list of words.
+        :rtype: list(list(list(str)))
+        """
 
-        # Concatenate the items in the list and return the result.
+        sentences = self.sentences()
+        section_starts = self.section_starts
+
+        return [sentences[section_starts[i]:section_starts[i + 1]] for i in range(len(section_starts) - 1)]
+
+
+class CORD19SpanTokenizer(object):
+    """
+    Splits all the sections of a document into sentences and words in one
+    batched pass, giving the offsets of every sentence and every token. Most of the time tokenizing goes to Punkt deciding whether each
+    period ends a sentence, which only depends on the period's token and the
+    token after it, so the decisions are remembered instead of made again
+    for every "et al." and "patients. The".
+
+    A single sweep of the compiled pattern of the word tokenizer over the
+    whole document gives the offsets of the tokens, without making a string
+    for any of them, and each sentence gets the tokens between its offsets,
+    found by bisecting. In the rare section where a sentence ends in the
+    middle of a token (like '.)' split after the period), the sentences of
+    that section are swept one at a time, so the words always come out the
+    same as tokenizing each sentence. The words themselves are only sliced
+    out of the text when they're asked for.
+
+    This only works for tokenizers that split text the way a
+    WordPunctTokenizer and a PunktSentenceTokenizer do; supports() tells.
+    """
+
+    # The pattern of WordPunctTokenizer, whose tokens are the runs of word characters and of other non-space characters.
+    WORD_PUNCT_PATTERN = r'\w+|[^\w\s]+'
+
+    # The most decisions about possible sentence breaks to remember.
+    SENTENCE_BREAK_CACHE_SIZE = 1 << 16
+
+    def __init__(self, word_tokenizer, sent_tokenizer):
+        """
+        :param word_tokenizer: A tokenizer splitting text the way WordPunctTokenizer does.
+        :param sent_tokenizer: A PunktSentenceTokenizer.
+        """
+
+        # Use a copy of the sentence tokenizer that remembers its decisions.
+        self._sent_tokenizer = copy.copy(sent_tokenizer)
+        self._sent_tokenizer.text_contains_sentbreak = functools.lru_cache(self.SENTENCE_BREAK_CACHE_SIZE)(
+            sent_tokenizer.text_contains_sentbreak
+        )
+
+        # The word tokenizer's pattern, to find the offsets of the tokens with.
+        self._word_regexp = re.compile(word_tokenizer._pattern, word_tokenizer._flags)
+
+    @classmethod
+    def supports(cls, word_tokenizer, sent_tokenizer):
+        """
+        :return: Whether a pair of tokenizers can be replaced by a CORD19SpanTokenizer.
+        :rtype: bool
+        """
+
+        # Make sure a lazily loaded sentence tokenizer is loaded, so its class can be checked.
+        getattr(sent_tokenizer, 'span_tokenize', None)
+
+        # The word tokenizer has to match tokens with the pattern of WordPunctTokenizer, without changing how it's used.
+        if (not isinstance(word_tokenizer, RegexpTokenizer) or type(word_tokenizer).tokenize is not RegexpTokenizer.tokenize):
+            return False
+
+        if (word_tokenizer._gaps or word_tokenizer._pattern != cls.WORD_PUNCT_PATTERN):
+            return False
+
+        # The sentence tokenizer has to be a Punkt tokenizer whose sentences are the text between its spans.
+        if (not isinstance(sent_tokenizer, PunktSentenceTokenizer)):
+            return False
+
+        return (
+            type(sent_tokenizer).tokenize is PunktSentenceTokenizer.tokenize
+            and type(sent_tokenizer).sentences_from_text is PunktSentenceTokenizer.sentences_from_text
+        )
+
+    def tokenize(self, sections, offsets=False, profile=None):
+        """
+        When the offsets of the tokens are asked for, the whole text is swept
+        once for them, and the words are only sliced out of the text if
+        they're asked for too. Otherwise, the words of each sentence are
+        found on their own, straight from the joined text: a sweep makes a
+        match object for every token, which takes about twice as long as
+        making just the words, so it's only done when the offsets are needed.
+
+        :param sections: List of the text of each section.
+        :param offsets: Whether to find the offsets of the tokens too.
+        :param profile: The CORD19Profile to add the time spent splitting sentences and words to, if any.
+        :return: The sentences and tokens of the sections.
+        :rtype: CORD19TokenSpans
+        """
+
+        # Join the sections by newlines, which no token can span.
+        text = '\n'.join(sections)
+
+        # Check if the offsets of the tokens are needed, and sweep the whole text once to find them.
+        if (offsets):
+            if (profile is not None):
+                start_time = time.perf_counter()
+
+            token_bounds = self._sweep(text, 0, len(text))
+            token_starts = token_bounds[0::2]
+            token_ends = token_bounds[1::2]
+
+            if (profile is not None):
+                profile.add('words', time.perf_counter() - start_time, len(text))
+
+            sentence_starts = array.array('Q')
+
+            # The first and last token of each section swept again a sentence at a time, with the offsets of its
+            # tokens, and how many more tokens those sections have than the sweep found in them.
+            swept_again = []
+            shift = 0
+
+        else:
+            findall = self._word_regexp.findall
+            sentences = []
+
+        section_offsets = array.array('Q')
+        sentence_bounds = array.array('Q')
+        section_starts = array.array('Q')
+
+        offset = 0
+        for section in sections:
+            section_offsets.append(offset)
+            section_starts.append(len(sentence_bounds) // 2)
+
+            if (profile is not None):
+                start_time = time.perf_counter()
+
+            # Split the section into sentences.
+            spans = [(offset + start, offset + end) for (start, end) in self._sent_tokenizer.span_tokenize(section)]
+            sentence_bounds.extend(itertools.chain.from_iterable(spans))
+
+            if (profile is not None):
+                profile.add('sentences', time.perf_counter() - start_time, len(section))
+
+            # Check if just the words of each sentence are needed, and find them without copying the sentences.
+            if (not offsets):
+                if (profile is not None):
+                    start_time = time.perf_counter()
+
+                sentences.extend(findall(text, start, end) for (start, end) in spans)
+
+                if (profile is not None):
+                    profile.add('words', time.perf_counter() - start_time, len(section))
+
+            else:
+                # The tokens in this section, and the tokens between the offsets of each sentence.
+                first_token = bisect.bisect_left(token_starts, offset)
+                last_token = bisect.bisect_left(token_starts, offset + len(section), first_token)
+                token_ranges = [
+                    (
+                        bisect.bisect_left(token_starts, start, first_token, last_token),
+                        bisect.bisect_right(token_ends, end, first_token, last_token),
+                    )
+                    for (start, end) in spans
+                ]
+
+                # Check that every token of the section is in exactly one sentence.
+                if (sum(max(0, end - start) for (start, end) in token_ranges) == last_token - first_token):
+                    sentence_starts.extend(start + shift for (start, end) in token_ranges)
+
+                # Otherwise, a sentence ends inside a token, so sweep each sentence on its own.
+                else:
+                    section_token_bounds = array.array('Q')
+                    for (start, end) in spans:
+                        sentence_starts.append(first_token + shift + len(section_token_bounds) // 2)
+                        section_token_bounds.extend(self._sweep(text, start, end))
+
+                    swept_again.append((first_token, last_token, section_token_bounds))
+                    shift += len(section_token_bounds) // 2 - (last_token - first_token)
+
+            # The next section starts after the newline.
+            offset += len(section) + 1
+
+        section_offsets.append(offset)
+        section_starts.append(len(sentence_bounds) // 2)
+
+        # Check if the words were found with their offsets, and put the tokens of any sections swept again in place of
+        # the sweep's.
+        if (offsets):
+            if (swept_again):
+                sweep_bounds = token_bounds
+                token_bounds = array.array('Q')
+                next_token = 0
+                for (first_token, last_token, section_token_bounds) in swept_again:
+                    token_bounds.extend(sweep_bounds[2 * next_token:2 * first_token])
+                    token_bounds.extend(section_token_bounds)
+                    next_token = last_token
+                token_bounds.extend(sweep_bounds[2 * next_token:])
+
+            sentence_starts.append(len(token_bounds) // 2)
+            sentences = None
+
+        # Otherwise, count where each sentence starts.
+        else:
+            sentence_starts = array.array('Q', itertools.accumulate(map(len, sentences), initial=0))
+            token_bounds = None
+
+        return CORD19TokenSpans(
+            text, section_offsets, sentence_bounds, sentence_starts, section_starts, token_bounds, sentences
+        )
+
+    def _sweep(self, text, start, end):
+        """
+        :return: The start and end offset in text of each token between the
+            start and end offsets, one after another.
+        :rtype: array
+        """
+
+        # Take the offsets straight from the matches, without making a string for any token.
+        return array.array('Q', itertools.chain.from_iterable(map(re.Match.span, self._word_regexp.finditer(text, start, end))))
+
+
+class CORD19MetadataColumn(object):
+    """
+    A column of metadata.csv with few distinct values (e.g., license,
+    source_x, or journal), stored as an array of small integer codes into a
+    list of the distinct values instead of one string per row.
+    """
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self, column_list):
+        """
+        :param column_list: The list of values in the column.
+        """
+
+        # Dictionary of value to its code.
+        value_codes = {}
+
+        # The distinct values in the order they were first seen.
+        self.values = []
+
+        # Go through each value, handing out codes to new ones.
+        for value in column_list:
+            if (value not in value_codes):
+                value_codes[value] = len(self.values)
+                self.values.append(value)
+
+        # Use the smallest type of array that will fit the codes.
+        if (len(self.values) <= 1 << 8):
+            typecode = 'B'
+        elif (len(self.values) <= 1 << 16):
+            typecode = 'H'
+        else:
+            typecode = 'I'
+
+        self.codes = array.array(typecode, [value_codes[value] for value in column_list])
+
+    def __getitem__(self, row_number):
+        return self.values[self.codes[row_number]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+
+class CORD19MetadataTextColumn(object):
+    """
+    A column of metadata.csv with mostly distinct values (e.g., title or
+    abstract), stored as all the values encoded into one block of bytes
+    plus an array of where each value starts, instead of one string per row.
+    Strings are only made when values are accessed.
+    """
+
+    __slots__ = ('data', 'offsets')
+
+    def __init__(self, column_list):
+        """
+        :param column_list: The list of values in the column.
+        """
+
+        # Encode all the values.
+        encoded_values = [value.encode('utf8') for value in column_list]
+
+        # Record where each value starts, with a final entry for where the last one ends.
+        self.offsets = array.array('Q', [0])
+        position = 0
+        for encoded_value in encoded_values:
+            position += len(encoded_value)
+            self.offsets.append(position)
+
+        # Join all the values together.
+        self.data = b''.join(encoded_values)
+
+    def __getitem__(self, row_number):
+        # Make sure negative row numbers don't pick up the final offset.
+        if (row_number < 0):
+            row_number += len(self)
+        return self.data[self.offsets[row_number]:self.offsets[row_number + 1]].decode('utf8')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return (self[row_number] for row_number in range(len(self)))
+
+
+class CORD19MetadataRow(Mapping):
+    """
+    A read-only, dictionary-like view of one row in a CORD19MetadataIndex.
+    Values are looked up in the index's columns when they're accessed, so a
+    view is much smaller than a dictionary holding a copy of the row.
+    """
+
+    __slots__ = ('_index', '_row_number')
+
+    def __init__(self, index, row_number):
+        self._index = index
+        self._row_number = row_number
+
+    def __getitem__(self, fieldname):
+        return self._index.columns[fieldname][self._row_number]
+
+    def __iter__(self):
+        return iter(self._index.fieldnames)
+
+    def __len__(self):
+        return len(self._index.fieldnames)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CORD19MetadataColumnIndex(object):
+    """
+    Index of the values in one column of a CORD19MetadataIndex, for finding
+    the rows with a value, or a range of values, without going through every
+    row. The row numbers are stored sorted by their values, so the rows with
+    a range of values are a slice found by binary search. Columns with few
+    distinct values also get a hash table of each value to its slice.
+
+    Columns holding lists separated by '; ' (like source_x) are indexed by
+    each item in the list, so a row is found by any of its items.
+    """
+
+    # Columns holding lists of values separated by '; '.
+    LIST_COLUMNS = ('source_x',)
+
+    # A string that sorts after any string starting with the same characters.
+    MAXIMUM_CHARACTER = '\U0010ffff'
+
+    def __init__(self, column, split=False):
+        """
+        :param column: The column to index.
+        :param split: Whether to index each item of the lists in the column.
+        """
+
+        # Make a list of each value alongside its row number, leaving out padding from short rows.
+        entries = []
+        for (row_number, value) in enumerate(column):
+            value = value or ''
+
+            # Check whether to index each item in the value.
+            if (split and value):
+                entries.extend((item, row_number) for item in value.split('; '))
+            else:
+                entries.append((value, row_number))
+
+        # Sort them by value.
+        entries.sort()
+
+        values = [value for (value, row_number) in entries]
+        self.rows = array.array('I', [row_number for (value, row_number) in entries])
+
+        # Check if there's few enough distinct values to store them as codes, and hash where each one's rows are.
+        distinct_values = set(values)
+        if (len(distinct_values) <= CORD19MetadataIndex.ENCODED_COLUMN_RATIO * len(values)):
+            self.values = CORD19MetadataColumn(values)
+            self.value_slices = {}
+            for value in distinct_values:
+                self.value_slices[value] = (bisect.bisect_left(values, value), bisect.bisect_right(values, value))
+
+        # Otherwise, store the values as a block of text, and find values by binary search.
+        else:
+            self.values = CORD19MetadataTextColumn(values)
+            self.value_slices = None
+
+    def rows_equal(self, value):
+        """
+        :return: The numbers of the rows with a value.
+        :rtype: array
+        """
+
+        # Check if the value can be looked up in the hash table.
+        if (self.value_slices is not None):
+            (start, end) = self.value_slices.get(value, (0, 0))
+
+        # Otherwise, search for where the value's rows are.
+        else:
+            start = bisect.bisect_left(self.values, value)
+            end = bisect.bisect_right(self.values, value)
+
+        return self.rows[start:end]
+
+    def rows_between(self, start=None, end=None):
+        """
+        :return: The numbers of the rows with values from start to end. A value
+            is after the end only if it's after the end once cut to the end's
+            length, so an end of '2020-03' includes '2020-03-31'. Leave start
+            or end as None to leave that side of the range open.
+        :rtype: array
+        """
+
+        # Find where the rows in the range start.
+        if (start is None):
+            start_position = 0
+        else:
+            start_position = bisect.bisect_left(self.values, start)
+
+        # Find where they end.
+        if (end is None):
+            end_position = len(self.rows)
+        else:
+            end_position = bisect.bisect_right(self.values, end + self.MAXIMUM_CHARACTER)
+
+        return self.rows[start_position:max(start_position, end_position)]
+
+
+class CORD19MetadataIndex(object):
+    """
+    Index of the rows in metadata.csv.
+
+    The rows are stored column by column, and the row numbers are indexed by
+    cord_uid and by each individual parse fileid listed in the
+    pdf_json_files and pmc_json_files columns. Counts used by statistics()
+    are also collected while building the index, so the whole thing can be
+    pickled once and answer everything without rereading metadata.csv.
+
+    Columns with few distinct values are stored as CORD19MetadataColumn
+    arrays of codes, and the other columns as CORD19MetadataTextColumn blocks
+    of bytes, so there aren't millions of small string objects to hold.
+    """
+
+    # Increment this when the layout of the index changes, so old pickles get rebuilt.
+    VERSION = 3
+
+    # Columns with at most this fraction of distinct values are stored as arrays of codes.
+    ENCODED_COLUMN_RATIO = 0.25
+
+    def __init__(self, fieldnames, columns):
+        """
+        :param fieldnames: The names of the columns, in the order of the CSV header.
+        :param columns: Dictionary of column name to the list of values in that column.
+        """
+
+        self.fieldnames = list(fieldnames)
+        self.columns = columns
+
+        # Count the rows.
+        if (self.fieldnames):
+            self.row_count = len(columns[self.fieldnames[0]])
+        else:
+            self.row_count = 0
+
+        # Dictionaries from a key to the list of row numbers with that key.
+        self.cord_uid_rows = {}
+        self.fileid_rows = {}
+
+        # The sorted numbers of the rows with a PDF parse and with a PMC parse, for select().
+        self.parse_rows = {'pdf_json_files': array.array('I'), 'pmc_json_files': array.array('I')}
+
+        # Counts reported by statistics().
+        self.counts = {
+            'rows': self.row_count,
+            'unique_cord_uids': 0,
+            'pdf': 0,
+            'pmc': 0,
+            'pdf_no_pmc': 0,
+            'pmc_no_pdf': 0,
+            'both': 0,
+            'neither': 0,
+            'total_pdf': 0,
+        }
+
+        cord_uids = columns['cord_uid']
+        pdf_json_files = columns['pdf_json_files']
+        pmc_json_files = columns['pmc_json_files']
+
+        # Go through each row in the metadata.
+        for row_number in range(self.row_count):
+
+            # Index the row by its cord_uid.
+            self.cord_uid_rows.setdefault(cord_uids[row_number], []).append(row_number)
+
+            pdf_parse_value = pdf_json_files[row_number]
+            pmc_parse_value = pmc_json_files[row_number]
+
+            # Check if there is both a PDF parse and a PMC parse for this paper.
+            if (pdf_parse_value and pmc_parse_value):
+                self.counts['both'] += 1
+
+            # Check if there is neither a PDF parse and a PMC parse for this paper.
+            elif (not pdf_parse_value and not pmc_parse_value):
+                self.counts['neither'] += 1
+
+            # Check if there is a PDF parse, but a PMC parse for this paper.
+            elif (pdf_parse_value):
+                self.counts['pdf_no_pmc'] += 1
+
+            # Otherwise, there is not a PDF parse, but is a PMC parse for this paper.
+            else:
+                self.counts['pmc_no_pdf'] += 1
+
+            # Check if there is a PDF parse for this paper.
+            if (pdf_parse_value):
+                self.counts['pdf'] += 1
+                self.parse_rows['pdf_json_files'].append(row_number)
+
+                # The PDF parses can actually be a list of files, so index each file.
+                for pdf_parse_file in pdf_parse_value.split('; '):
+                    self.fileid_rows.setdefault(pdf_parse_file, []).append(row_number)
+                    self.counts['total_pdf'] += 1
+
+            # Check if there is a PMC parse for this paper.
+            if (pmc_parse_value):
+                self.counts['pmc'] += 1
+                self.parse_rows['pmc_json_files'].append(row_number)
+                self.fileid_rows.setdefault(pmc_parse_value, []).append(row_number)
+
+        self.counts['unique_cord_uids'] = len(self.cord_uid_rows)
+
+    @classmethod
+    def from_csv(cls, path, encoding):
+        """
+        :return: An index built by parsing the CSV file at path.
+        :rtype: CORD19MetadataIndex
+        """
+
+        # Open the CSV file.
+        with open(path, 'r', newline='', encoding=encoding) as csv_file:
+            return cls.from_csv_file(csv_file)
+
+    @classmethod
+    def from_csv_file(cls, csv_file):
+        """
+        :return: An index built by parsing an open CSV file, which has to be
+            opened in text mode with newline=''.
+        :rtype: CORD19MetadataIndex
+        """
+
+        # Take whole lines from the beginning of the file, about 64 KB of them, so the sample doesn't end mid-field.
+        sample_lines = []
+        sample_size = 0
+        while (sample_size < 1 << 16):
+            line = csv_file.readline()
+
+            # Check if the end of the file was reached.
+            if (not line):
+                break
+
+            sample_lines.append(line)
+            sample_size += len(line)
+
+        # Try finding the dialect from the sample.
+        try:
+            dialect = csv.Sniffer().sniff(''.join(sample_lines))
+
+        # A quoted field spanning lines can still confuse the sniffer, and metadata.csv is plain comma-separated.
+        except csv.Error:
+            dialect = csv.excel
+
+        # Reset to the beginning of the file.
+        csv_file.seek(0)
+
+        # Setup a CSV reader on the file.
+        csv_reader = csv.reader(csv_file, dialect=dialect)
+
+        # The first row holds the column names.
+        fieldnames = next(csv_reader, [])
+
+        # Make an empty list for each column.
+        column_lists = [[] for fieldname in fieldnames]
+
+        # Go through each row in the metadata.
+        for row in csv_reader:
+
+            # Skip blank lines like csv.DictReader does.
+            if (not row):
+                continue
+
+            # Short rows are padded with None like csv.DictReader does.
+            if (len(row) < len(fieldnames)):
+                row = row + [None] * (len(fieldnames) - len(row))
+
+            # Add each value to its column.
+            for (column_list, value) in zip(column_lists, row):
+                column_list.append(value)
+
+        # Make an empty dictionary to hold the compacted columns.
+        columns = {}
+
+        # Go through each column.
+        for (fieldname, column_list) in zip(fieldnames, column_lists):
+
+            # Check if there's few enough distinct values to store the column as codes.
+            # Padding from short rows is None, which also has to be stored as a code.
+            if (len(set(column_list)) <= cls.ENCODED_COLUMN_RATIO * len(column_list) or None in column_list):
+                columns[fieldname] = CORD19MetadataColumn(column_list)
+
+            # Otherwise, store the column as a block of text.
+            else:
+                columns[fieldname] = CORD19MetadataTextColumn(column_list)
+
+        return cls(fieldnames, columns)
+
+    def row(self, row_number):
+        """
+        :return: A row of the metadata as a dictionary of column name to value.
+        :rtype: dict
+        """
+
+        return {fieldname: self.columns[fieldname][row_number] for fieldname in self.fieldnames}
+
+    def rows(self, row_numbers):
+        """
+        :return: A list of rows of the metadata, each as a dictionary.
+        :rtype: list(dict)
+        """
+
+        return [self.row(row_number) for row_number in row_numbers]
+
+    def row_views(self, row_numbers):
+        """
+        :return: A list of rows of the metadata, each as a CORD19MetadataRow view.
+        :rtype: list(CORD19MetadataRow)
+        """
+
+        return [CORD19MetadataRow(self, row_number) for row_number in row_numbers]
+
+
+class CORD19Pack(object):
+    """
+    A packed copy of the parse files of a CORD-19 corpus. The files are written
+    one after another into a few large shard files, and an index records which
+    shard each file is in and where. Reading a file is then just slicing the
+    memory-mapped shard, instead of opening and reading a small file.
+    """
+
+    # Increment this when the layout of the pack changes, so old packs aren't misread.
+    VERSION = 1
+
+    # The names of the files making up a pack.
+    INDEX_FILE = 'pack_index.pickle'
+    SHARD_FILE = 'shard%05d.bin'
+
+    def __init__(self, directory):
+
+        self.directory = directory
+
+        # Load the index of fileid to (shard number, offset, length).
+        with open(os.path.join(directory, self.INDEX_FILE), 'rb') as index_file:
+            (version, self.shard_count, self.locations) = pickle.load(index_file)
+
+        # Check if the pack was written by a different version of the reader.
+        if (version != self.VERSION):
+            raise ValueError('Pack in %s is version %r, expected %r' % (directory, version, self.VERSION))
+
+        # Views of the memory-mapped shards, which are mapped the first time a file is read.
+        self._shard_views = None
+
+    def __getstate__(self):
+
+        # Copy the attributes of the pack.
+        state = self.__dict__.copy()
+
+        # Memory maps can't be pickled, so they're mapped again when needed.
+        state['_shard_views'] = None
+
+        return state
+
+    @classmethod
+    def write(cls, directory, files, shard_size=1 << 30):
+        """
+        Packs files, given as (fileid, bytes) pairs, into shards of about
+        shard_size bytes each in directory.
+        """
+
+        # Make sure the directory exists.
+        os.makedirs(directory, exist_ok=True)
+
+        # Dictionary of fileid to (shard number, offset, length).
+        locations = {}
+
+        shard_number = 0
+        shard_file = open(os.path.join(directory, cls.SHARD_FILE % shard_number), 'wb')
+
+        try:
+            # Go through each file.
+            for (fileid, file_data) in files:
+
+                # Check if the shard is full, and start the next one.
+                offset = shard_file.tell()
+                if (offset > 0 and offset + len(file_data) > shard_size):
+                    shard_file.close()
+                    shard_number += 1
+                    shard_file = open(os.path.join(directory, cls.SHARD_FILE % shard_number), 'wb')
+                    offset = 0
+
+                # Add the file to the shard.
+                shard_file.write(file_data)
+                locations[fileid] = (shard_number, offset, len(file_data))
+
+        finally:
+            shard_file.close()
+
+        # Write the index last, and atomically, so a pack is only usable once it's complete.
+        (file_descriptor, temporary_path) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(file_descriptor, 'wb') as index_file:
+            pickle.dump((cls.VERSION, shard_number + 1, locations), index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, os.path.join(directory, cls.INDEX_FILE))
+
+    def fileids(self):
+        """
+        :return: The sorted fileids of the files in the pack.
+        :rtype: list(str)
+        """
+
+        return sorted(self.locations)
+
+    def size(self, fileid):
+        """
+        :return: The length in bytes of a file in the pack.
+        :rtype: int
+        """
+
+        return self.locations[fileid][2]
+
+    def stream(self, fileid):
+        """
+        :return: A binary stream reading a file in the pack.
+        :rtype: io.RawIOBase
+        """
+
+        return CORD19SliceStream(self.data(fileid))
+
+    def data(self, fileid):
+        """
+        :return: The bytes of a file in the pack, as a view of the memory-mapped
+            shard, so nothing is copied until it's decoded.
+        :rtype: memoryview
+        """
+
+        # Check if the shards still need to be mapped.
+        if (self._shard_views is None):
+            self._shard_views = [self._map_shard(shard_number) for shard_number in range(self.shard_count)]
+
+        (shard_number, offset, length) = self.locations[fileid]
+
+        return self._shard_views[shard_number][offset:offset + length]
+
+    def _map_shard(self, shard_number):
+        """
+        :return: A view of a whole shard file, memory-mapped read-only.
+        :rtype: memoryview
+        """
+
+        with open(os.path.join(self.directory, self.SHARD_FILE % shard_number), 'rb') as shard_file:
+
+            # An empty file can't be mapped, but then there's nothing to read from it anyway.
+            if (os.fstat(shard_file.fileno()).st_size == 0):
+                return memoryview(b'')
+
+            return memoryview(mmap.mmap(shard_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class CORD19Archive(CORD19Pack):
+    """
+    A CORD-19 release archive, either a zip file or an uncompressed tar file,
+    read in place like a pack. Files stored without compression are sliced
+    straight out of the memory-mapped archive, and compressed zip members are
+    decompressed when they're read. The fileids are the paths of the files
+    from document_parses on, wherever the corpus is inside the archive.
+    """
+
+    # Increment this when the member index changes, so old cached indexes aren't used.
+    VERSION = 1
+
+    def __init__(self, path, locations):
+
+        self.directory = path
+
+        # Dictionary of fileid to (0, offset, length) for files stored as is, or
+        # (None, member name, length) for compressed files.
+        self.locations = locations
+
+        # The archive itself is the only shard.
+        self.shard_count = 1
+        self._shard_views = None
+
+        # The zip file compressed files are read from, which is opened the first time it's needed.
+        self._zip_file = None
+
+    def __getstate__(self):
+
+        # Copy the attributes of the pack.
+        state = CORD19Pack.__getstate__(self)
+
+        # Open files can't be pickled, so the zip file is opened again when needed.
+        state['_zip_file'] = None
+
+        return state
+
+    @staticmethod
+    def corpus_fileid(name):
+        """
+        :return: The fileid for a file in an archive, which is its path from
+            document_parses on, or 'metadata.csv', or None if it isn't part of
+            the corpus.
+        :rtype: str
+        """
+
+        parts = name.split('/')
+
+        # Check if the file is a parse.
+        if ('document_parses' in parts[:-1]):
+            return '/'.join(parts[parts.index('document_parses'):])
+
+        # Check if the file is the metadata.
+        if (parts[-1] == 'metadata.csv'):
+            return 'metadata.csv'
+
+        return None
+
+    @staticmethod
+    def is_archive(path):
+        """
+        :return: Whether path is a zip or tar file.
+        :rtype: bool
+        """
+
+        return os.path.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+    @classmethod
+    def can_read_in_place(cls, path):
+        """
+        :return: Whether the archive can be read in place. Compressed tar files
+            can't be, since there's no way to jump to a file without
+            decompressing everything before it, and neither can archives with
+            the parses in another archive inside them.
+        :rtype: bool
+        """
+
+        # Zip files compress each file separately, so any file can be read by itself.
+        if (zipfile.is_zipfile(path)):
+            return True
+
+        try:
+            # Check whether the parses are right in the tar file.
+            with tarfile.open(path, 'r:') as tar_file:
+                for member in tar_file:
+                    if (member.isfile() and cls.corpus_fileid(member.name) not in (None, 'metadata.csv')):
+                        return True
+
+        # The tar file is compressed.
+        except tarfile.ReadError:
+            pass
+
+        return False
+
+    @classmethod
+    def from_path(cls, path):
+        """
+        :return: An archive with an index of where each file in it is, built
+            by reading the directory of the zip file or the headers of the tar file.
+        :rtype: CORD19Archive
+        """
+
+        locations = {}
+
+        # Check if it's a zip file.
+        if (zipfile.is_zipfile(path)):
+            with zipfile.ZipFile(path) as zip_file, open(path, 'rb') as archive_file:
+
+                # Go through each file in the zip file.
+                for info in zip_file.infolist():
+
+                    # Check if the file isn't part of the corpus.
+                    fileid = cls.corpus_fileid(info.filename)
+                    if (info.is_dir() or fileid is None):
+                        continue
+
+                    # Check if the file is compressed, so it has to be decompressed by zipfile.
+                    if (info.compress_type != zipfile.ZIP_STORED):
+                        locations[fileid] = (None, info.filename, info.file_size)
+                        continue
+
+                    # The file starts after its local header, which is 30 bytes plus the name and extra field.
+                    archive_file.seek(info.header_offset)
+                    (name_length, extra_length) = struct.unpack('<HH', archive_file.read(30)[26:30])
+                    offset = info.header_offset + 30 + name_length + extra_length
+
+                    locations[fileid] = (0, offset, info.file_size)
+
+        # Otherwise, it's a tar file, which stores each file as is after its header.
+        else:
+            with tarfile.open(path, 'r:') as tar_file:
+                for member in tar_file:
+
+                    # Check if the file is part of the corpus.
+                    fileid = cls.corpus_fileid(member.name)
+                    if (member.isfile() and fileid is not None):
+                        locations[fileid] = (0, member.offset_data, member.size)
+
+        return cls(path, locations)
+
+    @classmethod
+    def iterate_files(cls, path):
+        """
+        Generates (fileid, bytes) pairs for the files in the corpus in a tar
+        file, compressed or not, reading it from start to end. Tar files of
+        parses inside it, like document_parses.tar.gz in the releases, are
+        read too.
+        """
+
+        with tarfile.open(path, 'r|*') as tar_file:
+            for item in cls._iterate_tar_files(tar_file):
+                yield item
+
+    @classmethod
+    def _iterate_tar_files(cls, tar_file):
+
+        # Go through the members in the order they're stored.
+        for member in tar_file:
+
+            # Skip directories and links.
+            if (not member.isfile()):
+                continue
+
+            # Check if the member is an archive of parses, and read the files in it.
+            if (os.path.basename(member.name).startswith('document_parses.tar')):
+                with tarfile.open(fileobj=tar_file.extractfile(member), mode='r|*') as inner_tar_file:
+                    for item in cls._iterate_tar_files(inner_tar_file):
+                        yield item
+                continue
+
+            # Check if the file is part of the corpus, and read it.
+            fileid = cls.corpus_fileid(member.name)
+            if (fileid is not None):
+                yield (fileid, tar_file.extractfile(member).read())
+
+    def stream(self, fileid):
+
+        (shard_number, member_name, length) = self.locations[fileid]
+
+        # Check if the file is compressed, and let zipfile decompress it as it's read.
+        if (shard_number is None):
+            return self._zip().open(member_name)
+
+        return CORD19Pack.stream(self, fileid)
+
+    def data(self, fileid):
+
+        (shard_number, member_name, length) = self.locations[fileid]
+
+        # Check if the file is compressed, and decompress all of it.
+        if (shard_number is None):
+            return self._zip().read(member_name)
+
+        return CORD19Pack.data(self, fileid)
+
+    def _map_shard(self, shard_number):
+
+        with open(self.directory, 'rb') as archive_file:
+            return memoryview(mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _zip(self):
+        """
+        :return: The archive opened as a zip file.
+        :rtype: zipfile.ZipFile
+        """
+
+        # Check if the zip file still needs to be opened.
+        if (self._zip_file is None):
+            self._zip_file = zipfile.ZipFile(self.directory)
+
+        return self._zip_file
+
+
+class CORD19SliceStream(io.RawIOBase):
+    """
+    A read-only binary stream over a memoryview, so a file in a pack can be
+    read by the corpus views like any other file.
+    """
+
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+
+        # Check if the rest of the view should be read.
+        if (size is None or size < 0):
+            end = len(self._view)
+        else:
+            end = min(len(self._view), self._position + size)
+
+        # Copy out the bytes being read.
+        data = bytes(self._view[self._position:end])
+        self._position = max(self._position, end)
+
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+
+        # Work out the new position from where it's relative to.
+        if (whence == io.SEEK_SET):
+            position = offset
+        elif (whence == io.SEEK_CUR):
+            position = self._position + offset
+        elif (whence == io.SEEK_END):
+            position = len(self._view) + offset
+        else:
+            raise ValueError('Invalid whence: %r' % whence)
+
+        self._position = max(0, position)
+
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+class CORD19GzipPathPointer(GzipFileSystemPathPointer):
+    """
+    A path pointer to a gzip compressed file, whose file_size() is the size
+    of the file once it's decompressed, since that's where corpus views
+    reading it have to stop.
+    """
+
+    def file_size(self):
+
+        # The decompressed size (modulo 2 ** 32) is stored in the last 4 bytes of the file.
+        with open(self._path, 'rb') as gzip_file:
+            gzip_file.seek(-4, 2)
+            return struct.unpack('<I', gzip_file.read(4))[0]
+
+
+class CORD19PackPathPointer(PathPointer):
+    """
+    A path pointer to a file in a CORD19Pack or CORD19Archive, or to the pack
+    itself when fileid is None, so a corpus reader can use a pack as its root.
+    """
+
+    def __init__(self, pack, fileid=None):
+        self._pack = pack
+        self._fileid = fileid
+
+    @property
+    def path(self):
+        """
+        :return: Where the file would be if the pack were unpacked.
+        :rtype: str
+        """
+
+        return os.path.join(self._pack.directory, self._fileid or '')
+
+    def open(self, encoding=None):
+        stream = self._pack.stream(self._fileid)
+
+        # Check if the stream should decode the bytes.
+        if (encoding is not None):
+            stream = SeekableUnicodeStreamReader(stream, encoding)
+
+        return stream
+
+    def file_size(self):
+        return self._pack.size(self._fileid)
+
+    def join(self, fileid):
+
+        # Check if the file is actually in the pack.
+        if (fileid not in self._pack.locations):
+            raise IOError('No such file in pack %s: %r' % (self._pack.directory, fileid))
+
+        return CORD19PackPathPointer(self._pack, fileid)
+
+    def __repr__(self):
+        return 'CORD19PackPathPointer(%r)' % self.path
+
+
+# The corpus reader used by a worker process, set up by _initialize_worker().
+_worker_reader = None
+
+
+def _initialize_worker(reader):
+    """
+    Sets up a worker process of a CORD19ParallelCorpusView to read with reader.
+    """
+
+    global _worker_reader
+    _worker_reader = reader
+
+
+def _call_in_worker(method_name, fileid, arguments):
+    """
+    :return: What the named method of the worker's corpus reader returns for a fileid and arguments.
+    :rtype: object
+    """
+
+    return getattr(_worker_reader, method_name)(fileid, *arguments)
+
+
+def _read_in_worker(block_reader_name, path, encoding, fileid):
+    """
+    :return: All the tokens the named block reader of the worker's corpus reader reads from a file.
+    :rtype: list
+    """
+
+    return _read_tokens(_worker_reader, block_reader_name, path, encoding, fileid)
+
+
+def _read_tokens(reader, block_reader_name, path, encoding, fileid):
+    """
+    :return: All the tokens the named block reader of a corpus reader reads from a file.
+    :rtype: list or CORD19SpanView
+    """
+
+    # Check if the block reader reads spans, and hand back the view over their offsets, which pickles as arrays.
+    if (block_reader_name in reader.SPAN_BLOCK_READERS):
+        return getattr(reader, reader.DOCUMENT_TOKENIZERS[block_reader_name])(reader.document(fileid))
+
+    # Give the block reader the fileid, like CORD19CorpusReader._corpus_view() does.
+    block_reader = functools.partial(getattr(reader, block_reader_name), fileid=fileid)
+
+    return list(reader.CorpusView(path, block_reader, encoding=encoding))
+
+
+def map_array(path, typecode):
+    """
+    :return: A view of a file holding an array of typecode items, memory-mapped read-only.
+    :rtype: memoryview
+    """
+
+    with open(path, 'rb') as array_file:
+
+        # An empty file can't be mapped, but then there's nothing to read from it anyway.
+        if (os.fstat(array_file.fileno()).st_size == 0):
+            return memoryview(array.array(typecode))
+
+        return memoryview(mmap.mmap(array_file.fileno(), 0, access=mmap.ACCESS_READ)).cast(typecode)
+
+
+def write_array(path, items):
+    """
+    Writes an array to a file, for map_array(). It's written to a temporary
+    file first, so readers never see a partial file.
+    """
+
+    (file_descriptor, temporary_path) = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(file_descriptor, 'wb') as array_file:
+        items.tofile(array_file)
+
+    # Move the finished file into place.
+    os.replace(temporary_path, path)
+
+
+def gallop(items, item, start, end):
+    """
+    :return: The position of the first of the sorted items from start up to
+        end that isn't less than item, galloping ahead from start and then
+        bisecting, so finding an item near start is quick.
+    :rtype: int
+    """
+
+    # Double the step until it passes the item.
+    step = 1
+    while (start + step < end and items[start + step] < item):
+        start += step
+        step *= 2
+
+    return bisect.bisect_left(items, item, start, min(start + step, end))
+
+
+def intersect_sorted(sorted_arrays):
+    """
+    :return: The integers in every one of some sorted arrays, going through
+        the shortest one and galloping through the others, each from where
+        it was last left off.
+    :rtype: array
+    """
+
+    sorted_arrays = sorted(sorted_arrays, key=len)
+    positions = [0] * len(sorted_arrays)
+    intersection = array.array('I')
+
+    for item in sorted_arrays[0]:
+
+        # Skip an item that's in the shortest array more than once.
+        if (intersection and intersection[-1] == item):
+            continue
+
+        # Find the item in each of the other arrays.
+        for array_number in range(1, len(sorted_arrays)):
+            items = sorted_arrays[array_number]
+            positions[array_number] = gallop(items, item, positions[array_number], len(items))
+
+            # Check if the array has no items left, so no later item can be in all of them.
+            if (positions[array_number] == len(items)):
+                return intersection
+
+            if (items[positions[array_number]] != item):
+                break
+
+        # Otherwise, it's in all of them.
+        else:
+            intersection.append(item)
+
+    return intersection
+
+
+class CORD19TokenIds(object):
+    """
+    The tokens of a corpus encoded as integer IDs, built by
+    CORD19CorpusReader.build_token_ids(). The IDs of all the tokens are stored
+    one document after another in a single memory-mapped array, along with
+    arrays of where each sentence, paragraph, and document starts, so going
+    through the whole corpus doesn't make a string for every token.
+    """
+
+    # The files holding the arrays, and the type of each array.
+    ARRAY_FILES = {
+        'token_ids': ('tokens.bin', 'I'),
+        'sentence_starts': ('sentences.bin', 'Q'),
+        'paragraph_starts': ('paragraphs.bin', 'Q'),
+        'document_starts': ('documents.bin', 'Q'),
+    }
+
+    def __init__(self, directory, fileids, vocabulary):
+
+        self.directory = directory
+
+        # The fileids in the order their documents are stored, and the words in the order of their IDs.
+        self.fileids = fileids
+        self.vocabulary = vocabulary
+
+        # Dictionaries to look up document numbers and word IDs.
+        self.document_numbers = {fileid: document_number for (document_number, fileid) in enumerate(fileids)}
+        self.word_ids = {word: word_id for (word_id, word) in enumerate(vocabulary)}
+
+        # Map the arrays.
+        # The token IDs of every token, the token number each sentence starts at,
+        # the sentence number each paragraph starts at, and the paragraph number each document starts at.
+        # Each of the starts arrays ends with where the last one ends.
+        for (name, (file_name, typecode)) in self.ARRAY_FILES.items():
+            setattr(self, name, self._map_array(file_name, typecode))
+
+    def __getstate__(self):
+
+        # Memory maps can't be pickled, so the arrays are mapped again by __setstate__().
+        return (self.directory, self.fileids, self.vocabulary)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @classmethod
+    def write(cls, directory, documents):
+        """
+        Encodes documents, given as (fileid, paragraphs) pairs, where the
+        paragraphs are lists of sentences, which are lists of words, and
+        writes the arrays to directory.
+
+        :return: The fileids of the documents and the vocabulary.
+        :rtype: tuple(list(str), list(str))
+        """
+
+        # Make sure the directory exists.
+        os.makedirs(directory, exist_ok=True)
+
+        fileids = []
+        vocabulary = []
+        word_ids = {}
+
+        # The starts arrays, which each begin with the start of the first one.
+        sentence_starts = array.array('Q', [0])
+        paragraph_starts = array.array('Q', [0])
+        document_starts = array.array('Q', [0])
+
+        # Write the token IDs to a temporary file as they're worked out, since there's too many to hold onto.
+        (file_descriptor, temporary_path) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(file_descriptor, 'wb') as tokens_file:
+
+            # Go through each document.
+            for (fileid, paragraphs) in documents:
+                fileids.append(fileid)
+
+                # Go through each sentence in each paragraph.
+                for sentence_list in paragraphs:
+                    for sentence in sentence_list:
+
+                        # Look up the ID of each word, giving new words the next ID.
+                        sentence_ids = array.array('I')
+                        for word in sentence:
+                            word_id = word_ids.get(word)
+                            if (word_id is None):
+                                word_id = word_ids[word] = len(vocabulary)
+                                vocabulary.append(word)
+                            sentence_ids.append(word_id)
+
+                        sentence_ids.tofile(tokens_file)
+                        sentence_starts.append(sentence_starts[-1] + len(sentence_ids))
+
+                    paragraph_starts.append(len(sentence_starts) - 1)
+
+                document_starts.append(len(paragraph_starts) - 1)
+
+        # Move the token IDs into place.
+        os.replace(temporary_path, os.path.join(directory, cls.ARRAY_FILES['token_ids'][0]))
+
+        # Write the starts arrays.
+        for (name, starts) in [('sentence_starts', sentence_starts), ('paragraph_starts', paragraph_starts),
+                               ('document_starts', document_starts)]:
+            write_array(os.path.join(directory, cls.ARRAY_FILES[name][0]), starts)
+
+        return (fileids, vocabulary)
+
+    def document_tokens(self, document_number):
+        """
+        :return: The IDs of the tokens in a document.
+        :rtype: memoryview
+        """
+
+        return self.token_ids[self._token_start(document_number):self._token_start(document_number + 1)]
+
+    def document_sentences(self, document_number):
+        """
+        :return: The sentences in a document, each as the IDs of its tokens.
+        :rtype: CORD19SentenceIdView
+        """
+
+        return CORD19SentenceIdView(self, self._sentence_start(document_number),
+                                    self._sentence_start(document_number + 1))
+
+    def _sentence_start(self, document_number):
+        return self.paragraph_starts[self.document_starts[document_number]]
+
+    def _token_start(self, document_number):
+        return self.sentence_starts[self._sentence_start(document_number)]
+
+    def _map_array(self, file_name, typecode):
+        return map_array(os.path.join(self.directory, file_name), typecode)
+
+
+class CORD19InvertedIndex(object):
+    """
+    A positional inverted index of the words of a corpus, built by
+    CORD19CorpusReader.build_index(). For each word, it stores which documents
+    the word is in, and where in each of them, in memory-mapped arrays.
+    """
+
+    # The words are split into this many buckets while building, so the postings are merged a bucket at a time.
+    BUCKET_COUNT = 64
+
+    # The files holding the arrays, and the type of each array.
+    ARRAY_FILES = {
+        'term_starts': ('terms.bin', 'Q'),
+        'posting_documents': ('documents.bin', 'I'),
+        'posting_starts': ('postings.bin', 'Q'),
+        'positions': ('positions.bin', 'I'),
+    }
+
+    def __init__(self, directory, fileids, terms):
+
+        self.directory = directory
+
+        # The fileids in the order of their document numbers, and a dictionary of each word to its term number.
+        self.fileids = fileids
+        self.terms = terms
+
+        # Map the arrays.
+        # The posting number each term's postings start at, the document number of each posting,
+        # and the position number each posting's positions start at, followed by the positions.
+        # Each of the starts arrays ends with where the last one ends.
+        for (name, (file_name, typecode)) in self.ARRAY_FILES.items():
+            setattr(self, name, map_array(os.path.join(directory, file_name), typecode))
+
+    def __getstate__(self):
+
+        # Memory maps can't be pickled, so the arrays are mapped again by __setstate__().
+        return (self.directory, self.fileids, self.terms)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @classmethod
+    def write(cls, directory, documents):
+        """
+        Builds the index from documents, given as (fileid, postings) pairs,
+        where the postings are a dictionary of each word in the document to
+        an array of its positions, and writes the arrays to directory.
+
+        :return: The fileids of the documents and the dictionary of terms.
+        :rtype: tuple(list(str), dict(int))
+        """
+
+        # Make sure the directory exists.
+        os.makedirs(directory, exist_ok=True)
+
+        fileids = []
+
+        # Make a temporary directory to hold the postings of each bucket until they're merged.
+        bucket_directory = tempfile.mkdtemp(dir=directory)
+
+        try:
+            bucket_files = [open(os.path.join(bucket_directory, '%d.pickle' % bucket_number), 'wb')
+                            for bucket_number in range(cls.BUCKET_COUNT)]
+
+            try:
+                # Go through each document.
+                for (fileid, postings) in documents:
+                    document_number = len(fileids)
+                    fileids.append(fileid)
+
+                    # Split the postings into buckets by word.
+                    buckets = [[] for bucket_number in range(cls.BUCKET_COUNT)]
+                    for (word, positions) in postings.items():
+                        buckets[hash(word) % cls.BUCKET_COUNT].append((word, positions))
+
+                    # Add the document's postings to each bucket.
+                    for (bucket_file, bucket) in zip(bucket_files, buckets):
+                        if (bucket):
+                            pickle.dump((document_number, bucket), bucket_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            finally:
+                for bucket_file in bucket_files:
+                    bucket_file.close()
+
+            terms = {}
+            term_starts = array.array('Q', [0])
+
+            # Write the postings to temporary files as they're merged, since there's too many to hold onto.
+            temporary_paths = {}
+            array_files = {}
+            for name in ['posting_documents', 'posting_starts', 'positions']:
+                (file_descriptor, temporary_paths[name]) = tempfile.mkstemp(dir=directory)
+                array_files[name] = os.fdopen(file_descriptor, 'wb')
+
+            try:
+                # The positions of the first posting start at the beginning.
+                array.array('Q', [0]).tofile(array_files['posting_starts'])
+                position_count = 0
+
+                # Go through each bucket.
+                for bucket_number in range(cls.BUCKET_COUNT):
+
+                    # Dictionary of each word in the bucket to a list of (document number, positions) pairs.
+                    bucket_postings = {}
+
+                    # Read back the postings of each document in the bucket, which were written in order of document number.
+                    with open(os.path.join(bucket_directory, '%d.pickle' % bucket_number), 'rb') as bucket_file:
+                        while (True):
+                            try:
+                                (document_number, bucket) = pickle.load(bucket_file)
+                            except EOFError:
+                                break
+
+                            for (word, positions) in bucket:
+                                bucket_postings.setdefault(word, []).append((document_number, positions))
+
+                    # Go through each word in the bucket, giving each the next term number.
+                    for word in sorted(bucket_postings):
+                        terms[word] = len(terms)
+
+                        document_numbers = array.array('I')
+                        posting_starts = array.array('Q')
+
+                        # Write out the positions of the word in each document.
+                        for (document_number, positions) in bucket_postings[word]:
+                            document_numbers.append(document_number)
+                            positions.tofile(array_files['positions'])
+                            position_count += len(positions)
+                            posting_starts.append(position_count)
+
+                        document_numbers.tofile(array_files['posting_documents'])
+                        posting_starts.tofile(array_files['posting_starts'])
+                        term_starts.append(term_starts[-1] + len(document_numbers))
+
+            finally:
+                for array_file in array_files.values():
+                    array_file.close()
+
+            # Move the postings into place.
+            for (name, temporary_path) in temporary_paths.items():
+                os.replace(temporary_path, os.path.join(directory, cls.ARRAY_FILES[name][0]))
+
+            write_array(os.path.join(directory, cls.ARRAY_FILES['term_starts'][0]), term_starts)
+
+        finally:
+            shutil.rmtree(bucket_directory, ignore_errors=True)
+
+        return (fileids, terms)
+
+    def postings(self, word):
+        """
+        :return: Dictionary of the document number of each document the word
+            is in to the positions of the word in it.
+        :rtype: dict(memoryview)
+        """
+
+        # Check if the word isn't in any of the documents.
+        term_number = self.terms.get(word)
+        if (term_number is None):
+            return {}
+
+        return {
+            self.posting_documents[posting_number]: self._positions(posting_number)
+            for posting_number in range(self.term_starts[term_number], self.term_starts[term_number + 1])
+        }
+
+    def find(self, phrase):
+        """
+        :return: Dictionary of the document number of each document a phrase
+            (a list of words) is in to the positions it starts at.
+        :rtype: dict(list(int))
+        """
+
+        # Find the range of postings of each word in the phrase.
+        posting_ranges = []
+        for word in phrase:
+
+            # Check if the word isn't in any of the documents, so neither is the phrase.
+            term_number = self.terms.get(word)
+            if (term_number is None):
+                return {}
+
+            posting_ranges.append((self.term_starts[term_number], self.term_starts[term_number + 1]))
+
+        # Check if there's no words.
+        if (not posting_ranges):
+            return {}
+
+        # Go through the documents of the word in the fewest documents, and look for each in the other words' postings,
+        # which are in order of document number, so each search starts where the last one stopped.
+        word_order = sorted(range(len(phrase)), key=lambda i: posting_ranges[i][1] - posting_ranges[i][0])
+        next_postings = [start for (start, end) in posting_ranges]
+        (first_posting, last_posting) = posting_ranges[word_order[0]]
+
+        # Make a dictionary to hold where the phrase is in each document.
+        matches = {}
+
+        for posting_number in range(first_posting, last_posting):
+            document_number = self.posting_documents[posting_number]
+            next_postings[word_order[0]] = posting_number
+
+            # Find the posting of each of the other words for the document, if they're in it.
+            for word_number in word_order[1:]:
+                next_posting = gallop(
+                    self.posting_documents, document_number, next_postings[word_number], posting_ranges[word_number][1]
+                )
+                next_postings[word_number] = next_posting
+
+                # Check if the word has no postings left, so no later document can have the whole phrase.
+                if (next_posting == posting_ranges[word_number][1]):
+                    return matches
+
+                if (self.posting_documents[next_posting] != document_number):
+                    break
+
+            # Otherwise, every word is in the document, so check where they come one after another.
+            else:
+                starts = self._positions(next_postings[0]).tolist()
+
+                # Keep only the starts where each of the other words comes that many words later.
+                for offset in range(1, len(phrase)):
+                    positions = set(self._positions(next_postings[offset]).tolist())
+                    starts = [start for start in starts if start + offset in positions]
+
+                # Check if the phrase is in the document.
+                if (starts):
+                    matches[document_number] = starts
+
+        return matches
+
+    def _positions(self, posting_number):
+        """
+        :return: The positions of a posting.
+        :rtype: memoryview
+        """
+
+        return self.positions[self.posting_starts[posting_number]:self.posting_starts[posting_number + 1]]
+
+
+class CORD19CitationGraph(object):
+    """
+    The graph of which papers cite which, built by
+    CORD19CorpusReader.build_citation_graph(). The papers are the cord_uids
+    in metadata.csv, numbered in the order of the metadata index. The
+    references in each document's bib_entries are matched to papers by DOI,
+    PMC ID, PubMed ID, or title, looked up in a hash table of those columns
+    of metadata.csv.
+
+    The graph is stored both ways round as compressed sparse rows in
+    memory-mapped arrays: the papers each paper cites, one paper after
+    another, with an array of where each paper's list starts, and the same
+    for the papers citing each paper. The papers are also stored ranked by
+    how many papers cite them.
+    """
+
+    # Increment this when the layout of the graph changes, so old graphs get rebuilt.
+    VERSION = 1
+
+    # The files holding the arrays, and the type of each array.
+    ARRAY_FILES = {
+        'cites_starts': ('cites_starts.bin', 'Q'),
+        'cites': ('cites.bin', 'I'),
+        'cited_by_starts': ('cited_by_starts.bin', 'Q'),
+        'cited_by': ('cited_by.bin', 'I'),
+        'ranking': ('ranking.bin', 'I'),
+    }
+
+    # The columns of metadata.csv references are matched by, and the kind of key each holds, in order of preference.
+    KEY_COLUMNS = (('doi', 'doi'), ('pmcid', 'pmcid'), ('pubmed_id', 'pubmed_id'), ('title', 'title'))
+
+    # Titles with fewer words than this are too likely to be shared by different papers to match references by.
+    TITLE_MINIMUM_WORDS = 3
+
+    def __init__(self, directory, cord_uids):
+
+        self.directory = directory
+
+        # The cord_uids of the papers, in the order of their numbers.
+        self.cord_uids = cord_uids
+
+        # Dictionary to look up paper numbers.
+        self.paper_numbers = {cord_uid: paper_number for (paper_number, cord_uid) in enumerate(cord_uids)}
+
+        # Map the arrays.
+        for (name, (file_name, typecode)) in self.ARRAY_FILES.items():
+            setattr(self, name, map_array(os.path.join(directory, file_name), typecode))
+
+    def __getstate__(self):
+
+        # Memory maps can't be pickled, so the arrays are mapped again by __setstate__().
+        return (self.directory, self.cord_uids)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    @staticmethod
+    def normalize_key(kind, value):
+        """
+        :return: A value of a kind of key ('doi', 'pmcid', 'pubmed_id', or
+            'title') written the same way however it was written in
+            metadata.csv or a reference, or None if there's nothing to match by.
+        :rtype: str
+        """
+
+        # Check if there's no value.
+        if (not value):
+            return None
+
+        value = value.strip()
+
+        # DOIs aren't case sensitive, and are sometimes written as links.
+        if (kind == 'doi'):
+            value = value.lower()
+            for prefix in ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'http://dx.doi.org/', 'doi:'):
+                if (value.startswith(prefix)):
+                    value = value[len(prefix):]
+
+        # PMC IDs are sometimes written without the PMC.
+        elif (kind == 'pmcid'):
+            value = value.upper()
+            if (not value.startswith('PMC')):
+                value = 'PMC' + value
+
+        # Titles are matched by their words, ignoring case and punctuation.
+        elif (kind == 'title'):
+            words = re.findall(r'\w+', value.lower())
+            if (len(words) < CORD19CitationGraph.TITLE_MINIMUM_WORDS):
+                return None
+            value = ' '.join(words)
+
+        return value or None
+
+    @classmethod
+    def reference_keys(cls, bib_entry):
+        """
+        :return: The keys a reference in bib_entries can be matched to a paper
+            by, in order of preference, each as a (kind, value) pair.
+        :rtype: list(tuple(str, str))
+        """
+
+        other_ids = bib_entry.get('other_ids') or {}
+        keys = []
+
+        # Add the IDs of the reference.
+        for (kind, id_name) in (('doi', 'DOI'), ('pmcid', 'PMCID'), ('pubmed_id', 'PMID')):
+            for value in other_ids.get(id_name) or ():
+                value = cls.normalize_key(kind, value)
+                if (value is not None):
+                    keys.append((kind, value))
+
+        # Add the title of the reference.
+        value = cls.normalize_key('title', bib_entry.get('title'))
+        if (value is not None):
+            keys.append(('title', value))
+
+        return keys
+
+    @classmethod
+    def key_lookup(cls, metadata_index, paper_numbers):
+        """
+        :return: Dictionary of each (kind, value) key in metadata.csv to the
+            number of the paper it belongs to. Keys belonging to more than one
+            paper are left out, since references to them can't be told apart.
+        :rtype: dict
+        """
+
+        cord_uids = metadata_index.columns['cord_uid']
+
+        lookup = {}
+        shared_keys = set()
+
+        # Go through each column references are matched by.
+        for (kind, fieldname) in cls.KEY_COLUMNS:
+
+            # Check if this release of metadata.csv doesn't have the column.
+            if (fieldname not in metadata_index.columns):
+                continue
+
+            column = metadata_index.columns[fieldname]
+
+            # Go through each row in the metadata.
+            for row_number in range(metadata_index.row_count):
+
+                # Check if there's nothing in the row to match by.
+                value = cls.normalize_key(kind, column[row_number])
+                if (value is None):
+                    continue
+
+                key = (kind, value)
+                paper_number = paper_numbers[cord_uids[row_number]]
+
+                # Check if the key is new, and add it.
+                if (key not in lookup and key not in shared_keys):
+                    lookup[key] = paper_number
+
+                # Check if another paper has the same key, and leave it out.
+                elif (key in lookup and lookup[key] != paper_number):
+                    del lookup[key]
+                    shared_keys.add(key)
+
+        return lookup
+
+    @classmethod
+    def write(cls, directory, paper_count, citations):
+        """
+        Writes the arrays of a graph to directory, given the number of papers
+        and the citations as (paper number, cited paper numbers) pairs.
+        """
+
+        # Make sure the directory exists.
+        os.makedirs(directory, exist_ok=True)
+
+        # Pack each citation into one number, citing paper first, so sorting them groups them by citing paper.
+        edges = array.array('Q')
+        for (paper_number, cited_paper_numbers) in citations:
+            for cited_paper_number in cited_paper_numbers:
+                edges.append(paper_number << 32 | cited_paper_number)
+
+        # Sort them, dropping citations made more than once, like from both parses of a paper.
+        edges = array.array('Q', sorted(set(edges)))
+
+        # Write the papers each paper cites.
+        (cites_starts, cites) = cls._compressed_rows(paper_count, edges)
+        write_array(os.path.join(directory, cls.ARRAY_FILES['cites_starts'][0]), cites_starts)
+        write_array(os.path.join(directory, cls.ARRAY_FILES['cites'][0]), cites)
+
+        # Turn the citations around, and write the papers citing each paper.
+        edges = array.array('Q', sorted((edge & 0xffffffff) << 32 | edge >> 32 for edge in edges))
+        (cited_by_starts, cited_by) = cls._compressed_rows(paper_count, edges)
+        write_array(os.path.join(directory, cls.ARRAY_FILES['cited_by_starts'][0]), cited_by_starts)
+        write_array(os.path.join(directory, cls.ARRAY_FILES['cited_by'][0]), cited_by)
+
+        # Rank the papers by how many papers cite them, most first.
+        ranking = array.array('I', sorted(
+            range(paper_count),
+            key=lambda paper_number: cited_by_starts[paper_number] - cited_by_starts[paper_number + 1]
+        ))
+        write_array(os.path.join(directory, cls.ARRAY_FILES['ranking'][0]), ranking)
+
+    @staticmethod
+    def _compressed_rows(paper_count, edges):
+        """
+        :return: The compressed sparse rows of sorted, packed edges: where
+            each paper's edges start, and the paper at the other end of each edge.
+        :rtype: tuple(array, array)
+        """
+
+        starts = array.array('Q', [0] * (paper_count + 1))
+        ends = array.array('I')
+
+        # Count the edges of each paper, and record the other end of each one.
+        for edge in edges:
+            starts[(edge >> 32) + 1] += 1
+            ends.append(edge & 0xffffffff)
+
+        # Add up the counts, so each paper's edges start where the last one's end.
+        for paper_number in range(paper_count):
+            starts[paper_number + 1] += starts[paper_number]
+
+        return (starts, ends)
+
+    def cited_papers(self, paper_number):
+        """
+        :return: The numbers of the papers a paper cites.
+        :rtype: memoryview
+        """
+
+        return self.cites[self.cites_starts[paper_number]:self.cites_starts[paper_number + 1]]
+
+    def citing_papers(self, paper_number):
+        """
+        :return: The numbers of the papers citing a paper.
+        :rtype: memoryview
+        """
+
+        return self.cited_by[self.cited_by_starts[paper_number]:self.cited_by_starts[paper_number + 1]]
+
+    def citation_count(self, paper_number):
+        """
+        :return: The number of papers citing a paper.
+        :rtype: int
+        """
+
+        return self.cited_by_starts[paper_number + 1] - self.cited_by_starts[paper_number]
+
+
+class CORD19CorpusStatistics(object):
+    """
+    Counts of what's in each document of a corpus, built in one pass by
+    CORD19CorpusReader.build_statistics(). For each document there's the
+    number of words from words(), and for each part of the paper (title,
+    abstract, and body) the number of tokens, sentences, paragraphs, and
+    sections in sents() and paras(), and the bytes of text. Each count is
+    stored as a column, an array with a number for each document.
+    """
+
+    # The parts of a paper, and what's counted in each of them.
+    PARTS = ('title', 'abstract', 'body')
+    COUNTS = ('tokens', 'sentences', 'paragraphs', 'sections', 'bytes')
+
+    # The names of the columns, in the order the counts of a document are given.
+    COLUMNS = (
+        'words',
+        'title_tokens', 'title_sentences', 'title_paragraphs', 'title_sections', 'title_bytes',
+        'abstract_tokens', 'abstract_sentences', 'abstract_paragraphs', 'abstract_sections', 'abstract_bytes',
+        'body_tokens', 'body_sentences', 'body_paragraphs', 'body_sections', 'body_bytes',
+    )
+
+    def __init__(self, fileids, columns, parse_file_counts):
+        """
+        :param fileids: The fileids in the order their documents are counted.
+        :param columns: Dictionary of each column name to its array of counts.
+        :param parse_file_counts: Dictionary of each parse directory to the number of files in it.
+        """
+
+        self.fileids = fileids
+        self.columns = columns
+        self.parse_file_counts = parse_file_counts
+
+        # Dictionary to look up document numbers.
+        self.document_numbers = {fileid: document_number for (document_number, fileid) in enumerate(fileids)}
+
+        # Add up each column once, so the totals don't have to go through every document.
+        self.totals = {name: sum(column) for (name, column) in columns.items()}
+
+    @classmethod
+    def from_counts(cls, documents, parse_file_counts):
+        """
+        :return: The statistics of documents, given as (fileid, counts) pairs,
+            where the counts are in the order of COLUMNS.
+        :rtype: CORD19CorpusStatistics
+        """
+
+        fileids = []
+        columns = {name: array.array('Q') for name in cls.COLUMNS}
+
+        # Add each document's counts to the end of the columns.
+        for (fileid, counts) in documents:
+            fileids.append(fileid)
+            for (name, count) in zip(cls.COLUMNS, counts):
+                columns[name].append(count)
+
+        return cls(fileids, columns, parse_file_counts)
+
+    def document_counts(self, name, fileids=None):
+        """
+        :return: The count in a column for each of the specified documents, or
+            all of them, or None if any of the documents isn't in the
+            statistics. The name is either a column, or one of COUNTS, which
+            adds up the parts of the paper.
+        :rtype: list(int)
+        """
+
+        # Check if the name is a column, or has to be added up from the parts.
+        if (name in self.columns):
+            columns = [self.columns[name]]
+        else:
+            columns = [self.columns[part + '_' + name] for part in self.PARTS]
+
+        # Check if no fileids are specified, and give every document's count.
+        if (fileids is None):
+            return [sum(counts) for counts in zip(*columns)]
+
+        # Check if any of the documents isn't in the statistics, like a PDF parse passed over for a PMC parse.
+        if (any(fileid not in self.document_numbers for fileid in fileids)):
+            return None
+
+        # Look up each document.
+        document_numbers = [self.document_numbers[fileid] for fileid in fileids]
+        return [sum(column[document_number] for column in columns) for document_number in document_numbers]
+
+    def distribution(self, name, percentiles=(10, 25, 50, 75, 90)):
+        """
+        :return: How a column, or one of COUNTS, is spread across the
+            documents: the mean, smallest, and largest count, and the count at
+            each of the percentiles.
+        :rtype: dict
+        """
+
+        # Sort the counts, so the percentiles can be picked out.
+        counts = sorted(self.document_counts(name))
+
+        # Check if there aren't any documents.
+        if (not counts):
+            return {}
+
+        distribution = {
+            'mean': sum(counts) / len(counts),
+            'min': counts[0],
+            'max': counts[-1],
+        }
+
+        # Pick out the count at each percentile, by the nearest rank.
+        for percentile in percentiles:
+            distribution[percentile] = counts[max(0, -(-percentile * len(counts) // 100) - 1)]
+
+        return distribution
+
+    def total(self, name):
+        """
+        :return: The count in a column, or one of COUNTS, added up across all the documents.
+        :rtype: int
+        """
+
+        # Check if the name is a column, or has to be added up from the parts.
+        if (name in self.totals):
+            return self.totals[name]
+
+        return sum(self.totals[part + '_' + name] for part in self.PARTS)
+
+
+class CORD19SentenceIdView(AbstractLazySequence):
+    """
+    A view of a range of the sentences in a CORD19TokenIds, where each sentence
+    is a view of the IDs of its tokens.
+    """
+
+    def __init__(self, token_ids, first_sentence, last_sentence):
+        self._token_ids = token_ids
+        self._first_sentence = first_sentence
+        self._last_sentence = last_sentence
+
+    def __len__(self):
+        return self._last_sentence - self._first_sentence
+
+    def iterate_from(self, start):
+
+        sentence_starts = self._token_ids.sentence_starts
+        token_ids = self._token_ids.token_ids
+
+        # Slice out each sentence from the start on.
+        for sentence_number in range(self._first_sentence + max(0, start), self._last_sentence):
+            yield token_ids[sentence_starts[sentence_number]:sentence_starts[sentence_number + 1]]
+
+
+class CORD19ParallelCorpusView(AbstractLazySequence):
+    """
+    A view of the tokens in a list of files, like the concatenation of a
+    StreamBackedCorpusView for each file, except the files are read and
+    tokenized by a pool of worker processes.
+
+    Files are handed to the pool a few at a time in order, and their tokens
+    are yielded in order, so only a window of files is held in memory at
+    once. Like StreamBackedCorpusView, the view remembers where each file's
+    tokens start, so indexing into files that have already been read
+    doesn't start over from the beginning.
+
+    The pool is started the first time it's needed and kept for later reads,
+    until the view has been read to the end or is closed. A read that only
+    needs the last file is done in this process, without a pool.
+    """
+
+    def __init__(self, reader, block_reader_name, paths, workers, window=None, lengths=None):
+        """
+        :param reader: The corpus reader, which is copied to each worker process.
+        :param block_reader_name: The name of the reader's method for reading a block of tokens.
+        :param paths: List of (path, encoding, fileid) tuples of the files.
+        :param workers: The number of worker processes.
+        :param window: The most files to have in flight at once (default: four per worker).
+        :param lengths: The number of tokens in each file, if they're already known.
+        """
+
+        self._reader = reader
+        self._block_reader_name = block_reader_name
+        self._paths = paths
+        self._workers = workers
+        self._window = window or 4 * workers
+
+        # The pool of worker processes, started by _get_executor().
+        self._executor = None
+
+        # The index of the first token of each file read so far, plus where the last one ended.
+        self._offsets = [0]
+
+        # The number of tokens, once all the files have been read.
+        self._len = None
+
+        # Check if the number of tokens in each file is known, so where each file starts is too.
+        if (lengths is not None):
+            for length in lengths:
+                self._offsets.append(self._offsets[-1] + length)
+            self._len = self._offsets[-1]
+
+    def __len__(self):
+
+        # Check if the files still need to be read to find out.
+        if (self._len is None):
+            for token in self.iterate_from(self._offsets[-1]):
+                pass
+
+        return self._len
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Shuts down the pool of worker processes, if it's been started. It's
+        started again if the view is read from afterwards.
+        """
+
+        # Check if the pool has been started.
+        if (self._executor is not None):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        """
+        :return: The pool of worker processes, started if it hasn't been yet.
+        :rtype: ProcessPoolExecutor
+        """
+
+        # Check if the pool needs to be started.
+        if (self._executor is None):
+            self._executor = ProcessPoolExecutor(self._workers, initializer=_initialize_worker, initargs=(self._reader,))
+
+        return self._executor
+
+    def iterate_from(self, start):
+
+        # Find the file holding the start token, or the first file not read yet.
+        file_number = bisect.bisect_right(self._offsets, start) - 1
+        offset = self._offsets[file_number]
+
+        # Check if there's no files left to read.
+        if (file_number >= len(self._paths)):
+            self._len = offset
+            return
+
+        # The files handed out to the pool, in order.
+        futures = deque()
+
+        try:
+            next_file_number = file_number
+
+            while (file_number < len(self._paths)):
+
+                # Check if this is the last file and nothing's been handed out, so there's no need for the pool.
+                if (file_number == len(self._paths) - 1 and not futures):
+                    (path, encoding, fileid) = self._paths[file_number]
+                    tokens = _read_tokens(self._reader, self._block_reader_name, path, encoding, fileid)
+                    next_file_number = len(self._paths)
+
+                else:
+                    # Keep the window of files full.
+                    while (next_file_number < len(self._paths) and len(futures) < self._window):
+                        (path, encoding, fileid) = self._paths[next_file_number]
+                        futures.append(self._get_executor().submit(_read_in_worker, self._block_reader_name, path, encoding, fileid))
+                        next_file_number += 1
+
+                    # Wait for the next file in order.
+                    tokens = futures.popleft().result()
+
+                # Remember where the next file starts, if this is the first time reading this far.
+                if (file_number == len(self._offsets) - 1):
+                    self._offsets.append(offset + len(tokens))
+
+                # Generate the tokens in this file, skipping any before the start token.
+                for token in tokens[max(0, start - offset):]:
+                    yield token
+
+                offset += len(tokens)
+                file_number += 1
+
+            # All the files have been read, so now the length is known, and the pool isn't needed anymore.
+            self._len = offset
+            self.close()
+
+        finally:
+            # Don't wait on files that won't be needed if iteration stopped early.
+            for future in futures:
+                future.cancel()
+
+
+class CORD19SectionCursor:
+    """
+    Stands in for the stream of a CORD19SectionCorpusView, where positions
+    count sections of a document instead of bytes.
+    """
+
+    def __init__(self):
+        self._position = 0
+
+    def seek(self, position):
+        self._position = position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        pass
+
+
+class CORD19SectionCorpusView(StreamBackedCorpusView):
+    """
+    A view of the sentences or paragraphs in one file, read one section of
+    the paper at a time, so only the section holding a token gets tokenized
+    and only one section's tokens are held in memory.
+
+    Each section is a block of the view, and the view's file positions count
+    sections instead of bytes. Once a view has been indexed into or asked
+    its length, the number of sentences in each section is kept in the cache
+    directory by the contents of the file when it's been read through, so
+    later views know where every block starts and their length, and indexing
+    into them goes straight to the right section. Views that are only read
+    from the start don't need to know, so they don't store anything.
+    """
+
+    def __init__(self, reader, path, fileid, paragraphs):
+        """
+        :param reader: The corpus reader the file belongs to.
+        :param path: The path pointer of the file.
+        :param fileid: The fileid of the file.
+        :param paragraphs: True for a view of paragraphs, or False for a view of sentences.
+        """
+
+        StreamBackedCorpusView.__init__(self, path)
+
+        self._reader = reader
+        self._fileid_name = fileid
+        self._paragraphs = paragraphs
+
+        # The sections aren't counted until the view is first used.
+        self._eofpos = None
+
+        # The document, while the view is reading it.
+        self._document = None
+
+        # The number of sentences in each section read so far, to store once they've all been read.
+        self._sentence_counts = None
+
+        # Whether the view has been indexed into or asked its length, so where the blocks start is worth storing.
+        self._random_access = False
+
+    def __len__(self):
+
+        # Check if the length isn't known, so it has to be found by reading through the file.
+        if (self._len is None):
+            self._random_access = True
+
+            # Check if the sections haven't been counted yet, since they may give the length.
+            if (self._eofpos is None):
+                self._load_offsets()
+
+        return StreamBackedCorpusView.__len__(self)
+
+    def iterate_from(self, start_tok):
+
+        # Check if the view is being read from somewhere other than the start.
+        if (start_tok > 0):
+            self._random_access = True
+
+        # Check if the sections haven't been counted yet, since the blocks have to be known before looking for one.
+        if (self._eofpos is None):
+            self._load_offsets()
+
+        for token in StreamBackedCorpusView.iterate_from(self, start_tok):
+            yield token
+
+        # Check if every section has been read and later views will want to know where they start, and store them.
+        if (self._random_access and self._sentence_counts is not None and len(self._sentence_counts) == self._eofpos):
+            self._reader._write_section_offsets(
+                self._document or self._reader.document(self._fileid_name),
+                [self._sentence_counts[section_number] for section_number in range(self._eofpos)]
+            )
+            self._sentence_counts = None
+
+    def _load_offsets(self):
+        """
+        Counts the sections of the document, and sets up where each block
+        starts from the cache directory, if it's there.
+        """
+
+        document = self._reader.document(self._fileid_name)
+        section_count = len(self._reader._document_sections(document))
+        self._eofpos = section_count
+
+        # Every section is exactly one paragraph.
+        if (self._paragraphs):
+            self._filepos = list(range(section_count + 1))
+            self._toknum = list(range(section_count + 1))
+            self._len = section_count
+            return
+
+        # Check if the number of sentences in each section is already in the cache.
+        sentence_counts = self._reader._read_section_offsets(document)
+        if (sentence_counts is None):
+
+            # Count them as the sections are read instead.
+            self._sentence_counts = {}
+            return
+
+        # Each block ends after a section that has sentences in it, like the view would have found by reading them.
+        self._filepos = [0]
+        self._toknum = [0]
+        for (section_number, sentence_count) in enumerate(sentence_counts):
+            if (sentence_count > 0):
+                self._filepos.append(section_number + 1)
+                self._toknum.append(self._toknum[-1] + sentence_count)
+
+        self._len = self._toknum[-1]
+
+    def _open(self):
+
+        # Hold onto the document while reading it.
+        self._document = self._reader.document(self._fileid_name)
+        self._stream = CORD19SectionCursor()
+
+    def close(self):
+
+        # Let go of the document, so the view doesn't keep it in memory.
+        self._document = None
+        self._stream = None
+
+    def read_block(self, stream):
+
+        # Tokenize the section at the stream's position, and move on to the next one.
+        section_number = stream.tell()
+        section = self._reader._document_sections(self._document)[section_number]
+        sentences = self._reader._tokenize_section(section)
+        stream.seek(section_number + 1)
+
+        # Remember how many sentences it has, if they're being counted.
+        if (self._sentence_counts is not None):
+            self._sentence_counts[section_number] = len(sentences)
+
+        # Check if the tokens are paragraphs, and make the section's sentences into one.
+        if (self._paragraphs):
+            return [sentences]
+
+        return sentences
+
+
+class CORD19ConcatenatedCorpusView(ConcatenatedCorpusView):
+    """
+    A ConcatenatedCorpusView that, instead of reading through every file
+    before the one holding a token, works out where each file starts from
+    their lengths. The lengths of CORD19SectionCorpusViews are known without
+    reading the files once their sections have been counted, and the lengths
+    of any view can be given up front from the corpus statistics.
+    """
+
+    def __init__(self, corpus_views, lengths=None):
+        """
+        :param corpus_views: The views to concatenate.
+        :param lengths: The length of each view, if they're already known.
+        """
+
+        ConcatenatedCorpusView.__init__(self, corpus_views)
+
+        # Check if the lengths are known.
+        if (lengths is not None):
+
+            # Give each view its length, and work out where each one starts.
+            for (corpus_view, length) in zip(corpus_views, lengths):
+                corpus_view._len = length
+                self._offsets.append(self._offsets[-1] + length)
+
+    def __len__(self):
+
+        # Add up the lengths of the files that haven't been added up yet.
+        while (len(self._offsets) <= len(self._pieces)):
+            self._offsets.append(self._offsets[-1] + len(self._pieces[len(self._offsets) - 1]))
+
+        return self._offsets[-1]
+
+    def iterate_from(self, start_tok):
+
+        # Skip over the files that end before the start token. A file starting at the start token isn't measured,
+        # since it's read from its start anyway.
+        while (len(self._offsets) <= len(self._pieces) and self._offsets[-1] < start_tok):
+            self._offsets.append(self._offsets[-1] + len(self._pieces[len(self._offsets) - 1]))
+
+        return ConcatenatedCorpusView.iterate_from(self, start_tok)
+
+
+class CORD19Prefetcher(object):
+    """
+    Reads documents ahead of a corpus reader in a pool of threads, so the
+    reader doesn't wait on the file system for each document in turn.
+
+    When a view of the tokens of a list of files is made, the prefetcher is
+    told the order of the files. Each time the reader asks for a document,
+    the prefetcher makes sure the next few documents in that order are being
+    read, as long as the documents read but not used yet stay under a budget
+    of bytes. Each document's share of the budget is reserved from the size
+    of its file when it starts being read, so documents still being read
+    count too, and it's given back when the reader takes the document. The
+    counters in stats() show how much time reading took in the threads, and
+    how much of it the reader still had to wait for.
+    """
+
+    # How many times the size of its file a document takes once its title, abstract, and body are decoded, which
+    # comes to about 2.2 on average, and up to 3.5.
+    DECODED_SIZE_RATIO = 2.5
+
+    def __init__(self, reader, documents, threads=4, max_bytes=64 << 20, decode=True):
+        """
+        :param reader: The corpus reader to read documents for.
+        :param documents: The most documents to read ahead.
+        :param threads: The number of threads reading documents.
+        :param max_bytes: The most bytes of documents to hold that haven't been used yet.
+        :param decode: Whether to also decode the JSON of the title, abstract, and body in the threads.
+        """
+
+        self._reader = reader
+        self._documents = documents
+        self._threads = threads
+        self._max_bytes = max_bytes
+        self._decode = decode
+
+        # The pool is started the first time there's something to read.
+        self._executor = None
+
+        # The fileids in the order they'll be used, and the position of each one.
+        self._fileids = []
+        self._positions = {}
+
+        # Dictionary of fileid to the future reading it, for the documents being read ahead.
+        self._futures = OrderedDict()
+
+        # Dictionary of fileid to the bytes reserved for it, for the documents being read ahead, and their total.
+        self._reserved_bytes = {}
+        self._buffered_bytes = 0
+
+        # The position of the next fileid to read ahead.
+        self._next_position = 0
+
+        # The fileids in the order that have been asked for already.
+        self._taken = set()
+
+        self._counters = {
+            'prefetched': 0,
+            'hits': 0,
+            'misses': 0,
+            'read_seconds': 0.0,
+            'wait_seconds': 0.0,
+        }
+
+    def __getstate__(self):
+
+        # Threads can't be pickled, so a copied prefetcher starts out with nothing read ahead.
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_futures'] = OrderedDict()
+        state['_reserved_bytes'] = {}
+        state['_buffered_bytes'] = 0
+        return state
+
+    def schedule(self, fileids):
+        """
+        Sets the order the documents are expected to be used in, dropping
+        any documents read ahead that aren't in it, and starts reading the
+        first ones.
+        """
+
+        self._fileids = list(fileids)
+        self._positions = {fileid: position for (position, fileid) in enumerate(self._fileids)}
+
+        # Forget the documents that won't be used.
+        for fileid in list(self._futures):
+            if (fileid not in self._positions):
+                self._futures.pop(fileid).cancel()
+                self._release(fileid)
+
+        self._next_position = 0
+        self._taken = set()
+        self._read_ahead(0)
+
+    def take(self, fileid):
+        """
+        :return: The document for a fileid if it was read ahead, waiting for
+            it to finish being read if it has to, or None if it wasn't. Either
+            way, the documents after it get read ahead.
+        :rtype: CORD19Document
+        """
+
+        # The document is being used now, so give back its share of the budget before reading ahead.
+        future = self._futures.pop(fileid, None)
+        self._release(fileid)
+
+        # Check if the fileid is in the order, and read ahead from it.
+        position = self._positions.get(fileid)
+        if (position is not None):
+            self._read_ahead(position + 1)
+
+        # Check if the document wasn't read ahead.
+        if (future is None):
+
+            # Count it as missed, if it was expected and hasn't been asked for already.
+            if (position is not None and fileid not in self._taken):
+                self._counters['misses'] += 1
+                self._taken.add(fileid)
+
+            return None
+
+        self._taken.add(fileid)
+
+        # Wait for the document, timing how long it takes.
+        start_time = time.perf_counter()
+        (document, read_seconds) = future.result()
+        self._counters['wait_seconds'] += time.perf_counter() - start_time
+
+        self._counters['hits'] += 1
+        self._counters['read_seconds'] += read_seconds
+
+        return document
+
+    def stats(self):
+        """
+        :return: Counters of the documents read ahead ('prefetched'), the
+            documents the reader got from them ('hits') or had to read itself
+            ('misses'), the seconds the threads spent reading the documents the
+            reader got ('read_seconds'), the seconds the reader waited on them
+            ('wait_seconds'), and the seconds of reading that were hidden from
+            the reader ('hidden_seconds').
+        :rtype: dict
+        """
+
+        counters = dict(self._counters)
+        counters['hidden_seconds'] = max(0.0, counters['read_seconds'] - counters['wait_seconds'])
+
+        return counters
+
+    def _read_ahead(self, position):
+        """
+        Starts reading the documents from position on, until there's enough
+        being read ahead or the budget of bytes is used up.
+        """
+
+        # Don't go back over documents that have already been passed.
+        self._next_position = max(self._next_position, position)
+
+        while (self._next_position < len(self._fileids) and len(self._futures) < self._documents
+               and self._buffered_bytes < self._max_bytes):
+            fileid = self._fileids[self._next_position]
+            self._next_position += 1
+
+            # Check if the document is already being read.
+            if (fileid in self._futures):
+                continue
+
+            # Start the pool the first time there's something to read.
+            if (self._executor is None):
+                self._executor = ThreadPoolExecutor(self._threads)
+
+            # Reserve the document's share of the budget before it's read, so reads in progress are held to it too.
+            self._reserved_bytes[fileid] = self._document_bytes(fileid)
+            self._buffered_bytes += self._reserved_bytes[fileid]
+
+            self._futures[fileid] = self._executor.submit(self._read, fileid)
+            self._counters['prefetched'] += 1
+
+    def _document_bytes(self, fileid):
+        """
+        :return: About how many bytes the document for a fileid will take
+            once it's read, from the size of its file on disk or in the pack,
+            or 0 if the size can't be found.
+        :rtype: int
+        """
+
+        try:
+            file_size = self._reader.abspath(fileid).file_size()
+        except (OSError, KeyError):
+            return 0
+
+        # Check if the parts of the document get decoded too, which takes more memory than the text alone.
+        if (self._decode):
+            return int(file_size * self.DECODED_SIZE_RATIO)
+
+        return file_size
+
+    def _release(self, fileid):
+        """
+        Gives back the bytes reserved for a document read ahead.
+        """
+
+        self._buffered_bytes -= self._reserved_bytes.pop(fileid, 0)
+
+    def _read(self, fileid):
+        """
+        :return: The document for a fileid, read and parsed in a thread, along
+            with the seconds it took.
+        :rtype: tuple(CORD19Document, float)
+        """
+
+        start_time = time.perf_counter()
+
+        file_text = self._reader._read_text(fileid)
+        document = CORD19Document(fileid, file_text, self._reader._profile)
+
+        # Check whether to decode the parts the tokenizers use, too.
+        if (self._decode):
+            document.title
+            document.abstract
+            document.body_text
+
+        return (document, time.perf_counter() - start_time)
+
+
+class CORD19DocumentCorpusView(StreamBackedCorpusView):
+    """
+    A view of the tokens in one file, read as a single block from the
+    document the corpus reader gives for it, instead of from a stream of the
+    file, so the document can come from the reader's recently used documents
+    or from its prefetcher without opening the file.
+    """
+
+    def __init__(self, reader, path, fileid, tokenize_name):
+        """
+        :param reader: The corpus reader the file belongs to.
+        :param path: The path pointer of the file.
+        :param fileid: The fileid of the file.
+        :param tokenize_name: The name of the reader's method for tokenizing a document.
+        """
+
+        StreamBackedCorpusView.__init__(self, path)
+
+        self._reader = reader
+        self._fileid_name = fileid
+        self._tokenize_name = tokenize_name
+
+        # The whole file is one block, from position 0 to 1.
+        self._eofpos = 1
+
+    def _open(self):
+        self._stream = CORD19SectionCursor()
+
+    def close(self):
+        self._stream = None
+
+    def read_block(self, stream):
+
+        # Tokenize the whole document, and move to the end.
+        stream.seek(1)
+        return getattr(self._reader, self._tokenize_name)(self._reader.document(self._fileid_name))
+
+
+class CORD19SpanCorpusView(CORD19DocumentCorpusView):
+    """
+    A view of the word or sentence spans in one file, which keeps the
+    CORD19SpanView of the file as its cache instead of copying it into a list
+    of tuples the way StreamBackedCorpusView does with a block, and lets go of
+    it when the view is closed.
+    """
+
+    def __len__(self):
+
+        # Check if the length isn't known yet, and read the spans to find it.
+        if (self._len is None):
+            self._len = len(self._read_spans())
+
+        return self._len
+
+    def iterate_from(self, start):
+        return self._read_spans().iterate_from(start)
+
+    def close(self):
+        CORD19DocumentCorpusView.close(self)
+        self._cache = (-1, -1, None)
+
+    def _read_spans(self):
+        """
+        :return: The spans in the file, read from its document if they aren't cached.
+        :rtype: CORD19SpanView
+        """
+
+        # Check if the spans aren't cached.
+        if (self._cache[2] is None):
+            spans = getattr(self._reader, self._tokenize_name)(self._reader.document(self._fileid_name))
+            self._cache = (0, len(spans), spans)
+            self._len = len(spans)
+
+        return self._cache[2]
+
+
+class CORD19CorpusReader(CorpusReader):
+    """
+    Reader for the CORD19 corpus:
+    https://www.kaggle.com/allen-institute-for-ai/CORD-19-research-challenge .
+
+    Documents in the CORD-19 corpus are stored as JSON in text files, so the
+    implementation of this reader is based on the implementation of the 
+    PlaintextCorpusReader in NLTK.
+    """
+
+    CorpusView = StreamBackedCorpusView
+
+    # Increment this when the tokens returned by the block readers change, so old cached tokens aren't used.
+    TOKEN_CACHE_VERSION = 1
+
+    # Increment this when the way fileids are found or resolved changes, so old manifests of them aren't used.
+    FILEIDS_MANIFEST_VERSION = 1
+
+    # The method tokenizing a whole document the way each block reader does.
+    DOCUMENT_TOKENIZERS = {
+        '_read_word_block': '_tokenize_words',
+        '_read_sent_block': '_tokenize_sentences',
+        '_read_para_block': '_tokenize_paragraphs',
+        '_read_word_span_block': '_tokenize_word_spans',
+        '_read_sent_span_block': '_tokenize_sent_spans',
+    }
+
+    # The block readers reading the spans of words or sentences, which are views over arrays instead of lists.
+    SPAN_BLOCK_READERS = ('_read_word_span_block', '_read_sent_span_block')
+
+    def __init__(
+            self,
+            root,
+            # Don't allow files to be explicitly specified anymore.
+            # TODO: Make it where it's alright for a list of files?
+            fileids,
+            word_tokenizer=WordPunctTokenizer(),
+            sent_tokenizer=nltk.data.LazyLoader("tokenizers/punkt/english.pickle"),
+            para_block_reader=read_blankline_block,
+            encoding="utf8",
+            include_titles=True,
+            include_abstracts=True,
+            include_bodies=True,
+            # TODO: What to include for the bibliographies?
+            # include_bibliographies = True,
+            prefer_pdf_parses=True,
+            prefer_pmc_parses=False,
+            cache_dir=None,
+            workers=1,
+            token_cache=False,
+            document_cache_size=128,
+            precomputed_dir=None,
+            packed=False,
+            prefetch=0,
+            prefetch_threads=4,
+            prefetch_bytes=64 << 20,
+            prefetch_decode=True
+    ):
+        # TODO: Gather up the list of fileids to pass into the constructor.
+
+        # Time how long the reader takes to start, for startup_time().
+        start_time = time.perf_counter()
+
+        # Check if the root is a release archive instead of a directory.
+        is_archive = CORD19Archive.is_archive(root)
+
+        # Save location of the directory to hold indexes built from the corpus.
+        # By default, it's stored next to the corpus, or next to the archive if the corpus is an archive.
+        if (cache_dir is None and is_archive):
+            cache_dir = os.path.join(os.path.dirname(root), '.cord19_cache', os.path.basename(root))
+        elif (cache_dir is None):
+            cache_dir = os.path.join(root, '.cord19_cache')
+        self._cache_dir = cache_dir
+
+        # Save location of the metadata.csv file.
+        self._metadata_file = os.path.join(root, 'metadata.csv')
+
+        # Save location of the archive, if the corpus is one.
+        self._archive = None
+
+        # Check if the root is a directory written by pack().
+        if (packed):
+
+            # Load the pack's index.
+            self._pack = CORD19Pack(root)
+
+        # Check if the root is an archive.
+        elif (is_archive):
+
+            # Load the archive's index, which is only built once.
+            self._archive = root
+            self._pack = self._open_archive(root)
+
+            # metadata.csv is inside the archive.
+            self._metadata_file = None
+
+        else:
+            self._pack = None
+
+        # Record encoding scheme
+        self._encoding = encoding
+
+        # Check if the fileids are a regular expression, and look for the fileids it resolved to last time.
+        # They're only used if metadata.csv and the directories holding the files haven't changed since.
+        manifest = None
+        manifest_signature = None
+        if isinstance(fileids, str):
+            manifest_signature = (
+                self.FILEIDS_MANIFEST_VERSION, os.path.abspath(root), fileids, prefer_pdf_parses, prefer_pmc_parses
+            )
+            manifest_key = hashlib.blake2b(repr(manifest_signature).encode('utf8'), digest_size=20).hexdigest()
+            manifest_name = os.path.join('fileids', manifest_key + '.pickle')
+            manifest = self._read_fileids_manifest(manifest_name, manifest_signature)
+
+        # The directories looked through for the fileids, with their signatures.
+        directories = []
+
+        # Check if the fileids were found in the manifest.
+        if (manifest is not None):
+            fileids = manifest
+
+        # Check if the fileids are a regular expression to find the matching files in the pack.
+        # There's no directories to look through, so CorpusReader can't do it.
+        elif (self._pack is not None and isinstance(fileids, str)):
+            fileids = [fileid for fileid in self._pack.fileids() if re.match(fileids + '$', fileid)]
+
+        # Check if the fileids are a regular expression to find the matching files in the directory.
+        elif (isinstance(fileids, str) and os.path.isdir(root)):
+            (fileids, directories) = self._find_fileids(root, fileids)
+
+        # Check if the files are read through a pack.
+        if (self._pack is not None):
+            CorpusReader.__init__(self, CORD19PackPathPointer(self._pack), fileids, encoding)
+
+        else:
+            CorpusReader.__init__(self, root, fileids, encoding)
+
+        # print('self.fileids:', self._fileids)
+
+        self._word_tokenizer = word_tokenizer
+        self._sent_tokenizer = sent_tokenizer
+        self._para_block_reader = para_block_reader
+
+        # Tokenizes whole documents at once, worked out the first time sentences are needed. False if the tokenizers can't be.
+        self._span_tokenizer = None
+
+        # The CORD19Profile adding up the time spent in each stage, while the reader is being profiled.
+        self._profile = None
+
+        self._include_titles = include_titles
+        self._include_abstracts = include_abstracts
+        self._include_bodies = include_bodies
+        # self._include_bibliographies = include_bibliographies
+
+        # The metadata index is loaded the first time it's needed.
+        self._metadata_index = None
+
+        # Save the number of processes words(), sents(), and paras() tokenize with by default.
+        self._workers = workers
+
+        # Save whether to keep the output of words(), sents(), and paras() in the cache directory.
+        self._token_cache = token_cache
+
+        # Fingerprints of the tokenizers, worked out the first time the token cache needs them.
+        self._token_cache_fingerprints = {}
+
+        # Dictionary of fileid to the most recently used parsed documents, from least to most recent.
+        self._documents = OrderedDict()
+        self._document_cache_size = document_cache_size
+
+        # Save location of the outputs written by generate_corpus_computations.py.
+        self._precomputed_dir = precomputed_dir
+
+        # Check whether to read documents ahead of words(), sents(), and paras() in a pool of threads.
+        if (prefetch > 0):
+            self._prefetcher = CORD19Prefetcher(self, prefetch, prefetch_threads, prefetch_bytes, prefetch_decode)
+        else:
+            self._prefetcher = None
+
+        # The indexes of the columns of metadata.csv used by select(), loaded the first time they're needed, and
+        # which files are on each row, made the first time select() needs them.
+        self._column_indexes = {}
+        self._row_fileids = None
+
+        # The token IDs, inverted index, corpus statistics, and citation graph are loaded the first time they're needed.
+        self._token_ids = None
+        self._inverted_index = None
+        self._corpus_statistics = None
+        self._citation_graph = None
+
+        # Check if the fileids weren't found in the manifest, so they still have to be resolved.
+        if (manifest is None):
+
+            # Check if don't want both PDF parses and PMC parses.
+            if (not (prefer_pdf_parses and prefer_pmc_parses)):
+
+                # Pick the parse of each paper to use, from metadata.csv.
+                self._fileids = self._resolve_fileids(prefer_pdf_parses, prefer_pmc_parses)
+
+            # Check if the fileids came from a regular expression, and store what they resolved to for next time.
+            if (manifest_signature is not None):
+                self._write_cache(manifest_name, manifest_signature, (self._manifest_sources(directories), self._fileids))
+
+        # Remember how long the reader took to start.
+        self._startup_time = time.perf_counter() - start_time
+
+    def _resolve_fileids(self, prefer_pdf_parses, prefer_pmc_parses):
+        """
+        :return: The fileids of one parse of each paper in metadata.csv,
+            picking the PDF parses or the PMC parses of papers with both.
+        :rtype: list(str)
+        """
+
+        # Grab the metadata index, which is only rebuilt from metadata.csv when the file changes.
+        metadata_index = self._get_metadata_index()
+
+        # Grab the columns holding the names of the parse files.
+        pdf_json_files = metadata_index.columns['pdf_json_files']
+        pmc_json_files = metadata_index.columns['pmc_json_files']
+
+        # Make an empty list to hold the new fileids list.
+        new_fileids_list = []
+
+        # Go through all the cord_uids in the metadata.
+        # The entries are lists of row numbers since a cord_uid can appear in multiple rows.
+        for (entry_key, row_numbers) in metadata_index.cord_uid_rows.items():
+
+            has_pdf_parse = False
+            has_pmc_parse = False
+            pdf_parse_value = ''
+            pmc_parse_value = ''
+
+            # Go through the rows for this cord_uid.
+            for row_number in row_numbers:
+
+                # Check if there's a PDF parse.
+                if (pdf_json_files[row_number]):
+                    # Set that there is.
+                    has_pdf_parse = True
+
+                    # Store off the value.
+                    pdf_parse_value = pdf_json_files[row_number]
+
+                # Check if there's a PMC parse.
+                if (pmc_json_files[row_number]):
+                    # Set that there is.
+                    has_pmc_parse = True
+
+                    # Store off the value.
+                    pmc_parse_value = pmc_json_files[row_number]
+
+            # Check if there was neither a PDF parse nor a PMC parse.
+            if (not has_pdf_parse and not has_pmc_parse):
+
+                # Just go to the next one.
+                continue
+
+            # Check if there's PDF parses, but not PMC parses.
+            elif (has_pdf_parse and not has_pmc_parse):
+
+                # The PDF parses can actually be a list of files.
+                new_fileids_list.extend(pdf_parse_value.split('; '))
+
+            # Check if there's PMC parses, but not PDF parses.
+            elif (has_pmc_parse and not has_pdf_parse):
+
+                # Append this file to the new list.
+                new_fileids_list.append(pmc_parse_value)
+
+            # There must be both PDF parses and PMC parses, so check if prefer PDF parses.
+            elif (prefer_pdf_parses):
+
+                # The PDF parses can actually be a list of files.
+                new_fileids_list.extend(pdf_parse_value.split('; '))
+
+            # Check if prefer PMC parses.
+            elif (prefer_pmc_parses):
+
+                # Append this file to the new list.
+                new_fileids_list.append(pmc_parse_value)
+
+        # Return the new list, sorted like the fileids.
+        return sorted(new_fileids_list)
+
+    def _find_fileids(self, root, regexp):
+        """
+        :return: The fileids of the files in the root directory matching a
+            regular expression, found like CorpusReader does, along with the
+            signature of each directory looked through. The cache directory
+            isn't looked through, since it only holds files made by the reader.
+        :rtype: tuple(list(str), list(tuple))
+        """
+
+        regexp = re.compile(regexp + '$')
+        cache_dir = os.path.abspath(self._cache_dir)
+
+        # Make the cache directory first, since making it inside the root afterwards would change the root's signature.
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            pass
+
+        fileids = []
+        directories = []
+
+        # Go through each directory under the root.
+        for (dirname, subdirs, file_names) in os.walk(root, followlinks=True):
+
+            # Don't visit svn directories like CorpusReader, or the cache directory.
+            subdirs[:] = [
+                subdir for subdir in subdirs
+                if (subdir != '.svn' and os.path.abspath(os.path.join(dirname, subdir)) != cache_dir)
+            ]
+
+            # Remember the directory's signature, which changes when files are added to it or removed from it.
+            directories.append((os.path.abspath(dirname), file_signature(dirname)))
+
+            # The fileids in the directory start with its path from the root.
+            relative_path = os.path.relpath(dirname, root)
+            prefix = '' if (relative_path == '.') else relative_path.replace(os.sep, '/') + '/'
+
+            # Add the files matching the regular expression.
+            fileids.extend(prefix + file_name for file_name in file_names if regexp.match(prefix + file_name))
+
+        return (sorted(fileids), directories)
+
+    def _manifest_sources(self, directories):
+        """
+        :return: The paths the fileids were found from, with their signatures:
+            metadata.csv or the archive, the pack's index if the corpus is
+            packed, and the directories looked through.
+        :rtype: list(tuple)
+        """
+
+        path = os.path.abspath(self._metadata_file or self._archive)
+        sources = [(path, file_signature(path))]
+
+        # Check if the corpus is a pack written by pack().
+        if (self._pack is not None and self._archive is None):
+            path = os.path.abspath(os.path.join(self._pack.directory, CORD19Pack.INDEX_FILE))
+            sources.append((path, file_signature(path)))
+
+        return sources + directories
+
+    def _read_fileids_manifest(self, name, signature):
+        """
+        :return: The fileids stored in a manifest in the cache directory, or
+            None if there isn't one or anything they were found from has changed.
+        :rtype: list(str)
+        """
+
+        manifest = self._read_cache(name, signature)
+
+        # Check if there's no manifest.
+        if (manifest is None):
+            return None
+
+        (sources, fileids) = manifest
+
+        # Check that nothing the fileids were found from has changed.
+        for (path, path_signature) in sources:
+            try:
+                if (file_signature(path) != path_signature):
+                    return None
+            except OSError:
+                return None
+
+        return fileids
+
+    def startup_time(self):
+        """
+        :return: How many seconds the constructor took, most of which is
+            finding the fileids, unless they were found in the manifest stored
+            in the cache directory by a reader with the same arguments.
+        :rtype: float
+        """
+
+        return self._startup_time
+
+    @classmethod
+    def from_packed(cls, directory, fileids=r'.*\.json', **kwargs):
+        """
+        :return: A reader for a corpus packed by pack(). The files are read by
+            slicing memory-mapped shards, without opening a file for each one.
+            The other arguments are the same as the constructor's.
+        :rtype: CORD19CorpusReader
+        """
+
+        return cls(directory, fileids, packed=True, **kwargs)
+
+    def pack(self, directory, fileids=None, shard_size=1 << 30):
+        """
+        Writes a packed copy of the corpus to directory, to be read with
+        from_packed(). The parse files are packed into shards of about
+        shard_size bytes, and metadata.csv is copied alongside them.
+
+        :param fileids: The files to pack. By default, every parse file in
+            document_parses is packed, so the packed corpus can be read with
+            any preferences.
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Check if this corpus is already packed, and just repack all the parses in it.
+            if (self._pack is not None):
+                fileids = [fileid for fileid in self._pack.fileids() if re.match(r'document_parses/.*\.json$', fileid)]
+
+            # Otherwise, find all the parse files.
+            else:
+                fileids = find_corpus_fileids(self._root, r'document_parses/.*\.json')
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Write the shards and their index, in order, so files next to each other in the corpus are next to each other in the pack.
+        CORD19Pack.write(directory, ((fileid, self._read_bytes(fileid)) for fileid in sorted(fileids)), shard_size)
+
+        # Check if metadata.csv is inside an archive, and copy it out.
+        if (self._metadata_file is None):
+            with self._pack.stream('metadata.csv') as metadata_stream:
+                with open(os.path.join(directory, 'metadata.csv'), 'wb') as metadata_file:
+                    shutil.copyfileobj(metadata_stream, metadata_file)
+
+        # Otherwise, copy metadata.csv, since the fileids and metadata come from it.
+        else:
+            shutil.copyfile(self._metadata_file, os.path.join(directory, 'metadata.csv'))
+
+    def _read_bytes(self, fileid):
+        """
+        :return: The contents of a file in the corpus, without decoding them.
+        :rtype: bytes
+        """
+
+        stream = self._root.join(fileid).open()
+        try:
+            return stream.read()
+        finally:
+            stream.close()
+
+    def _open_archive(self, path):
+        """
+        :return: The archive at path, read in place if possible. Otherwise, the
+            first time it's used, the corpus in it is packed into the cache
+            directory, and the pack is read instead.
+        :rtype: CORD19Pack
+        """
+
+        # The cached index or pack is only valid for this exact version of the archive.
+        signature = (CORD19Archive.VERSION,) + file_signature(path)
+
+        # Get the location the archive is packed to when it can't be read in place.
+        pack_directory = os.path.join(self._cache_dir, 'archive_pack')
+
+        # Try loading the index of the archive from the cache.
+        archive = self._read_cache('archive_index.pickle', signature)
+
+        # Check if the archive was indexed already.
+        if (archive is not None):
+
+            # The archive might have been opened from somewhere else when it was cached.
+            archive.directory = path
+
+            return archive
+
+        # Check if the archive was packed already.
+        if (self._read_cache('archive_pack.pickle', signature) is not None):
+            return CORD19Pack(pack_directory)
+
+        # Check if the archive can be read in place.
+        if (CORD19Archive.can_read_in_place(path)):
+
+            # Read through the archive once to build the index.
+            archive = CORD19Archive.from_path(path)
+
+            # Store the index for next time.
+            self._write_cache('archive_index.pickle', signature, archive)
+
+            return archive
+
+        # Clear out any pack of an older version of the archive.
+        shutil.rmtree(pack_directory, ignore_errors=True)
+
+        # Read through the archive once to pack it.
+        CORD19Pack.write(pack_directory, CORD19Archive.iterate_files(path))
+
+        # Record which version of the archive was packed.
+        self._write_cache('archive_pack.pickle', signature, pack_directory)
+
+        return CORD19Pack(pack_directory)
+
+    def __getstate__(self):
+
+        # Copy the attributes of the reader.
+        state = self.__dict__.copy()
+
+        # Don't send the metadata index or parsed documents along to worker processes, they're reloaded if needed.
+        state['_metadata_index'] = None
+        state['_documents'] = OrderedDict()
+        state['_token_ids'] = None
+        state['_inverted_index'] = None
+        state['_corpus_statistics'] = None
+        state['_citation_graph'] = None
+        state['_span_tokenizer'] = None
+
+        # Worker processes don't add to this process's profile.
+        state['_profile'] = None
+        state['_prefetcher'] = None
+        state['_column_indexes'] = {}
+        state['_row_fileids'] = None
+
+        return state
+
+    @profiled('raw')
+    def raw(self, fileids=None):
+
+        """
+        :return: Returns the text of the specified files as a single string.
+        :rtype: str
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Make a list to store the raw texts.
+        raw_texts = []
+
+        # Go through each file ID in the list.
+        for fileid in fileids:
+
+            # Grab the parsed document.
+            document = self.document(fileid)
+
+            # Set the paper as en empty string.
+            paper = ""
+
+            # Check whether to include titles or not.
+            if (self._include_titles):
+                # Concatenate the title.
+                paper += document.title + '\n'
+
+            # Check whether to include abstracts or not.
+            if (self._include_abstracts):
+
+                # Go through each section of the abstract.
+                for section in document.abstract:
+                    # Concatenate the section.
+                    paper += section['text'] + '\n'
+
+            # Check whether to include body_text or not.
+            if (self._include_bodies):
+
+                # Go through each section of the paper.
+                for section in document.body_text:
+                    # Concatenate the section.
+                    paper += section['text'] + '\n'
+
+            # Read the contents of the file and append to the list of raw texts.
+            raw_texts.append(paper)
+
+        # Concatenate the items in the list and return the result.
+        return concat(raw_texts)
+
+    def words(self, fileids=None, workers=None):
+        """
+        :return: List of words and punctuation from the specified files.
+            Set workers to tokenize the files with that many processes.
+        :rtype: list(str)
+        """
+
+        # Return the view of the tokens in the files.
+        return self._corpus_view(fileids, '_read_word_block', workers)
+
+    def sents(self, fileids=None, workers=None):
+        """
+        :return: List of sentences from the specified files.
+            Set workers to tokenize the files with that many processes.
+        :rtype: list(list(str))
+        """
+
+        # Check that there's a sentence tokenizer.
+        if (self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        # Return the view of the tokens in the files, read a section at a time.
+        return self._corpus_view(fileids, '_read_sent_block', workers, sections=True)
+
+    # TODO: Warning! Currently, paras() treats a section of the paper as a paragraph,
+    # which may or may not be acceptable. If we want to work at a paragraph level,
+    # we may need to revisit this implementation and make some adjustments.
+    def paras(self, fileids=None, workers=None):
+        """
+        :return: List of paragraphs, which is each a list of sentences, which is each a list of words.
+            Set workers to tokenize the files with that many processes.
+        :rtype: list(list(list(str)))
+        """
+
+        # Check that there's a sentence tokenizer.
+        if (self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        # Return the view of the tokens in the files, read a section at a time.
+        return self._corpus_view(fileids, '_read_para_block', workers, sections=True)
+
+    def iter_documents(self, fileids=None, batch_size=None, tokens=None, workers=None):
+        """
+        Generates a CORD19DocumentRecord for each of the specified files, in
+        order, with the fileid, cord_uid, title, and the name and text of each
+        section of the abstract and body, so the corpus can be streamed
+        without building a list of everything. Only a batch of records and
+        the reader's recently used documents are kept in memory.
+
+        :param batch_size: Generate lists of up to this many records instead of one record at a time.
+        :param tokens: 'words', 'sents', or 'paras' to also give each record the
+            tokens of the document, the same as words(), sents(), or paras() give them.
+        :param workers: Read and tokenize the files with this many processes.
+        :rtype: iter(CORD19DocumentRecord) or iter(list(CORD19DocumentRecord))
+        """
+
+        # Check that the kind of tokens is known.
+        if (tokens not in (None, 'words', 'sents', 'paras')):
+            raise ValueError("tokens must be None, 'words', 'sents', or 'paras', not %r" % (tokens,))
+
+        # Check that there's a sentence tokenizer, if it's needed.
+        if (tokens in ('sents', 'paras') and self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        # Check that the batches have something in them.
+        if (batch_size is not None and batch_size < 1):
+            raise ValueError('batch_size must be at least 1')
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        return self._iter_documents(fileids, batch_size, tokens, workers)
+
+    def _iter_documents(self, fileids, batch_size, tokens, workers):
+        """
+        Generates the records for iter_documents(), once its arguments are checked.
+        """
+
+        # Check if documents are being read ahead in this process, and tell the prefetcher the order they'll be used in.
+        if (self._prefetcher is not None and (workers or self._workers) <= 1):
+            self._prefetcher.schedule(fileids)
+
+        # Look up cord_uids here, so worker processes don't need the metadata index.
+        metadata_index = self._get_metadata_index()
+        cord_uids = metadata_index.columns['cord_uid']
+
+        # Make an empty list to hold the batch.
+        batch = []
+
+        for (fileid, record) in self._map_files('_document_record', fileids, workers, (tokens,)):
+
+            # Fill in the cord_uid of the paper, if it's in metadata.csv.
+            row_numbers = metadata_index.fileid_rows.get(fileid)
+            if (row_numbers):
+                record.cord_uid = cord_uids[row_numbers[0]]
+
+            # Check if the records are generated one at a time.
+            if (batch_size is None):
+                yield record
+                continue
+
+            batch.append(record)
+
+            # Check if the batch is full.
+            if (len(batch) >= batch_size):
+                yield batch
+                batch = []
+
+        # Generate what's left over.
+        if (batch):
+            yield batch
+
+    def _document_record(self, fileid, tokens=None):
+        """
+        :return: The record of a file for iter_documents(), without its
+            cord_uid, with the kind of tokens asked for, if any.
+        :rtype: CORD19DocumentRecord
+        """
+
+        document = self.document(fileid)
+
+        # Make an empty list to hold the sections.
+        sections = []
+
+        # Check whether to include abstracts or not.
+        if (self._include_abstracts):
+            sections.extend(('abstract', section.get('section', ''), section['text']) for section in document.abstract)
+
+        # Check whether to include body_text or not.
+        if (self._include_bodies):
+            sections.extend(('body_text', section.get('section', ''), section['text']) for section in document.body_text)
+
+        # Check if the tokens were asked for, and tokenize the document the way the matching view does.
+        if (tokens is not None):
+            token_list = getattr(self, {
+                'words': '_tokenize_words',
+                'sents': '_tokenize_sentences',
+                'paras': '_tokenize_paragraphs',
+            }[tokens])(document)
+        else:
+            token_list = None
+
+        return CORD19DocumentRecord(fileid, None, document.title, sections, token_list)
+
+    def word_spans(self, fileids=None, workers=None):
+        """
+        :return: List of the (section, start, end) of each word of sents() in
+            the specified files, instead of the words themselves. Sections are
+            numbered within each file, in the order section_parts() gives them,
+            and start and end are offsets into the text of the section, the
+            same way the cite_spans and ref_spans in the files count.
+            Set workers to tokenize the files with that many processes.
+        :rtype: list(tuple(int, int, int))
+        """
+
+        # Check that there's a sentence tokenizer.
+        if (self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        # Return the view of the spans in the files.
+        return self._corpus_view(fileids, '_read_word_span_block', workers)
+
+    def sent_spans(self, fileids=None, workers=None):
+        """
+        :return: List of the (section, start, end) of each sentence of sents()
+            in the specified files, numbered like word_spans().
+            Set workers to tokenize the files with that many processes.
+        :rtype: list(tuple(int, int, int))
+        """
+
+        # Check that there's a sentence tokenizer.
+        if (self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        # Return the view of the spans in the files.
+        return self._corpus_view(fileids, '_read_sent_span_block', workers)
+
+    def token_spans(self, fileid):
+        """
+        :return: The offsets of the sentences and words of a file, as compact
+            arrays of integers, along with the text of its sections. Slice the
+            text to get a word only when it's needed.
+        :rtype: CORD19TokenSpans
+        """
+
+        # Check that there's a sentence tokenizer.
+        if (self._sent_tokenizer is None):
+            # Raise an error.
+            raise ValueError("No sentence tokenizer for this corpus reader")
+
+        return self._document_token_spans(self.document(fileid))
+
+    def section_parts(self, fileid):
+        """
+        :return: List of where each section counted by word_spans(),
+            sent_spans(), and paras() comes from in a file, as the part of the
+            document ('title', 'abstract', or 'body_text') and the number of
+            the section in that part, so spans can be matched up with the
+            sections' cite_spans and ref_spans, e.g. document(fileid).body_text[number].
+        :rtype: list(tuple(str, int))
+        """
+
+        document = self.document(fileid)
+
+        # Make an empty list to hold the parts.
+        parts = []
+
+        # Check whether to include titles or not.
+        if (self._include_titles):
+            parts.append(('title', 0))
+
+        # Check whether to include abstracts or not.
+        if (self._include_abstracts):
+            parts.extend(('abstract', number) for number in range(len(document.abstract)))
+
+        # Check whether to include body_text or not.
+        if (self._include_bodies):
+            parts.extend(('body_text', number) for number in range(len(document.body_text)))
+
+        return parts
+
+    # def journals(self, fileids = None):
+    #     """
+    #     :return: List of journals the papers were published in from metadata.csv.
+    #     :rtype: list(str)
+    #     """
+
+    # def publish_times(self, fileids = None):
+    #     """
+    #     :return: List of dates the papers were published from metadata.csv.
+    #     :rtype: list(str)
+    #     """
+
+    # def authors(self, fileids = None):
+    #     """
+    #     :return: List of authors for the papers from metadata.csv.
+    #     For each paper, a list is returned. A paper may have multiple authors.
+    #     Or, a paper might not have any authors listed.
+    #     :rtype: list(list(str))
+    #     """
+
+    # def countries(self, fileids = None):
+    #     """
+    #     :return: List of countries of the authors for the papers from metadata.csv.
+    #     For each paper, a list is returned. A paper may have multiple authors and thus multiple countries.
+    #     Or, a paper might not have any authors listed.
+    #     :rtype: list(list(str))
+    #     """
+
+    # def institutions(self, fileids = None):
+    #     """
+    #     :return: List of institutions of the authors for the papers from metadata.csv.
+    #     For each paper, a list is returned. A paper may have multiple authors and thus multiple institutions.
+    #     Or, a paper might not have any authors listed.
+    #     :rtype: list(list(str))
+    #     """
+
+    @profiled('metadata')
+    def metadata(self, fileids=None, fileids_only=True, compact=False):
+        """
+        :return: Dictionary of metadata from metadata.csv for the specified list of files. Set fileids_only = False if you want all metadata (even if the actual paper isn't in the corpus).
+            Set compact = True to get read-only CORD19MetadataRow views of the rows instead of dictionaries, which take far less memory.
+        :rtype: dict(list(dict))
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Grab the metadata index instead of reparsing metadata.csv.
+        metadata_index = self._get_metadata_index()
+
+        # Check whether to make views of the rows or copies of them.
+        if (compact):
+            make_rows = metadata_index.row_views
+        else:
+            make_rows = metadata_index.rows
+
+        # Check if fileids_only is False.
+        if (not fileids_only):
+
+            # Make an empty dictionary to hold the metadata.
+            metadata_dictionary = defaultdict(list)
+
+            # Go through each cord_uid in the metadata.
+            for (cord_uid, row_numbers) in metadata_index.cord_uid_rows.items():
+                # Use the cord_uid as the key and add the rows.
+                # The entries are lists since a cord_uid can appear in multiple rows.
+                metadata_dictionary[cord_uid] = make_rows(row_numbers)
+
+            # Return the metadata dictionary.
+            return metadata_dictionary
+
+        # Otherwise, make a dictionary of just the wanted stuff.
+        else:
+
+            # Make an empty dictionary to hold the metadata just for the fileids.
+            fileids_metadata_dictionary = defaultdict(list)
+
+            # Go through each fileid.
+            for fileid in fileids:
+                # Add the rows that list this fileid as one of their parse files.
+                fileids_metadata_dictionary[fileid] = make_rows(metadata_index.fileid_rows.get(fileid, []))
+
+            # Return the metadata for the fileids.
+            return fileids_metadata_dictionary
+
+    def select(self, fileids=None, has_pdf=None, has_pmc=None, **criteria):
+        """
+        :return: The fileids from the specified files (all of them by default)
+            that have a row in metadata.csv matching all the criteria. Each
+            criterion is a column name and what to match: a string to match
+            the value exactly, a list or set of strings to match any of them,
+            or a (start, end) tuple to match a range of values, where either
+            can be None. For example,
+            select(publish_time=('2020-03', '2020-04'), journal=['Nature', 'Lancet'], source_x='PMC').
+            Items of source_x are matched one at a time, so 'PMC' matches
+            'Elsevier; Medline; PMC'. Set has_pdf or has_pmc to True or False
+            to match rows that do or don't have that kind of parse.
+            The rows are found with indexes of the columns, which are built
+            the first time a column is used and stored in the cache directory.
+        :rtype: list(str)
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Make an empty list to hold the sorted arrays of rows matching each criterion.
+        row_arrays = []
+
+        # The parse columns are matched by whether they're empty.
+        for (fieldname, has_parse) in (('pdf_json_files', has_pdf), ('pmc_json_files', has_pmc)):
+
+            # Check if there's no criterion for this kind of parse.
+            if (has_parse is None):
+                continue
+
+            # Rows with a parse were collected while indexing, and the rows without one are the empty values.
+            if (has_parse):
+                row_arrays.append(self._get_metadata_index().parse_rows[fieldname])
+            else:
+                row_arrays.append(self._get_column_index(fieldname).rows_equal(''))
+
+        # Go through each of the other criteria.
+        for (fieldname, value) in criteria.items():
+            column_index = self._get_column_index(fieldname)
+
+            # Check if the criterion is a range of values, whose rows are sorted by value, not by row number.
+            if isinstance(value, tuple):
+                (start, end) = value
+                row_arrays.append(array.array('I', sorted(column_index.rows_between(start, end))))
+
+            # Check if the criterion is a string to match, whose rows are already in order.
+            elif isinstance(value, str):
+                row_arrays.append(column_index.rows_equal(value))
+
+            # Otherwise, it's a list of strings to match any of.
+            else:
+                rows = set()
+                for item in value:
+                    rows.update(column_index.rows_equal(item))
+                row_arrays.append(array.array('I', sorted(rows)))
+
+        # Check if there were no criteria, so every file matches.
+        if (not row_arrays):
+            return list(fileids)
+
+        # Keep only the rows that matched every criterion, starting from the fewest.
+        matching_rows = intersect_sorted(row_arrays)
+
+        # Find the files on the matching rows, in the order of the corpus.
+        (row_starts, row_fileid_numbers) = self._get_row_fileids()
+        matching_fileids = [
+            self._fileids[fileid_number]
+            for fileid_number in sorted(set(itertools.chain.from_iterable(
+                row_fileid_numbers[row_starts[row_number]:row_starts[row_number + 1]] for row_number in matching_rows
+            )))
+        ]
+
+        # Check if every file was asked about.
+        if (fileids is self._fileids):
+            return matching_fileids
+
+        # Otherwise, keep the specified files that matched, in the order they were given.
+        matching_fileids = set(matching_fileids)
+        return [fileid for fileid in fileids if fileid in matching_fileids]
+
+    def group_counts(self, fieldname, fileids=None, key=None):
+        """
+        :return: How many of the rows metadata() gives for the specified files
+            (all of them by default) have each value in a column of
+            metadata.csv. If key is given, the values are grouped by what key
+            returns for them instead, e.g., key=lambda value: value[:7] groups
+            publish_time by month. Items of source_x are counted one at a time.
+        :rtype: Counter
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        metadata_index = self._get_metadata_index()
+
+        # Check that the column is in metadata.csv.
+        if (fieldname not in metadata_index.columns):
+            raise ValueError('metadata.csv has no column named %r' % fieldname)
+
+        column = metadata_index.columns[fieldname]
+
+        # Gather up the rows for the files.
+        fileid_rows = metadata_index.fileid_rows
+        row_numbers = [row_number for fileid in fileids for row_number in fileid_rows.get(fileid, ())]
+
+        # Check if the column is stored as codes, and count the codes instead of making each value.
+        if isinstance(column, CORD19MetadataColumn):
+            codes = column.codes
+            value_counts = Counter()
+            for (code, count) in Counter(codes[row_number] for row_number in row_numbers).items():
+                value_counts[column.values[code]] += count
+
+        # Otherwise, count the values.
+        else:
+            value_counts = Counter(column[row_number] for row_number in row_numbers)
+
+        # Check if the values are lists, and count each item in them.
+        if (fieldname in CORD19MetadataColumnIndex.LIST_COLUMNS):
+            item_counts = Counter()
+            for (value, count) in value_counts.items():
+                for item in (value or '').split('; '):
+                    item_counts[item] += count
+            value_counts = item_counts
+
+        # Check if there's no key to group the values by.
+        if (key is None):
+            return value_counts
+
+        # Add up the counts of the values in each group.
+        group_counts = Counter()
+        for (value, count) in value_counts.items():
+            group_counts[key(value)] += count
+
+        return group_counts
+
+    def build_token_ids(self, workers=None):
+        """
+        Encodes the tokens of the corpus as integer IDs, for word_ids(),
+        sent_ids(), and vocabulary(), and stores them in the cache directory.
+        The documents are tokenized with workers processes, or the reader's
+        number of workers by default. Run it again after the corpus changes.
+        """
+
+        # Tokenize each document into paragraphs, and encode them.
+        documents = self._map_files('_file_paragraphs', self._fileids, workers)
+        (fileids, vocabulary) = CORD19TokenIds.write(os.path.join(self._cache_dir, 'token_ids'), documents)
+
+        # Store the index of the arrays last, so the token IDs are only used once they're complete.
+        self._write_cache(os.path.join('token_ids', 'index.pickle'), self._tokens_signature(), (fileids, vocabulary))
+
+        # Load the new token IDs next time they're needed.
+        self._token_ids = None
+
+    def word_ids(self, fileids=None):
+        """
+        :return: The IDs of the words in the specified files, as views of the
+            memory-mapped array of IDs built by build_token_ids(). The words are
+            the words of sents(). Look up what word an ID is with vocabulary().
+        :rtype: memoryview or list(int)
+        """
+
+        token_ids = self._get_token_ids()
+
+        # Check if no fileids are specified, and return all of the IDs.
+        if (fileids is None):
+            return token_ids.token_ids
+
+        # Check if the fileids is actually a string, and return the IDs of that file.
+        elif isinstance(fileids, str):
+            return token_ids.document_tokens(token_ids.document_numbers[fileids])
+
+        # Return the concatenation of the IDs of each file.
+        return LazyConcatenation([token_ids.document_tokens(token_ids.document_numbers[fileid]) for fileid in fileids])
+
+    def sent_ids(self, fileids=None):
+        """
+        :return: The sentences of the specified files, each as a view of the
+            IDs of its words in the memory-mapped array built by build_token_ids().
+        :rtype: list(memoryview)
+        """
+
+        token_ids = self._get_token_ids()
+
+        # Check if no fileids are specified, and return all of the sentences.
+        if (fileids is None):
+            return CORD19SentenceIdView(token_ids, 0, len(token_ids.sentence_starts) - 1)
+
+        # Check if the fileids is actually a string, and return the sentences of that file.
+        elif isinstance(fileids, str):
+            return token_ids.document_sentences(token_ids.document_numbers[fileids])
+
+        # Return the concatenation of the sentences of each file.
+        return LazyConcatenation([token_ids.document_sentences(token_ids.document_numbers[fileid]) for fileid in fileids])
+
+    def vocabulary(self):
+        """
+        :return: The words the token IDs from word_ids() and sent_ids() stand
+            for, in the order of their IDs.
+        :rtype: list(str)
+        """
+
+        return self._get_token_ids().vocabulary
+
+    def _get_token_ids(self):
+        """
+        :return: The token IDs built by build_token_ids().
+        :rtype: CORD19TokenIds
+        """
+
+        # Check if the token IDs have already been loaded by this reader.
+        if (self._token_ids is not None):
+            return self._token_ids
+
+        # Load the index of the arrays, if it was built for this corpus and these tokenizers.
+        index = self._read_cache(os.path.join('token_ids', 'index.pickle'), self._tokens_signature())
+
+        # Check if the token IDs haven't been built.
+        if (index is None):
+            raise ValueError('The token IDs are missing or out of date, so build them with build_token_ids()')
+
+        (fileids, vocabulary) = index
+
+        # Hold onto the token IDs for the rest of this reader's life.
+        self._token_ids = CORD19TokenIds(os.path.join(self._cache_dir, 'token_ids'), fileids, vocabulary)
+
+        return self._token_ids
+
+    def build_index(self, workers=None):
+        """
+        Builds the positional inverted index used by search() and
+        concordance(), and stores it in the cache directory. The documents
+        are tokenized with workers processes, or the reader's number of
+        workers by default. The postings of each document are also kept in
+        the cache directory, so running it again after the corpus changes
+        only tokenizes the documents that changed.
+        """
+
+        # Work out the postings of each document, and merge them into the index.
+        documents = self._map_files('_file_postings', self._fileids, workers)
+        (fileids, terms) = CORD19InvertedIndex.write(os.path.join(self._cache_dir, 'index'), documents)
+
+        # Store the index of the arrays last, so the inverted index is only used once it's complete.
+        self._write_cache(os.path.join('index', 'index.pickle'), self._tokens_signature(), (fileids, terms))
+
+        # Load the new inverted index next time it's needed.
+        self._inverted_index = None
+
+    def search(self, term_or_phrase):
+        """
+        :return: Dictionary of the fileid of each file a word or phrase is in,
+            to the positions it starts at. The positions count the words of
+            sents() from the beginning of the file. A phrase is split into
+            words with the word tokenizer, or can be given as a list of words.
+        :rtype: dict(list(int))
+        """
+
+        inverted_index = self._get_inverted_index()
+
+        # Find the phrase, and return the fileids instead of the document numbers.
+        return {
+            inverted_index.fileids[document_number]: starts
+            for (document_number, starts) in inverted_index.find(self._query_words(term_or_phrase)).items()
+        }
+
+    def concordance(self, term_or_phrase, width=80, lines=25):
+        """
+        :return: Lines of up to width characters around each place a word or
+            phrase is, for up to lines places, like the concordance of an
+            nltk.text.Text. Each one is a (fileid, ConcordanceLine) pair, and
+            the offset of the ConcordanceLine is the position in the file.
+            The context is looked up from the token IDs if build_token_ids()
+            has been run, and otherwise the files are tokenized again.
+        :rtype: list(tuple(str, ConcordanceLine))
+        """
+
+        phrase = self._query_words(term_or_phrase)
+        query = ' '.join(phrase)
+
+        # Work out how much context to show, like nltk.text.ConcordanceIndex does.
+        half_width = (width - len(query) - 2) // 2
+        context = width // 4
+
+        # Make a list to hold the concordance lines.
+        concordance_list = []
+
+        # Grab the token IDs, so the context can be looked up instead of tokenizing the files again.
+        token_ids = self._get_token_ids_if_built()
+
+        # Go through each file the phrase is in.
+        for (fileid, starts) in self.search(phrase).items():
+
+            # Check if there's token IDs for the file, and grab them.
+            if (token_ids is not None and fileid in token_ids.document_numbers):
+                word_ids = token_ids.document_tokens(token_ids.document_numbers[fileid])
+                vocabulary = token_ids.vocabulary
+
+            # Otherwise, the words have to come from tokenizing the file again.
+            else:
+                word_ids = None
+                words = [word for paragraph in self._file_paragraphs(fileid) for sentence in paragraph for word in sentence]
+
+            # Go through each place the phrase is.
+            for start in starts:
+
+                # Check if there's enough lines.
+                if (len(concordance_list) >= lines):
+                    return concordance_list
+
+                # Find the context of the phrase, only looking up the words around it if there's token IDs.
+                if (word_ids is not None):
+                    left_context = [vocabulary[token_id] for token_id in word_ids[max(0, start - context):start]]
+                    right_context = [vocabulary[token_id] for token_id in word_ids[start + len(phrase):start + context]]
+                else:
+                    left_context = words[max(0, start - context):start]
+                    right_context = words[start + len(phrase):start + context]
+
+                # Create the pretty lines with the phrase in the middle.
+                left_print = ' '.join(left_context)[-half_width:]
+                right_print = ' '.join(right_context)[:half_width]
+
+                concordance_list.append((fileid, ConcordanceLine(
+                    left_context, query, right_context, start, left_print, right_print,
+                    ' '.join([left_print, query, right_print]))))
+
+        return concordance_list
+
+    def _get_token_ids_if_built(self):
+        """
+        :return: The token IDs built by build_token_ids(), or None if they
+            haven't been built or are out of date.
+        :rtype: CORD19TokenIds
+        """
+
+        try:
+            return self._get_token_ids()
+        except ValueError:
+            return None
+
+    def _query_words(self, term_or_phrase):
+        """
+        :return: The words of a word or phrase being searched for.
+        :rtype: list(str)
+        """
+
+        # Check if the phrase is already split into words.
+        if (not isinstance(term_or_phrase, str)):
+            return list(term_or_phrase)
+
+        return self._word_tokenizer.tokenize(term_or_phrase)
+
+    def _file_postings(self, fileid):
+        """
+        :return: Dictionary of each word in a file to an array of its positions,
+            counting the words of sents(). The postings are stored in the cache
+            directory by the contents of the file.
+        :rtype: dict(array)
+        """
+
+        # Grab the parsed document.
+        document = self.document(fileid)
+
+        # Check if the postings for this document are already in the cache.
+        cache_key = self._tokens_key('postings', fileid, document.digest)
+        cache_name = os.path.join('postings', cache_key[:2], cache_key + '.pickle')
+        postings = self._read_cache(cache_name, cache_key)
+        if (postings is not None):
+            return postings
+
+        # Make a dictionary to hold the positions of each word.
+        postings = {}
+        position = 0
+
+        # Go through each word.
+        for paragraph in self._tokenize_paragraphs(document):
+            for sentence in paragraph:
+                for word in sentence:
+
+                    # Add the position to the word's positions.
+                    positions = postings.get(word)
+                    if (positions is None):
+                        positions = postings[word] = array.array('I')
+                    positions.append(position)
+
+                    position += 1
+
+        # Store the postings for next time.
+        self._write_cache(cache_name, cache_key, postings)
+
+        return postings
+
+    def _get_inverted_index(self):
+        """
+        :return: The inverted index built by build_index().
+        :rtype: CORD19InvertedIndex
+        """
+
+        # Check if the inverted index has already been loaded by this reader.
+        if (self._inverted_index is not None):
+            return self._inverted_index
+
+        # Load the index of the arrays, if it was built for this corpus and these tokenizers.
+        index = self._read_cache(os.path.join('index', 'index.pickle'), self._tokens_signature())
+
+        # Check if the inverted index hasn't been built.
+        if (index is None):
+            raise ValueError('The inverted index is missing or out of date, so build it with build_index()')
+
+        (fileids, terms) = index
+
+        # Hold onto the inverted index for the rest of this reader's life.
+        self._inverted_index = CORD19InvertedIndex(os.path.join(self._cache_dir, 'index'), fileids, terms)
+
+        return self._inverted_index
+
+    def build_citation_graph(self, workers=None):
+        """
+        Builds the graph of which papers cite which, used by cites(),
+        cited_by(), and most_cited(), and stores it in the cache directory.
+        The references of each document are matched to papers in metadata.csv
+        by DOI, PMC ID, PubMed ID, or title. The documents are read with
+        workers processes, or the reader's number of workers by default. Run
+        it again after the corpus changes.
+        """
+
+        metadata_index = self._get_metadata_index()
+
+        # Number the papers by their cord_uids.
+        cord_uids = list(metadata_index.cord_uid_rows)
+        paper_numbers = {cord_uid: paper_number for (paper_number, cord_uid) in enumerate(cord_uids)}
+
+        # Hash the keys in metadata.csv references can be matched by.
+        lookup = CORD19CitationGraph.key_lookup(metadata_index, paper_numbers)
+
+        # Make an empty list to hold the papers each document cites.
+        citations = []
+
+        # Go through the references of each document.
+        for (fileid, reference_keys) in self._map_files('_file_reference_keys', self._fileids, workers):
+
+            # Check if the document isn't in metadata.csv, so it isn't a paper in the graph.
+            row_numbers = metadata_index.fileid_rows.get(fileid)
+            if (not row_numbers):
+                continue
+
+            paper_number = paper_numbers[metadata_index.columns['cord_uid'][row_numbers[0]]]
+            cited_paper_numbers = array.array('I')
+
+            # Match each reference by the first of its keys that's in metadata.csv.
+            for keys in reference_keys:
+                for key in keys:
+                    cited_paper_number = lookup.get(key)
+                    if (cited_paper_number is not None):
+
+                        # Leave out papers citing themselves.
+                        if (cited_paper_number != paper_number):
+                            cited_paper_numbers.append(cited_paper_number)
+                        break
+
+            citations.append((paper_number, cited_paper_numbers))
+
+        CORD19CitationGraph.write(os.path.join(self._cache_dir, 'citations'), len(cord_uids), citations)
+
+        # Store the index of the arrays last, so the graph is only used once it's complete.
+        self._write_cache(os.path.join('citations', 'index.pickle'), self._citation_graph_signature(), cord_uids)
+
+        # Load the new graph next time it's needed.
+        self._citation_graph = None
+
+    def cites(self, fileid_or_cord_uid):
+        """
+        :return: The cord_uids of the papers in metadata.csv that a paper cites,
+            from the graph built by build_citation_graph(). The paper can be
+            given by the fileid of one of its parses, or by its cord_uid.
+        :rtype: list(str)
+        """
+
+        citation_graph = self._get_citation_graph()
+        cord_uids = citation_graph.cord_uids
+
+        return [cord_uids[paper_number] for paper_number in citation_graph.cited_papers(self._paper_number(fileid_or_cord_uid))]
+
+    def cited_by(self, fileid_or_cord_uid):
+        """
+        :return: The cord_uids of the papers in the corpus citing a paper, from
+            the graph built by build_citation_graph(). The paper can be given by
+            the fileid of one of its parses, or by its cord_uid.
+        :rtype: list(str)
+        """
+
+        citation_graph = self._get_citation_graph()
+        cord_uids = citation_graph.cord_uids
+
+        return [cord_uids[paper_number] for paper_number in citation_graph.citing_papers(self._paper_number(fileid_or_cord_uid))]
+
+    def most_cited(self, count=10):
+        """
+        :return: The cord_uids of the count papers cited by the most papers in
+            the corpus, with how many papers cite each one, most first.
+        :rtype: list(tuple(str, int))
+        """
+
+        citation_graph = self._get_citation_graph()
+
+        return [
+            (citation_graph.cord_uids[paper_number], citation_graph.citation_count(paper_number))
+            for paper_number in citation_graph.ranking[:count]
+        ]
+
+    def _paper_number(self, fileid_or_cord_uid):
+        """
+        :return: The number of a paper in the citation graph, given by the
+            fileid of one of its parses or by its cord_uid.
+        :rtype: int
+        """
+
+        paper_numbers = self._get_citation_graph().paper_numbers
+
+        # Check if it's a cord_uid.
+        if (fileid_or_cord_uid in paper_numbers):
+            return paper_numbers[fileid_or_cord_uid]
+
+        metadata_index = self._get_metadata_index()
+
+        # Check that it's a fileid in metadata.csv.
+        row_numbers = metadata_index.fileid_rows.get(fileid_or_cord_uid)
+        if (not row_numbers):
+            raise ValueError('%r is neither a cord_uid nor a fileid in metadata.csv' % fileid_or_cord_uid)
+
+        return paper_numbers[metadata_index.columns['cord_uid'][row_numbers[0]]]
+
+    def _file_reference_keys(self, fileid):
+        """
+        :return: The keys each reference in a file's bib_entries can be matched to a paper by.
+        :rtype: list(list(tuple(str, str)))
+        """
+
+        return [CORD19CitationGraph.reference_keys(bib_entry) for bib_entry in self.document(fileid).bib_entries.values()]
+
+    def _citation_graph_signature(self):
+        """
+        :return: What the citation graph depends on: the layout of the graph,
+            the version of metadata.csv, and the fileids.
+        :rtype: tuple
+        """
+
+        # Hash the fileids together, rather than storing all of them in the signature.
+        fileids_hash = hashlib.blake2b('\n'.join(self._fileids).encode('utf8'), digest_size=20).hexdigest()
+
+        return (CORD19CitationGraph.VERSION, self._metadata_signature(), fileids_hash)
+
+    def _get_citation_graph(self):
+        """
+        :return: The citation graph built by build_citation_graph().
+        :rtype: CORD19CitationGraph
+        """
+
+        # Check if the graph has already been loaded by this reader.
+        if (self._citation_graph is not None):
+            return self._citation_graph
+
+        # Load the index of the arrays, if it was built for this corpus.
+        cord_uids = self._read_cache(os.path.join('citations', 'index.pickle'), self._citation_graph_signature())
+
+        # Check if the graph hasn't been built.
+        if (cord_uids is None):
+            raise ValueError('The citation graph is missing or out of date, so build it with build_citation_graph()')
+
+        # Hold onto the graph for the rest of this reader's life.
+        self._citation_graph = CORD19CitationGraph(os.path.join(self._cache_dir, 'citations'), cord_uids)
+
+        return self._citation_graph
+
+    def _tokens_signature(self):
+        """
+        :return: What the token IDs and the inverted index depend on: the
+            version of metadata.csv, the fileids, which sections are included,
+            and the tokenizers.
+        :rtype: tuple
+        """
+
+        # Hash the fileids together, rather than storing all of them in the signature.
+        fileids_hash = hashlib.blake2b('\n'.join(self._fileids).encode('utf8'), digest_size=20).hexdigest()
+
+        return (
+            self.TOKEN_CACHE_VERSION,
+            file_signature(self._metadata_file or self._archive),
+            fileids_hash,
+            self._include_titles,
+            self._include_abstracts,
+            self._include_bodies,
+            self._tokenizer_fingerprints('paras'),
+        )
+
+    def _map_files(self, method_name, fileids, workers=None, arguments=()):
+        """
+        Generates a (fileid, result) pair for each of the specified files, in
+        order, where the result is what the named method of the reader returns
+        for the fileid and arguments. The method is called by a pool of workers
+        processes if workers is more than one, or the reader's number of
+        workers by default.
+        """
+
+        # Check if the number of workers wasn't given.
+        if (workers is None):
+
+            # Use the number of workers for this corpus reader.
+            workers = self._workers
+
+        # Check if the files should be handled in this process.
+        if (workers <= 1):
+            for fileid in fileids:
+                yield (fileid, getattr(self, method_name)(fileid, *arguments))
+            return
+
+        executor = ProcessPoolExecutor(workers, initializer=_initialize_worker, initargs=(self,))
+
+        try:
+            # The files handed out to the pool, in order.
+            futures = deque()
+
+            for fileid in fileids:
+
+                # Keep a window of files handed out, so the results don't pile up.
+                futures.append((fileid, executor.submit(_call_in_worker, method_name, fileid, arguments)))
+                if (len(futures) >= 4 * workers):
+                    (finished_fileid, future) = futures.popleft()
+                    yield (finished_fileid, future.result())
+
+            # Wait for the rest of the files.
+            while (futures):
+                (finished_fileid, future) = futures.popleft()
+                yield (finished_fileid, future.result())
+
+        finally:
+            # Don't wait on files that won't be needed if iteration stopped early.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _file_paragraphs(self, fileid):
+        """
+        :return: List of paragraphs in a file, which is each a list of sentences, which is each a list of words.
+        :rtype: list(list(list(str)))
+        """
+
+        return self._tokenize_paragraphs(self.document(fileid))
+
+    def freq_dist(self, fileids=None, lower=True, stopwords=None, workers=None):
+        """
+        :return: The frequency distribution of the words from the specified
+            files, lowercased if lower is True, leaving out any in stopwords.
+            The words of each file are counted by workers processes, or the
+            reader's number of workers by default. The counts for each file are
+            kept in the cache directory, so only the files that haven't been
+            counted before are tokenized.
+        :rtype: FreqDist
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Make the stopwords quick to look up.
+        stopwords = frozenset(stopwords or ())
+
+        # Make an empty frequency distribution.
+        frequency_distribution = FreqDist()
+
+        # Add in the counts of each file.
+        for (fileid, counts) in self._map_files('_file_counts', fileids, workers, (lower, stopwords)):
+            frequency_distribution.update(counts)
+
+        return frequency_distribution
+
+    def _file_statistics(self, fileid):
+        """
+        :return: The counts of a file, in the order of CORD19CorpusStatistics.COLUMNS.
+            The counts are stored in the cache directory by the contents of the file.
+        :rtype: tuple(int)
+        """
+
+        # Grab the parsed document.
+        document = self.document(fileid)
+
+        # Check if the counts for this document are already in the cache.
+        cache_key = self._tokens_key('statistics', fileid, document.digest)
+        cache_name = os.path.join('statistics', cache_key[:2], cache_key + '.pickle')
+        counts = self._read_cache(cache_name, cache_key)
+        if (counts is not None):
+            return counts
+
+        # The sections of each part of the paper that's included, in the order paras() has them.
+        parts = (
+            [{'text': document.title, 'section': 'title'}] if (self._include_titles) else [],
+            document.abstract if (self._include_abstracts) else [],
+            document.body_text if (self._include_bodies) else [],
+        )
+
+        # Start with the number of words from words().
+        counts = [len(self._tokenize_words(document))]
+
+        # Go through the paragraphs of the document, a part of the paper at a time.
+        paragraphs = iter(self._tokenize_paragraphs(document))
+        for sections in parts:
+            paragraph_list = [next(paragraphs) for section in sections]
+
+            # A section of the paper is a run of paragraphs under the same heading.
+            section_names = [section.get('section') for section in sections]
+            section_count = sum(
+                1 for (section_number, name) in enumerate(section_names)
+                if section_number == 0 or name != section_names[section_number - 1]
+            )
+
+            counts.extend([
+                sum(len(sentence) for paragraph in paragraph_list for sentence in paragraph),
+                sum(len(paragraph) for paragraph in paragraph_list),
+                len(paragraph_list),
+                section_count,
+                sum(len(section['text'].encode('utf8')) for section in sections),
+            ])
+
+        counts = tuple(counts)
+
+        # Store the counts for next time.
+        self._write_cache(cache_name, cache_key, counts)
+
+        return counts
+
+    def _file_counts(self, fileid, lower=False, stopwords=frozenset()):
+        """
+        :return: How many times each word from words() is in a file,
+            lowercased if lower is True, leaving out any in stopwords. The
+            counts are stored in the cache directory by the contents of the file.
+        :rtype: Counter
+        """
+
+        # Grab the parsed document.
+        document = self.document(fileid)
+
+        # Check if the counts for this document are already in the cache.
+        cache_key = self._tokens_key('counts', fileid, document.digest)
+        cache_name = os.path.join('counts', cache_key[:2], cache_key + '.pickle')
+        counts = self._read_cache(cache_name, cache_key)
+
+        # Check if the words have to be counted.
+        if (counts is None):
+
+            # Count the words.
+            counts = Counter(self._tokenize_words(document))
+
+            # Store the counts for next time.
+            self._write_cache(cache_name, cache_key, counts)
+
+        # Check if the counts can be used as is.
+        if (not lower and not stopwords):
+            return counts
+
+        # Make a new counter to hold the lowercased counts.
+        filtered_counts = Counter()
+
+        # Go through each word.
+        for (word, count) in counts.items():
+
+            # Check whether to lowercase the word.
+            if (lower):
+                word = word.lower()
+
+            # Check if the word isn't a stopword, and count it.
+            if (word not in stopwords):
+                filtered_counts[word] += count
+
+        return filtered_counts
+
+    def metadata_table(self):
+        """
+        :return: The columnar table of all the rows in metadata.csv. Columns are
+            available from its columns dictionary, and rows are indexed by cord_uid in
+            cord_uid_rows and by parse fileid in fileid_rows.
+        :rtype: CORD19MetadataIndex
+        """
+
+        return self._get_metadata_index()
+
+    def build_statistics(self, workers=None):
+        """
+        Counts the words, tokens, sentences, paragraphs, sections, and bytes of
+        each document in one pass, and stores the counts in the cache directory.
+        The documents are counted with workers processes, or the reader's
+        number of workers by default. After that, the lengths of words(),
+        sents(), and paras() are known without tokenizing anything, and
+        statistics() reports on the counts. Run it again after the corpus changes.
+        """
+
+        # Count each document.
+        documents = self._map_files('_file_statistics', self._fileids, workers)
+
+        # Count the files in the parse directories too, so statistics() doesn't have to list them.
+        parse_file_counts = {
+            directory: self._count_parse_files(directory)
+            for directory in ('document_parses/pdf_json/', 'document_parses/pmc_json/')
+        }
+
+        corpus_statistics = CORD19CorpusStatistics.from_counts(documents, parse_file_counts)
+
+        # Store the counts, for this corpus and these tokenizers.
+        self._write_cache('statistics.pickle', self._tokens_signature(), corpus_statistics)
+
+        # Use the new counts from now on.
+        self._corpus_statistics = corpus_statistics
+
+    def corpus_statistics(self):
+        """
+        :return: The counts of each document built by build_statistics().
+        :rtype: CORD19CorpusStatistics
+        """
+
+        corpus_statistics = self._get_corpus_statistics()
+
+        # Check if the counts haven't been built.
+        if (corpus_statistics is None):
+            raise ValueError('The corpus statistics are missing or out of date, so build them with build_statistics()')
+
+        return corpus_statistics
+
+    def _get_corpus_statistics(self):
+        """
+        :return: The counts of each document built by build_statistics(), or
+            None if they haven't been built for this corpus and these tokenizers.
+        :rtype: CORD19CorpusStatistics
+        """
+
+        # Check if the counts haven't been looked for by this reader yet.
+        if (self._corpus_statistics is None):
+
+            # Check if they were never built, before working out the signature they'd need, which loads the tokenizers.
+            if (not os.path.exists(os.path.join(self._cache_dir, 'statistics.pickle'))):
+                self._corpus_statistics = False
+
+            # Otherwise, load the counts, remembering if they're out of date so they're only looked for once.
+            else:
+                self._corpus_statistics = self._read_cache('statistics.pickle', self._tokens_signature()) or False
+
+        return self._corpus_statistics or None
+
+    def statistics(self):
+        """
+        :return: Nothing. Prints some information about the entries in metadata.csv and files present in the corpus.
+            If build_statistics() has been run, it also prints how many tokens, sentences,
+            paragraphs, and sections there are, and how they're spread across the documents.
+        :rtype: ???
+        """
+
+        # Grab the counts the metadata index collected when it was built.
+        counts = self._get_metadata_index().counts
+
+        # Print information about corpus from metadata.csv.
+        print('metadata.csv:')
+        print('\tRows:', counts['rows'])
+        print('\tUnique cord_uids:', counts['unique_cord_uids'])
+        print('\tRows with PDF Parses:', counts['pdf'])
+        print('\tRows with PMC Parses:', counts['pmc'])
+        print('\tRows with PDF Parses and No PMC Parses:', counts['pdf_no_pmc'])
+        print('\tRows with PMC Parses and No PDF Parses:', counts['pmc_no_pdf'])
+        print('\tRows with Both:', counts['both'])
+        print('\tRows with Neither:', counts['neither'])
+        print('\tTotal PDF Parse File:', counts['total_pdf'])
+
+        # Grab the counts of each document, if they've been built.
+        corpus_statistics = self._get_corpus_statistics()
+
+        # Check if the files in the parse directories were counted along with the documents.
+        if (corpus_statistics is not None):
+            parse_file_counts = corpus_statistics.parse_file_counts
+
+        # Otherwise, count them now.
+        else:
+            parse_file_counts = {
+                directory: self._count_parse_files(directory)
+                for directory in ('document_parses/pdf_json/', 'document_parses/pmc_json/')
+            }
+
+        # Print information for the parse directories.
+        print('Parse Directories:')
+        print('\tpdf_json:', parse_file_counts['document_parses/pdf_json/'])
+        print('\tpmc_json:', parse_file_counts['document_parses/pmc_json/'])
+
+        # Check if there's no counts of each document to report on.
+        if (corpus_statistics is None):
+            return
+
+        # Print the totals across the documents.
+        print('Documents:', len(corpus_statistics.fileids))
+        print('\tWords:', corpus_statistics.total('words'))
+        for count in CORD19CorpusStatistics.COUNTS:
+            print('\t%s: %d (%s)' % (
+                count.capitalize(),
+                corpus_statistics.total(count),
+                ', '.join(
+                    '%s %d' % (part, corpus_statistics.total(part + '_' + count))
+                    for part in CORD19CorpusStatistics.PARTS
+                )
+            ))
+
+        # Print how the tokens and sentences are spread across the documents.
+        for count in ('tokens', 'sentences'):
+            distribution = corpus_statistics.distribution(count)
+
+            # Check if there were no documents to spread them across.
+            if (not distribution):
+                continue
+
+            print('\t%s per Document: mean %.1f, min %d, 10%% %d, 25%% %d, median %d, 75%% %d, 90%% %d, max %d' % (
+                count.capitalize(), distribution['mean'], distribution['min'], distribution[10], distribution[25],
+                distribution[50], distribution[75], distribution[90], distribution['max']
+            ))
+
+    def _count_parse_files(self, directory):
+        """
+        :return: The number of files in one of the parse directories.
+        :rtype: int
+        """
+
+        # Check if the corpus is packed, and count the packed files that were in the directory.
+        if (self._pack is not None):
+            return sum(1 for fileid in self._pack.locations if fileid.startswith(directory))
+
+        return len(os.listdir(os.path.join(self._root.path, directory)))
+
+    @profiled('citations')
+    def citations(self, fileids=None):
+        """
+        :return: Returns the citations for a fileid, list of fileids, or all the fileids.
+        :rtype: dict(dict)
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Make a dictionry to store the raw texts.
+        citations_dictionary = {}
+
+        # Go through each file ID in the list.
+        for fileid in fileids:
+
+            # Grab the citations from the parsed document.
+            citations_dictionary[fileid] = self.document(fileid).bib_entries
+
+        # Concatenate the items in the list and return the result.
         return citations_dictionary
 
+    def precomputed_sents(self, fileids=None):
+        """
+        :return: The sentences of the specified files, read lazily from the
+            outputs written by generate_corpus_computations.py to precomputed_dir.
+        :rtype: list(list(str))
+        """
+
+        return self._precomputed_view(fileids, 'sents', self._read_precomputed_block)
+
+    def precomputed_words(self, fileids=None):
+        """
+        :return: The words of the specified files, read lazily from the
+            outputs written by generate_corpus_computations.py to precomputed_dir.
+        :rtype: list(str)
+        """
+
+        return self._precomputed_view(fileids, 'words', self._read_precomputed_word_block)
+
+    def precomputed_lemmae(self, fileids=None):
+        """
+        :return: The Porter stemmed sentences of the specified files, read
+            lazily from the outputs written by generate_corpus_computations.py
+            to precomputed_dir.
+        :rtype: list(list(str))
+        """
+
+        return self._precomputed_view(fileids, 'lemmae', self._read_precomputed_block)
+
+    def precomputed_citations(self, fileids=None):
+        """
+        :return: The citations of the specified files, like citations(), read
+            from the outputs written by generate_corpus_computations.py to precomputed_dir.
+        :rtype: dict(dict)
+        """
+
+        return self._precomputed_records(fileids, 'citations')
+
+    def precomputed_metadata(self, fileids=None):
+        """
+        :return: The metadata of the specified files, like metadata(), read
+            from the outputs written by generate_corpus_computations.py to precomputed_dir.
+        :rtype: dict(list(dict))
+        """
+
+        return self._precomputed_records(fileids, 'metadata')
+
+    def _precomputed_pointer(self, kind, fileid):
+        """
+        :return: A path pointer to a kind of precomputed output for a fileid,
+            which is either compressed or not.
+        :rtype: PathPointer
+        """
+
+        # Check if the reader was told where the outputs are.
+        if (self._precomputed_dir is None):
+            raise ValueError('No precomputed_dir was given to the corpus reader')
+
+        # Check if the output isn't compressed.
+        location = precomputed_location(self._precomputed_dir, kind, fileid)
+        if (os.path.exists(location)):
+            return FileSystemPathPointer(location)
+
+        # Otherwise, it has to be compressed.
+        return CORD19GzipPathPointer(precomputed_location(self._precomputed_dir, kind, fileid, compressed=True))
+
+    def _precomputed_view(self, fileids, kind, block_reader):
+        """
+        :return: A view of the records in a kind of precomputed output for the
+            specified files, read by block_reader.
+        :rtype: list
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Return the concatenation of views of each file.
+        return concat([self.CorpusView(self._precomputed_pointer(kind, fileid), block_reader) for fileid in fileids])
+
+    def _precomputed_records(self, fileids, kind):
+        """
+        :return: Dictionary of fileid to the record in a kind of precomputed
+            output that holds one record for each file.
+        :rtype: dict
+        """
+
+        # Check if no fileids are specified.
+        if (fileids is None):
+
+            # Use the fileids in this corpus.
+            fileids = self._fileids
+
+        # Check if the fileids is actually a string.
+        elif isinstance(fileids, str):
+
+            # Make a list containing that string.
+            fileids = [fileids]
+
+        # Make a dictionary to store the records.
+        records_dictionary = {}
+
+        # Go through each file ID in the list.
+        for fileid in fileids:
+
+            # Read the record from the output.
+            stream = self._precomputed_pointer(kind, fileid).open('utf8')
+            try:
+                records_dictionary[fileid] = json_loads(stream.read())
+            finally:
+                stream.close()
+
+        return records_dictionary
+
+    def document(self, fileid):
+        """
+        :return: The parsed document for a fileid. Recently used documents are
+            kept in memory, so the file is only read and parsed again once
+            document_cache_size other documents have been used since.
+        :rtype: CORD19Document
+        """
+
+        # Check if documents are being read ahead, and take this one if it was.
+        # Either way, the prefetcher moves on to reading the documents after it.
+        if (self._prefetcher is not None):
+            prefetched_document = self._prefetcher.take(fileid)
+        else:
+            prefetched_document = None
+
+        # Check if the document was used recently.
+        document = self._documents.get(fileid)
+        if (document is not None):
+
+            # Mark it as the most recently used.
+            self._documents.move_to_end(fileid)
+
+            return document
+
+        # Check if the document was read ahead.
+        if (prefetched_document is not None):
+            document = prefetched_document
+
+        # Otherwise, parse the document from the contents of the file.
+        else:
+            document = CORD19Document(fileid, self._read_text(fileid), self._profile)
+
+        # Remember the document.
+        self._cache_document(document)
+
+        return document
+
+    @profiled('open')
+    def _read_text(self, fileid):
+        """
+        :return: The contents of a file.
+        :rtype: str
+        """
+
+        # Check if the corpus is packed, and decode the file straight from the memory-mapped shard.
+        if (self._pack is not None):
+            return str(self._pack.data(fileid), self.encoding(fileid))
+
+        # Otherwise, read the contents of the file.
+        stream = self.open(fileid)
+        try:
+            return stream.read()
+        finally:
+            stream.close()
+
+    def profile(self, enabled=True, callback=None):
+        """
+        Turns timing each stage of reading the corpus on or off. While it's
+        on, the wall time, calls, and bytes of opening files, decoding JSON,
+        splitting sentences and words, and parsing metadata.csv are added up,
+        along with raw(), citations(), metadata(), and the files read by
+        words(), sents(), and paras(). Files tokenized by worker processes
+        aren't counted. While it's off, the only cost is checking that it is.
+
+        :param enabled: Whether to turn profiling on or off.
+        :param callback: A function to also call with the stage, seconds, and bytes of every call.
+        :return: The CORD19Profile the stages are added up in, or None if profiling was turned off.
+        :rtype: CORD19Profile
+        """
+
+        # Check if profiling is being turned off.
+        if (not enabled):
+            self._profile = None
+
+        # Otherwise, start a new profile, unless there's one going already.
+        elif (self._profile is None):
+            self._profile = CORD19Profile()
+
+        # Check if there's a function to call too.
+        if (enabled and callback is not None):
+            self._profile.callbacks.append(callback)
+
+        # The recently used documents add up their decoding in the same profile.
+        for document in self._documents.values():
+            document.profile = self._profile
+
+        return self._profile
+
+    def profile_stats(self):
+        """
+        :return: Dictionary of each stage of reading the corpus to its
+            'calls', 'seconds', and 'bytes' since profile() was turned on.
+            See CORD19Profile.
+        :rtype: dict(dict)
+        """
+
+        # Check that the reader is being profiled.
+        if (self._profile is None):
+            raise ValueError('The reader is only profiled after calling profile()')
+
+        return self._profile.stats()
+
+    def prefetch_stats(self):
+        """
+        :return: The counters of the documents read ahead by the prefetcher,
+            turned on with the prefetch parameter: how many were read ahead
+            and used, and how many seconds of reading the threads did and the
+            reader still waited for. See CORD19Prefetcher.stats().
+        :rtype: dict
+        """
+
+        # Check that documents are being read ahead.
+        if (self._prefetcher is None):
+            raise ValueError('Documents are only read ahead if the reader is made with prefetch more than 0')
+
+        return self._prefetcher.stats()
+
+    def _stream_document(self, stream, fileid):
+        """
+        :return: The parsed document for the file a block reader's stream is
+            reading, using the recently used documents when possible. Either
+            way, the stream is left at the end of the file.
+        :rtype: CORD19Document
+        """
+
+        # Check if the document was used recently.
+        document = self._documents.get(fileid)
+        if (document is not None):
+
+            # Mark it as the most recently used.
+            self._documents.move_to_end(fileid)
+
+            # Skip to the end of the file, since it doesn't need reading.
+            stream.seek(0, 2)
+
+            return document
+
+        # Check if the corpus is packed, and skip copying the file through the stream.
+        if (self._pack is not None and fileid is not None):
+            stream.seek(0, 2)
+            return self.document(fileid)
+
+        # Check if reading is being profiled, and time it.
+        if (self._profile is not None):
+            start_time = time.perf_counter()
+            file_text = stream.read()
+            self._profile.add('open', time.perf_counter() - start_time, len(file_text))
+
+        else:
+            file_text = stream.read()
+
+        # Parse the document from the contents of the file.
+        document = CORD19Document(fileid, file_text, self._profile)
+
+        # Remember the document, if the fileid is known.
+        if (fileid is not None):
+            self._cache_document(document)
+
+        return document
+
+    def _cache_document(self, document):
+        """
+        Adds a document to the recently used documents, forgetting the least
+        recently used ones if there's too many.
+        """
+
+        self._documents[document.fileid] = document
+
+        # Forget documents until there's few enough.
+        while (len(self._documents) > self._document_cache_size):
+            self._documents.popitem(last=False)
+
+    def _corpus_view(self, fileids, block_reader_name, workers, sections=False):
+        """
+        :return: A view of the tokens read from the specified files by the
+            named block reader, either all in this process or spread across a
+            pool of worker processes. If sections is True, the block reader
+            reads sentences or paragraphs, and files read in this process are
+            read a section at a time instead, unless the token cache is on,
+            since it holds the tokens of whole files.
+        :rtype: list
+        """
+
+        # Check if the number of workers wasn't given.
+        if (workers is None):
+
+            # Use the number of workers for this corpus reader.
+            workers = self._workers
+
+        paths = self.abspaths(fileids, True, True)
+
+        # Look up the number of tokens in each file, if the corpus statistics have been built.
+        lengths = self._view_lengths(block_reader_name, [fileid for (path, encoding, fileid) in paths])
+
+        # Check if the files should be read by a pool of processes.
+        if (workers > 1):
+
+            # Make a view that hands the files out to the pool.
+            return CORD19ParallelCorpusView(self, block_reader_name, paths, workers, lengths=lengths)
+
+        # Check if documents are being read ahead, and tell the prefetcher the order they'll be used in.
+        if (self._prefetcher is not None):
+            self._prefetcher.schedule([fileid for (path, encoding, fileid) in paths])
+
+        # Check if the files should be read a section at a time.
+        if (sections and not self._token_cache):
+
+            # Make a view of the sections of each file.
+            views = [
+                CORD19SectionCorpusView(self, path, fileid, block_reader_name == '_read_para_block')
+                for (path, encoding, fileid) in paths
+            ]
+
+        # Check if the block reader reads spans, which are kept as views over the offsets of each file.
+        elif (block_reader_name in self.SPAN_BLOCK_READERS):
+            tokenize_name = self.DOCUMENT_TOKENIZERS[block_reader_name]
+            views = [CORD19SpanCorpusView(self, path, fileid, tokenize_name) for (path, encoding, fileid) in paths]
+
+        # Check if documents are being read ahead, so each file has to be read as a whole from its document.
+        elif (self._prefetcher is not None):
+            tokenize_name = self.DOCUMENT_TOKENIZERS[block_reader_name]
+            views = [CORD19DocumentCorpusView(self, path, fileid, tokenize_name) for (path, encoding, fileid) in paths]
+
+        # Otherwise, read each file as a whole.
+        else:
+            views = [
+                self.CorpusView(path, functools.partial(getattr(self, block_reader_name), fileid=fileid), encoding=encoding)
+                for (path, encoding, fileid) in paths
+            ]
+
+        # Check if there's only one file, which doesn't need concatenating.
+        if (len(views) == 1):
+
+            # Give the view its length, if it's known.
+            if (lengths is not None):
+                views[0]._len = lengths[0]
+
+            return views[0]
+
+        # Return the concatenation of the views.
+        return CORD19ConcatenatedCorpusView(views, lengths)
+
+    def _view_lengths(self, block_reader_name, fileids):
+        """
+        :return: The number of tokens the named block reader reads from each
+            of the files, from the corpus statistics, or None if they haven't
+            been built or don't cover every one of the files.
+        :rtype: list(int)
+        """
+
+        corpus_statistics = self._get_corpus_statistics()
+
+        # Check if the statistics haven't been built.
+        if (corpus_statistics is None):
+            return None
+
+        # The count of what each block reader reads.
+        count = {
+            '_read_word_block': 'words',
+            '_read_sent_block': 'sentences',
+            '_read_para_block': 'paragraphs',
+            '_read_word_span_block': 'tokens',
+            '_read_sent_span_block': 'sentences',
+        }[block_reader_name]
+
+        return corpus_statistics.document_counts(count, fileids)
+
+    def _token_cache_key(self, kind, fileid, digest):
+        """
+        :return: The key for the tokens of a kind ('words' or 'paras') read
+            from a file into the token cache, or None if the token cache is off.
+            The key covers everything the tokens depend on: the fileid, the
+            contents of the file, which sections are included, and the tokenizers.
+        :rtype: str
+        """
+
+        # Check if the token cache is off.
+        if (not self._token_cache):
+            return None
+
+        return self._tokens_key(kind, fileid, digest)
+
+    def _tokens_key(self, kind, fileid, digest):
+        """
+        :return: A key covering everything a kind of tokens read from a file
+            depends on, whether or not the token cache is on.
+        :rtype: str
+        """
+
+        # Hash everything together.
+        key_hash = hashlib.blake2b(digest_size=20)
+        key_hash.update(repr((
+            self.TOKEN_CACHE_VERSION,
+            kind,
+            fileid,
+            self._include_titles,
+            self._include_abstracts,
+            self._include_bodies,
+            self._tokenizer_fingerprints(kind),
+        )).encode('utf8'))
+        key_hash.update(digest)
+
+        return key_hash.hexdigest()
+
+    def _tokenizer_fingerprints(self, kind):
+        """
+        :return: The fingerprints of the tokenizers a kind of token ('words',
+            'counts', 'paras', or 'postings') depends on, worked out the first
+            time they're needed.
+        :rtype: str
+        """
+
+        # Check if the tokenizers this kind of token depends on still need fingerprints.
+        if (kind not in self._token_cache_fingerprints):
+
+            # Words and their counts only depend on the word tokenizer, but paragraphs depend on both.
+            if (kind in ('words', 'counts')):
+                tokenizers = [self._word_tokenizer]
+            else:
+                tokenizers = [self._word_tokenizer, self._sent_tokenizer]
+
+            self._token_cache_fingerprints[kind] = ':'.join(tokenizer_fingerprint(tokenizer) for tokenizer in tokenizers)
+
+        return self._token_cache_fingerprints[kind]
+
+    def _read_token_cache(self, cache_key):
+        """
+        :return: The tokens stored in the token cache under cache_key, or None if there aren't any.
+        :rtype: list
+        """
+
+        # Check if the token cache is off.
+        if (cache_key is None):
+            return None
+
+        # Tokens are spread across subdirectories so no single directory gets too big.
+        return self._read_cache(os.path.join('tokens', cache_key[:2], cache_key + '.pickle'), cache_key)
+
+    def _write_token_cache(self, cache_key, tokens):
+        """
+        Stores tokens in the token cache under cache_key.
+        """
+
+        # Check if the token cache is off.
+        if (cache_key is None):
+            return
+
+        self._write_cache(os.path.join('tokens', cache_key[:2], cache_key + '.pickle'), cache_key, tokens)
+
+    def _metadata_signature(self):
+        """
+        :return: What the metadata index and the indexes of its columns depend
+            on: the layout of the index, the encoding, and the version of
+            metadata.csv, or the archive it's in.
+        :rtype: tuple
+        """
+
+        return (CORD19MetadataIndex.VERSION, self._encoding) + file_signature(self._metadata_file or self._archive)
+
+    def _get_row_fileids(self):
+        """
+        :return: Which of the fileids in this corpus are on each row of
+            metadata.csv, as the position each row's fileids start at, ending
+            with the number of them, and the numbers of the fileids in
+            self._fileids, one row after another.
+        :rtype: tuple(array, array)
+        """
+
+        # Check if the rows have already been matched to the fileids by this reader.
+        if (self._row_fileids is not None):
+            return self._row_fileids
+
+        metadata_index = self._get_metadata_index()
+
+        # Pair each row with the number of each file on it.
+        row_fileids = sorted(
+            (row_number, fileid_number)
+            for (fileid_number, fileid) in enumerate(self._fileids)
+            for row_number in metadata_index.fileid_rows.get(fileid, ())
+        )
+
+        # Count the files on each row, and add up the counts to find where each row's files start.
+        row_counts = [0] * metadata_index.row_count
+        for (row_number, fileid_number) in row_fileids:
+            row_counts[row_number] += 1
+
+        self._row_fileids = (
+            array.array('Q', itertools.accumulate(row_counts, initial=0)),
+            array.array('I', [fileid_number for (row_number, fileid_number) in row_fileids]),
+        )
+
+        return self._row_fileids
+
+    def _get_column_index(self, fieldname):
+        """
+        :return: The index of a column of metadata.csv, loading it from the
+            cache directory or building it the first time it's needed.
+        :rtype: CORD19MetadataColumnIndex
+        """
+
+        # Check if the column's index has already been loaded by this reader.
+        column_index = self._column_indexes.get(fieldname)
+        if (column_index is not None):
+            return column_index
+
+        metadata_index = self._get_metadata_index()
+
+        # Check that the column is in metadata.csv.
+        if (fieldname not in metadata_index.columns):
+            raise ValueError('metadata.csv has no column named %r' % fieldname)
+
+        # Try loading the column's index from the cache, if it was built from this version of metadata.csv.
+        cache_name = os.path.join('metadata_columns', fieldname + '.pickle')
+        column_index = self._read_cache(cache_name, self._metadata_signature())
+
+        # Check if the column's index has to be built.
+        if (column_index is None):
+            column_index = CORD19MetadataColumnIndex(
+                metadata_index.columns[fieldname], fieldname in CORD19MetadataColumnIndex.LIST_COLUMNS
+            )
+
+            # Store the index for next time.
+            self._write_cache(cache_name, self._metadata_signature(), column_index)
+
+        # Hold onto the index for the rest of this reader's life.
+        self._column_indexes[fieldname] = column_index
+
+        return column_index
+
+    def _get_metadata_index(self):
+        """
+        :return: The index of metadata.csv, loading it from the cache directory
+            or building it from metadata.csv if the cached copy is missing or stale.
+        :rtype: CORD19MetadataIndex
+        """
+
+        # Check if the index has already been loaded by this reader.
+        if (self._metadata_index is not None):
+            return self._metadata_index
+
+        # The cached index is only valid for this exact version of metadata.csv, or the archive it's in.
+        signature = self._metadata_signature()
+
+        # Try loading the index from the cache.
+        metadata_index = self._read_cache('metadata_index.pickle', signature)
+
+        # Check if the index has to be built.
+        if (metadata_index is None):
+
+            # Check if parsing is being profiled.
+            if (self._profile is not None):
+                start_time = time.perf_counter()
+
+            # Check if metadata.csv is inside an archive, and parse it straight out of the archive.
+            if (self._metadata_file is None):
+                with io.TextIOWrapper(self._pack.stream('metadata.csv'), encoding=self._encoding, newline='') as csv_file:
+                    metadata_index = CORD19MetadataIndex.from_csv_file(csv_file)
+
+            # Otherwise, parse metadata.csv once to build the index.
+            else:
+                metadata_index = CORD19MetadataIndex.from_csv(self._metadata_file, self._encoding)
+
+            if (self._profile is not None):
+                # The size of metadata.csv isn't known without reading it when it's in an archive.
+                byte_count = os.path.getsize(self._metadata_file) if (self._metadata_file is not None) else 0
+                self._profile.add('csv', time.perf_counter() - start_time, byte_count)
+
+            # Store the index for next time.
+            self._write_cache('metadata_index.pickle', signature, metadata_index)
+
+        # Hold onto the index for the rest of this reader's life.
+        self._metadata_index = metadata_index
+
+        return metadata_index
+
+    def _read_cache(self, name, signature):
+        """
+        :return: The object stored in the cache directory under name, or None
+            if there isn't one or it was stored with a different signature.
+        :rtype: object
+        """
+
+        # Get the location of the cached file.
+        cache_path = os.path.join(self._cache_dir, name)
+
+        try:
+            # Load the signature and the cached object.
+            with open(cache_path, 'rb') as cache_file:
+                (cached_signature, cached_object) = pickle.load(cache_file)
+
+        # A missing or unreadable cache file just means it has to be rebuilt.
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return None
+
+        # Check whether the cached object is stale.
+        if (cached_signature != signature):
+            return None
+
+        return cached_object
+
+    def _write_cache(self, name, signature, cached_object):
+        """
+        Stores an object in the cache directory under name. The corpus might
+        live on a read-only file system, so failing to write is not an error.
+        """
+
+        # Get the location of the cached file.
+        cache_path = os.path.join(self._cache_dir, name)
+
+        try:
+            # Make sure the directory exists.
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+            # Write to a temporary file first, so readers never see a partial file.
+            (file_descriptor, temporary_path) = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+            with os.fdopen(file_descriptor, 'wb') as cache_file:
+                pickle.dump((signature, cached_object), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # Move the finished file into place.
+            os.replace(temporary_path, cache_path)
+
+        except OSError:
+            pass
+
     # This function is used by words() in conjunction with the StreamBackedCorpusView class.
     # Basically, it defines how to read a chunk of words from the corpus.
     # Currently, it's implemented to read the entire contents of a paper at a time.
-    def _read_word_block(self, stream):
+    @profiled('blocks')
+    def _read_word_block(self, stream, fileid=None):
 
-        # Make an empty list to hold the words.
-        word_list = []
+        # Read the whole file as words.
+        return self._tokenize_words(self._stream_document(stream, fileid))
 
-        # Grab the contents of the file.
-        file_text = stream.read()
+    def _tokenize_words(self, document):
+        """
+        :return: List of words in a document.
+        :rtype: list(str)
+        """
 
-        # Make a JSON object from the text.
-        json_object = json.loads(file_text)
+        # Check if the words for this file are already in the token cache.
+        cache_key = self._token_cache_key('words', document.fileid, document.digest)
+        word_list = self._read_token_cache(cache_key)
+        if (word_list is not None):
+            return word_list
 
-        # TODO: Decide what parts to include in the text.
-        # TODO: Include title? Abstract? Bibliography?
-        # TODO: Maybe have options to specify what to include?
+        # Make an empty list to hold the words.
+        word_list = []
 
         # Set the paper as en empty string.
         paper = ""
@@ -715,164 +5920,257 @@ class CORD19CorpusReader(CorpusReader):
         # Check whether to include titles or not.
         if (self._include_titles):
             # Concatenate the title.
-            paper += json_object['metadata']['title'] + '\n'
-
-            # print("TITLE: " + json_object['metadata']['title'])
+            paper += document.title + '\n'
 
         # Check whether to include abstracts or not.
         if (self._include_abstracts):
 
-            # Make sure there is an entry for the abstract.
-            if ('abstract' in json_object):
-
-                # Go through each section of the abstract.
-                for section in json_object['abstract']:
-                    # Concatenate the section.
-                    paper += section['text'] + '\n'
+            # Go through each section of the abstract.
+            for section in document.abstract:
+                # Concatenate the section.
+                paper += section['text'] + '\n'
 
         # Check whether to include body_text or not.
         if (self._include_bodies):
 
             # Go through each section of the paper.
-            for section in json_object['body_text']:
+            for section in document.body_text:
                 # TODO: Should newlines be being added to the end?
                 # Concatenate the section.
                 paper += section['text']
 
+        # Check if tokenizing is being profiled, and time it.
+        if (self._profile is not None):
+            start_time = time.perf_counter()
+            word_list.extend(self._word_tokenizer.tokenize(paper))
+            self._profile.add('words', time.perf_counter() - start_time, len(paper))
+
         # Tokenize the paper and add the tokens to the list of words.
-        word_list.extend(self._word_tokenizer.tokenize(paper))
+        else:
+            word_list.extend(self._word_tokenizer.tokenize(paper))
+
+        # Save the words in the token cache for next time.
+        self._write_token_cache(cache_key, word_list)
 
         # Return the list of words.
         return word_list
 
-    def _read_sent_block(self, stream):
+    @profiled('blocks')
+    def _read_sent_block(self, stream, fileid=None):
 
-        # Make an empty list to hold the sentences.
-        sentence_list = []
+        # Read the whole file as sentences.
+        return self._tokenize_sentences(self._stream_document(stream, fileid))
 
-        # Grab the contents of the file.
-        file_text = stream.read()
+    def _tokenize_sentences(self, document):
+        """
+        :return: List of sentences in a document, which is each a list of words.
+        :rtype: list(list(str))
+        """
 
-        # Make a JSON object from the text.
-        json_object = json.loads(file_text)
+        # The sentences are the sentences of each paragraph, one after another.
+        return [sentence for paragraph in self._tokenize_paragraphs(document) for sentence in paragraph]
 
-        # TODO: Decide what parts to include in the text.
-        # TODO: Include title? Abstract? Bibliography?
-        # TODO: Maybe have options to specify what to include?
+    @profiled('blocks')
+    def _read_word_span_block(self, stream, fileid=None):
 
-        # Check whether to include titles or not.
-        if (self._include_titles):
-            # Add the list comprehension to the list of sentences.
-            sentence_list.extend(
-                [
-                    # Add the list of words in this sentece.
-                    self._word_tokenizer.tokenize(sentence)
-
-                    # And do that for each sentence in this section of the paper.
-                    for sentence in self._sent_tokenizer.tokenize(json_object['metadata']['title'])
-                ]
-            )
+        # Read the whole file as the spans of its words.
+        return self._tokenize_word_spans(self._stream_document(stream, fileid))
 
-        # Check whether to include abstracts or not.
-        if (self._include_abstracts):
+    @profiled('blocks')
+    def _read_sent_span_block(self, stream, fileid=None):
 
-            # Make sure there is an entry for the abstract.
-            if ('abstract' in json_object):
+        # Read the whole file as the spans of its sentences.
+        return self._tokenize_sent_spans(self._stream_document(stream, fileid))
 
-                # Go through each section of the abstract.
-                for section in json_object['abstract']:
-                    # Add the list comprehension to the list of sentences.
-                    sentence_list.extend(
-                        [
-                            # Add the list of words in this sentence.
-                            self._word_tokenizer.tokenize(sentence)
+    def _tokenize_word_spans(self, document):
+        """
+        :return: The (section, start, end) of each word in a document.
+        :rtype: CORD19SpanView
+        """
 
-                            # And do that for each sentence in this section of the paper.
-                            for sentence in self._sent_tokenizer.tokenize(section['text'])
-                        ]
+        return self._document_token_spans(document).word_spans()
 
-                    )
+    def _tokenize_sent_spans(self, document):
+        """
+        :return: The (section, start, end) of each sentence in a document.
+        :rtype: CORD19SpanView
+        """
 
-        # Check whether to include body_text or not.
-        if (self._include_bodies):
+        return self._document_token_spans(document).sentence_spans()
+
+    def _document_token_spans(self, document):
+        """
+        :return: The offsets of the sentences and words of a document.
+        :rtype: CORD19TokenSpans
+        """
 
-            # Go through all the sections in the paper.
-            for section in json_object['body_text']:
-                # Add the list comprehension to the list of sentences.
-                sentence_list.extend(
-                    [
-                        # Add the list of words in this sentence.
-                        self._word_tokenizer.tokenize(sentence)
+        sections = self._document_sections(document)
 
-                        # And do that for each sentence in this section of the paper.
-                        for sentence in self._sent_tokenizer.tokenize(section['text'])
-                    ]
+        # Check if the whole document can be tokenized in one pass.
+        span_tokenizer = self._get_span_tokenizer()
+        if (span_tokenizer):
+            return span_tokenizer.tokenize(sections, offsets=True, profile=self._profile)
 
-                )
+        # Otherwise, tokenize each sentence of each section.
+        return CORD19TokenSpans.from_tokenizers(sections, self._word_tokenizer, self._sent_tokenizer)
+
+    def _read_precomputed_block(self, stream):
+
+        # Read the records on the next 20 lines.
+        records = []
+        for i in range(20):
+            line = stream.readline()
+
+            # Check if the end of the file was reached.
+            if (not line):
+                break
+
+            records.append(json_loads(line))
+
+        return records
 
-        # Return the list of sentences.
-        return sentence_list
+    def _read_precomputed_word_block(self, stream):
 
-    def _read_para_block(self, stream):
+        # The words are stored as lists of words, so put the lists together.
+        return [word for words in self._read_precomputed_block(stream) for word in words]
 
-        # Make an empty list to hold the paragraphs.
-        paragraph_list = []
+    @profiled('blocks')
+    def _read_para_block(self, stream, fileid=None):
 
-        # Grab the contents of the file.
-        file_text = stream.read()
+        # Read the whole file as paragraphs.
+        return self._tokenize_paragraphs(self._stream_document(stream, fileid))
+
+    def _tokenize_paragraphs(self, document):
+        """
+        :return: List of paragraphs in a document, which is each a list of sentences, which is each a list of words.
+        :rtype: list(list(list(str)))
+        """
+
+        # Check if the paragraphs for this document are already in the token cache.
+        # Both sents() and paras() are made from them, so they share the cache entry.
+        cache_key = self._token_cache_key('paras', document.fileid, document.digest)
+        paragraph_list = self._read_token_cache(cache_key)
+        if (paragraph_list is not None):
+            return paragraph_list
+
+        # Each section of the paper is a paragraph.
+        sections = self._document_sections(document)
+
+        # Check if the whole document can be tokenized in one pass.
+        span_tokenizer = self._get_span_tokenizer()
+        if (span_tokenizer):
+            paragraph_list = span_tokenizer.tokenize(sections, profile=self._profile).paragraphs()
+
+        # Otherwise, tokenize each sentence of each section.
+        else:
+            paragraph_list = [self._tokenize_section(section) for section in sections]
+
+        # Save the paragraphs in the token cache for next time.
+        self._write_token_cache(cache_key, paragraph_list)
+
+        # Return the list of paragraphs.
+        return paragraph_list
+
+    def _document_sections(self, document):
+        """
+        :return: List of the text of each section of a document that's
+            included, in order: the title, the sections of the abstract, and
+            the sections of the body.
+        :rtype: list(str)
+        """
 
-        # Make a JSON object from the text.
-        json_object = json.loads(file_text)
+        # Make an empty list to hold the sections.
+        sections = []
 
         # Check whether to include titles or not.
         if (self._include_titles):
-            # Add the list comprehension to the list of sentences.
-            paragraph_list.append(
-                [
-                    # Add the list of words in this sentece.
-                    self._word_tokenizer.tokenize(sentence)
-
-                    # And do that for each sentence in this section of the paper.
-                    for sentence in self._sent_tokenizer.tokenize(json_object['metadata']['title'])
-                ]
-            )
+            sections.append(document.title)
 
         # Check whether to include abstracts or not.
         if (self._include_abstracts):
 
-            # Make sure there is an entry for the abstract.
-            if ('abstract' in json_object):
+            # Add the text of each section of the abstract.
+            sections.extend(section['text'] for section in document.abstract)
 
-                # Go through each section of the abstract.
-                for section in json_object['abstract']:
-                    # Add the list comprehension to the list of sentences.
-                    paragraph_list.append(
-                        [
-                            # Add the list of words in this sentence.
-                            self._word_tokenizer.tokenize(sentence)
+        # Check whether to include body_text or not.
+        if (self._include_bodies):
 
-                            # And do that for each sentence in this section of the paper.
-                            for sentence in self._sent_tokenizer.tokenize(section['text'])
-                        ]
+            # Add the text of all the sections in the paper.
+            sections.extend(section['text'] for section in document.body_text)
 
-                    )
+        return sections
 
-        # Check whether to include body_text or not.
-        if (self._include_bodies):
+    def _tokenize_section(self, section):
+        """
+        :return: List of sentences in the text of a section, which is each a list of words.
+        :rtype: list(list(str))
+        """
 
-            # Go through all the sections in the paper.
-            for section in json_object['body_text']:
-                # Add the list comprehension to the list of paragraphs.
-                paragraph_list.append(
-                    [
-                        # Add the list of words in this sentence.
-                        self._word_tokenizer.tokenize(sentence)
+        # Check if the section can be tokenized in one pass. Section views read one section per block, so each
+        # section is tokenized on its own rather than with the rest of its document.
+        span_tokenizer = self._get_span_tokenizer()
+        if (span_tokenizer):
+            return span_tokenizer.tokenize([section], profile=self._profile).sentences()
 
-                        # And do that for each sentence in this section of the paper.
-                        for sentence in self._sent_tokenizer.tokenize(section['text'])
-                    ]
+        # Check if tokenizing is being profiled, and time splitting sentences and words separately.
+        if (self._profile is not None):
+            start_time = time.perf_counter()
+            sentences = self._sent_tokenizer.tokenize(section)
+            self._profile.add('sentences', time.perf_counter() - start_time, len(section))
 
-                )
+            start_time = time.perf_counter()
+            sentence_list = [self._word_tokenizer.tokenize(sentence) for sentence in sentences]
+            self._profile.add('words', time.perf_counter() - start_time, len(section))
 
-        # Return the list of paragraphs.
-        return paragraph_list
+            return sentence_list
+
+        return [
+            # Add the list of words in this sentence.
+            self._word_tokenizer.tokenize(sentence)
+
+            # And do that for each sentence in this section of the paper.
+            for sentence in self._sent_tokenizer.tokenize(section)
+        ]
+
+    def _get_span_tokenizer(self):
+        """
+        :return: A CORD19SpanTokenizer that tokenizes the way the reader's
+            word and sentence tokenizers do, or False if they can't be replaced.
+        :rtype: CORD19SpanTokenizer
+        """
+
+        # Check if the tokenizers still need to be checked.
+        if (self._span_tokenizer is None):
+            if (CORD19SpanTokenizer.supports(self._word_tokenizer, self._sent_tokenizer)):
+                self._span_tokenizer = CORD19SpanTokenizer(self._word_tokenizer, self._sent_tokenizer)
+            else:
+                self._span_tokenizer = False
+
+        return self._span_tokenizer
+
+    def _read_section_offsets(self, document):
+        """
+        :return: The number of sentences in each section of a document, stored
+            in the cache directory by the contents of the file, or None if
+            they haven't been stored yet.
+        :rtype: list(int)
+        """
+
+        cache_key = self._tokens_key('sections', document.fileid, document.digest)
+        return self._read_cache(os.path.join('sections', cache_key[:2], cache_key + '.pickle'), cache_key)
+
+    def _write_section_offsets(self, document, sentence_counts):
+        """
+        Stores the number of sentences in each section of a document in the cache directory.
+        """
+
+        # Check if the document isn't a file in the corpus.
+        if (document.fileid is None):
+            return
+
+        cache_key = self._tokens_key('sections', document.fileid, document.digest)
+        cache_name = os.path.join('sections', cache_key[:2], cache_key + '.pickle')
+
+        # Check if they're already stored, so they aren't written again every time.
+        if (not os.path.exists(os.path.join(self._cache_dir, cache_name))):
+            self._write_cache(cache_name, cache_key, sentence_counts)
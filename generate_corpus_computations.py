@@ -15,24 +15,49 @@
 ################################################################################
 
 '''
-The purpose of this script is to precompute the tokenized sentences from the
-CORD-19 corpus. Basically, the script goes through each document parse file and
-creates a corresponding file containing only the tokenized sentences from the
-file. Tokenized sentences are stored as the text of a list of lists in the file:
-
-file.write(str(sentences))
-
-So, it should work to read the sentences back from the file with:
-
-sentences = eval(file.read())
+The purpose of this script is to precompute data from the CORD-19 corpus.
+Basically, the script goes through each document parse file and creates
+corresponding files containing the sentences, words, citations, and metadata
+for the file. Each file holds JSON, one record on each line (a sentence, a list
+of words, ...), so it can be read a line at a time without evaluating anything.
+Pass --compress to gzip the files.
+
+The files are read back lazily by a corpus reader setup with the same
+precomputed_dir:
+
+reader = CORD19CorpusReader(root, '.*\.json', precomputed_dir=precomputed_data)
+sentences = reader.precomputed_sents(fileid)
+citations = reader.precomputed_citations(fileid)[fileid]
+
+The script records which files it has finished in a manifest, along with a
+digest of each source file's contents. Running it again skips the files whose
+outputs are up to date, so it can be rerun after the corpus changes, or after
+being interrupted, without starting over. The manifest is saved every
+checkpoint_interval files while running.
+
+The work is done in a pipeline: a thread reads the files and checks them
+against the manifest, a pool of worker processes parses and tokenizes them and
+works out the outputs, and another thread writes the outputs. The stages are
+connected by bounded queues, so no stage gets too far ahead of the others.
+Set the number of worker processes with --workers (the default is one per
+core), and pass --lemmae to write Porter stemmed sentences too. The pipeline
+can also be run from Python with precompute(), given where the corpus, the
+outputs, and the manifest are.
 
 '''
 
+import argparse
 import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 import nltk
 
-from cord19 import CORD19CorpusReader
+from cord19 import CORD19CorpusReader, CORD19Document, PRECOMPUTED_KINDS, encode_precomputed, precomputed_location
 
 '''
 Directory Hierarchy Diagram
@@ -45,180 +70,464 @@ munlp_f17/
 
 data/
     |-> archive/
+        |-> .cord19_cache/
         |-> document_parses/
             |-> pdf_json/
             |-> pmc_json/
-    |-> tokenized_sentences
-        |-> document_parses/
-            |-> pdf_json/
-            |-> pmc_json/
+    |-> precomputed/
+        |-> citations/
+            |-> document_parses/
+                |-> pdf_json/
+                |-> pmc_json/
+        |-> lemmae/
+        |-> metadata/
+        |-> sents/
+        |-> words/
 
 
 '''
 
+# Increment this when what's written to the output files changes, so all of them are written again.
+OUTPUT_VERSION = 2
+
+
+def load_manifest(path):
+    '''
+    :return: The manifest of finished files, a dictionary of fileid to the
+        digest of the source file its outputs were computed from. It's empty
+        if there's no manifest yet, or it's for a different OUTPUT_VERSION.
+    :rtype: dict
+    '''
+
+    try:
+        # Load the version and the manifest.
+        with open(path, 'rb') as manifest_file:
+            (version, manifest) = pickle.load(manifest_file)
+
+    # A missing or unreadable manifest just means every file has to be done.
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return {}
+
+    # Check if the outputs were written by a different version of this script.
+    if (version != OUTPUT_VERSION):
+        return {}
+
+    return manifest
+
+
+def save_manifest(path, manifest):
+    '''
+    Saves the manifest of finished files. It's written to a temporary file
+    first, so an interruption never leaves a partial manifest behind.
+    '''
+
+    (file_descriptor, temporary_path) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(file_descriptor, 'wb') as manifest_file:
+        pickle.dump((OUTPUT_VERSION, manifest), manifest_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Move the finished file into place.
+    os.replace(temporary_path, path)
+
+
 # Specify where the corpus is actually stored at.
 root = '../../../../data/archive/'
 
 # Specify location to store computed data.
-sentence_data = '../../../../data/tokenized_sentences/'
-word_data = '../../../../data/tokenized_words/'
-lemma_data = '../../../../data/lemmae/'
-citation_data = '../../../../data/citations/'
-metadata_data = '../../../../data/metadata/'
-
-# Setup a corpus reader.
-# include_titles = False and include_abstracts = False should omit titles and abstracts.
-# prefer_pdf_parses = True and prefer_pmc_parses = True should grab all the JSON files.
-reader = CORD19CorpusReader(root, '.*\.json', include_titles=False,
-                            include_abstracts=False,
-                            include_bodies=True,
-                            prefer_pdf_parses=True,
-                            prefer_pmc_parses=True)
-
-# Print the number of files.
-# Should be 123105 + 89432 = 212537.
-# print(reader.fileids())
-# print('len(reader.fileids():', len(reader.fileids()))
-
-# Check if the directory for the tokenized sentences exists.
-if (not os.path.exists(sentence_data)):
-    # Create the directory.
-    os.mkdir(sentence_data)
-
-    # Create the subdirectories.
-    os.mkdir(sentence_data + 'document_parses')
-    os.mkdir(sentence_data + 'document_parses/pdf_json')
-    os.mkdir(sentence_data + 'document_parses/pmc_json')
-
-# Check if the directory for the tokenized words exists.
-if (not os.path.exists(word_data)):
-    # Create the directory.
-    os.mkdir(word_data)
-
-    # Create the subdirectories.
-    os.mkdir(word_data + 'document_parses')
-    os.mkdir(word_data + 'document_parses/pdf_json')
-    os.mkdir(word_data + 'document_parses/pmc_json')
-
-# Check if the directory for the lemmae exists.
-if (not os.path.exists(lemma_data)):
-    # Create the directory.
-    os.mkdir(lemma_data)
-
-    # Create the subdirectories.
-    os.mkdir(lemma_data + 'document_parses')
-    os.mkdir(lemma_data + 'document_parses/pdf_json')
-    os.mkdir(lemma_data + 'document_parses/pmc_json')
-
-# Check if the directory for the citations exists.
-if (not os.path.exists(citation_data)):
-    # Create the directory.
-    os.mkdir(citation_data)
-
-    # Create the subdirectories.
-    os.mkdir(citation_data + 'document_parses')
-    os.mkdir(citation_data + 'document_parses/pdf_json')
-    os.mkdir(citation_data + 'document_parses/pmc_json')
-
-# Check if the directory for the metadata exists.
-if (not os.path.exists(metadata_data)):
-    # Create the directory.
-    os.mkdir(metadata_data)
-
-    # Create the subdirectories.
-    os.mkdir(metadata_data + 'document_parses')
-    os.mkdir(metadata_data + 'document_parses/pdf_json')
-    os.mkdir(metadata_data + 'document_parses/pmc_json')
-
-# Grab the file IDs.
-fileids = reader.fileids()
-
-# Grab the nuber of iles.
-file_count = len(fileids)
-
-# Setup a Porter stemmer.
-porter_stemmer = nltk.PorterStemmer()
-
-# Grab the metadata for all the fileids.
-metadata_dictionary = reader.metadata(fileids)
-
-# Keep track of which file we're currently on.
-current_file = 0
-
-# Go through each file.
-# for fileid in fileids[0:2]:
-for fileid in fileids:
-
-    # print('File ID:', fileid)
-
-    # Display the current progress.
-    if (current_file % 1000 == 0):
-        print('File %d / %d' % (current_file, file_count))
-
-    # Get the path for the file.
-    (file_path, file_name) = os.path.split(fileid)
-    # print('file_path', file_path)
-    # print('file_name', file_name)
-
-    # Get the file name without the file extension.
-    file_name = os.path.splitext(os.path.basename(file_name))[0]
-    # print('file_name', file_name)
-
-    # Make a location for the new file.
-    # sentence_file_location = sentence_data + file_path + '/' + file_name + '.txt'
-    # word_file_location = word_data + file_path + '/' + file_name + '.txt'
-    # lemma_file_location = lemma_data + file_path + '/' + file_name + '.txt'
-    citation_file_location = citation_data + file_path + '/' + file_name + '.txt'
-    metadata_file_location = metadata_data + file_path + '/' + file_name + '.txt'
-    # print('word_file_location', word_file_location)
-
-    # Grab the sentences for this document as a list.
-    # sentences = list(reader.sents(fileid))
-    # words = list(reader.words(fileid))
-    # lemmae = list(sentences)
+precomputed_data = '../../../../data/precomputed/'
+
+# Specify where to record which files are finished.
+manifest_location = '../../../../data/manifest.pickle'
+
+# Save the manifest every this many files, so an interrupted run picks back up from there.
+checkpoint_interval = 1000
+
+# Display the progress every this many seconds.
+progress_interval = 10
+
+# Store the words of a document this many to a line.
+words_per_line = 1000
+
+# Wait on a queue between stages this many seconds at a time, before checking the stage on the other end is still going.
+queue_timeout = 1
+
+# The corpus reader and stemmer used by a worker process, set up by initialize_worker().
+reader = None
+porter_stemmer = None
+
+
+def output_locations(output_directory, fileid, lemmae, compressed):
+    '''
+    :return: Dictionary of the kind of output ('sents', 'words', 'lemmae',
+        'citations', or 'metadata') to the location of the file for it under
+        output_directory.
+    :rtype: dict(str)
+    '''
+
+    return {
+        kind: precomputed_location(output_directory, kind, fileid, compressed)
+        for kind in PRECOMPUTED_KINDS
+        if (lemmae or kind != 'lemmae')
+    }
+
+
+def initialize_worker(corpus_reader):
+    '''
+    Sets up a worker process to compute outputs with corpus_reader.
+    '''
+
+    global reader
+    global porter_stemmer
+
+    reader = corpus_reader
+
+    # Setup a Porter stemmer.
+    porter_stemmer = nltk.PorterStemmer()
+
+
+def compute_outputs(fileid, file_text, metadatas, lemmae, compressed):
+    '''
+    Runs in a worker process.
+
+    :return: Dictionary of the kind of output to the contents of the file for it.
+    :rtype: dict(bytes)
+    '''
+
+    # Parse the document, and hand it to the reader so it isn't read from the file again.
+    document = CORD19Document(fileid, file_text)
+    reader._cache_document(document)
+
+    # Grab the sentences, words, and citations for this document.
+    sentences = list(reader.sents(fileid))
+    words = list(reader.words(fileid))
     citations = reader.citations(fileid)
-    metadatas = metadata_dictionary[fileid]
-
-    # # Go through all the sentences.
-    # for i in range(0, len(sentences)):
-
-    #     # Grab the sentence.
-    #     sentence = sentences[i]
-
-    #     # Stem the words in the sentence to get the lemmae.
-    #     lemmae[i] = [porter_stemmer.stem(word) for word in sentence]
-
-    # Open the file for these sentences.
-    # sentence_file = open(sentence_file_location, 'w')
-    # word_file = open(word_file_location, 'w')
-    # lemma_file = open(lemma_file_location, 'w')
-    citation_file = open(citation_file_location, 'w')
-    metadata_file = open(metadata_file_location, 'w')
-
-    # Write the list of sentences to the file.
-    # sentence_file.write(str(sentences))
-    # word_file.write(str(words))
-    # lemma_file.write(str(lemmae))
-    citation_file.write(str(citations))
-    metadata_file.write(str(metadatas))
-
-    # Close the file.
-    # sentence_file.close()
-    # word_file.close()
-    # lemma_file.close()
-    citation_file.close()
-    metadata_file.close()
-
-    # print(str(words))
-    # print(str(lemmae))
-
-    # print(str(sentences))
-    # sentence_file = open(file_location, 'r')
-    # sentences = sentence_file.read()
-    # sentence_file.close()
-    # print()
-    # print()
-    # print(str(sentences))
-
-    # Update which file count we're on.
-    current_file += 1
+
+    # Each sentence goes on a line, the words go a bunch to a line, and the citations and metadata go on one line.
+    outputs = {
+        'sents': encode_precomputed(sentences, compressed),
+        'words': encode_precomputed([words[i:i + words_per_line] for i in range(0, len(words), words_per_line)],
+                                    compressed),
+        'citations': encode_precomputed([citations[fileid]], compressed),
+        'metadata': encode_precomputed([metadatas], compressed),
+    }
+
+    # Check if the lemmae should be computed.
+    if (lemmae):
+
+        # Stem the words in each sentence to get the lemmae.
+        outputs['lemmae'] = encode_precomputed(
+            [[porter_stemmer.stem(word) for word in sentence] for sentence in sentences], compressed)
+
+    return outputs
+
+
+def put_while(stage_queue, item, is_running):
+    '''
+    Puts an item on a queue between stages, waiting for room as long as
+    is_running() says the stage taking from the queue is still going.
+
+    :return: Whether the item was put on the queue.
+    :rtype: bool
+    '''
+
+    while (is_running()):
+        try:
+            stage_queue.put(item, timeout=queue_timeout)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def get_while(stage_queue, is_running):
+    '''
+    :return: The next item on a queue between stages, waiting for one as long
+        as is_running() says the stage putting on the queue is still going,
+        or None if it stopped.
+    :rtype: object
+    '''
+
+    while (True):
+        try:
+            return stage_queue.get(timeout=queue_timeout)
+        except queue.Empty:
+
+            # Check if the stage stopped without anything more coming.
+            if (not is_running() and stage_queue.empty()):
+                return None
+
+
+def raise_stage_error(errors):
+    '''
+    Raises the first error a stage of the pipeline running in a thread ran
+    into, if any, in the main thread.
+    '''
+
+    # Check if a stage ran into an error.
+    if (errors):
+        raise RuntimeError('A stage of the pipeline failed.') from errors[0]
+
+
+def read_documents(reader, fileids, metadata_dictionary, manifest, output_directory, lemmae, compressed, document_queue,
+                   counts, errors, stopping):
+    '''
+    The first stage of the pipeline. Reads each file, and queues it up to be
+    processed unless its outputs are already up to date. Any error is put in
+    errors for the main thread, and the end of the files is always marked,
+    unless stopping is set because the main thread gave up on the files.
+    '''
+
+    def is_running():
+        return not stopping.is_set()
+
+    try:
+        # Go through each file.
+        for fileid in fileids:
+
+            # Read the contents of the file.
+            stream = reader.open(fileid)
+            try:
+                file_text = stream.read()
+            finally:
+                stream.close()
+
+            # Grab the digest of the file's contents, to check whether its outputs are up to date.
+            digest = CORD19Document(fileid, file_text).digest
+
+            # Check if the file was finished by an earlier run, and hasn't changed since.
+            if (manifest.get(fileid) == digest
+                    and all(os.path.exists(location)
+                            for location in output_locations(output_directory, fileid, lemmae, compressed).values())):
+
+                # Skip it.
+                counts['skipped'] += 1
+                continue
+
+            # Queue up the file, waiting if the workers are too far behind, and stop if the main thread gave up.
+            if (not put_while(document_queue, (fileid, digest, file_text, metadata_dictionary[fileid]), is_running)):
+                return
+
+    except BaseException as error:
+        errors.append(error)
+
+    finally:
+        # Mark the end of the files, so the main thread doesn't wait on files that won't come.
+        put_while(document_queue, None, is_running)
+
+
+def write_outputs(result_queue, manifest, manifest_path, output_directory, lemmae, compressed, counts, file_count,
+                  errors):
+    '''
+    The last stage of the pipeline. Writes the outputs of each file under
+    output_directory, records it in the manifest saved at manifest_path, and
+    displays the progress. Any error is put in errors for the main thread.
+    '''
+
+    start_time = time.time()
+    last_progress_time = start_time
+
+    try:
+        while (True):
+
+            # Wait for the next finished file.
+            result = result_queue.get()
+
+            # Check if there's no more files.
+            if (result is None):
+                break
+
+            (fileid, digest, outputs) = result
+
+            # Go through each output file.
+            for (kind, location) in output_locations(output_directory, fileid, lemmae, compressed).items():
+
+                # Write the output to a temporary file first, so an interruption never leaves a partial file behind.
+                (file_descriptor, temporary_path) = tempfile.mkstemp(dir=os.path.dirname(location))
+                with os.fdopen(file_descriptor, 'wb') as output_file:
+                    output_file.write(outputs[kind])
+
+                # Move the finished file into place.
+                os.replace(temporary_path, location)
+
+                # Remove the output in the other format, if an earlier run wrote one, so it isn't read instead.
+                other_location = precomputed_location(output_directory, kind, fileid, not compressed)
+                if (os.path.exists(other_location)):
+                    os.remove(other_location)
+
+            # Record that the file is finished.
+            manifest[fileid] = digest
+            counts['processed'] += 1
+
+            # Check if it's time to save a checkpoint.
+            if (counts['processed'] % checkpoint_interval == 0):
+                save_manifest(manifest_path, manifest)
+
+            # Check if it's time to display the progress.
+            current_time = time.time()
+            if (current_time - last_progress_time >= progress_interval):
+                last_progress_time = current_time
+
+                # Work out the throughput so far, and how long the files that are left should take at that rate.
+                done_count = counts['processed'] + counts['skipped']
+                files_per_second = counts['processed'] / (current_time - start_time)
+                remaining_seconds = (file_count - done_count) / files_per_second
+
+                print('File %d / %d (%d processed, %d skipped), %.1f files/s, ETA %d:%02d:%02d' % (
+                    done_count, file_count, counts['processed'], counts['skipped'], files_per_second,
+                    remaining_seconds // 3600, remaining_seconds % 3600 // 60, remaining_seconds % 60))
+
+    except BaseException as error:
+        errors.append(error)
+
+    finally:
+        # Save the manifest, even if the run was interrupted, so the next run picks up from here.
+        save_manifest(manifest_path, manifest)
+
+
+def precompute(corpus_root, output_directory, manifest_path, workers=None, queue_size=None, lemmae=False,
+               compressed=False, **reader_arguments):
+    '''
+    Runs the pipeline over the corpus at corpus_root, writing the outputs
+    under output_directory and recording the finished files in the manifest
+    at manifest_path. Any other arguments go to the corpus reader. An error in
+    any stage is raised here once the pipeline has stopped, and the manifest
+    is saved either way.
+
+    :param workers: The number of worker processes (default: one per core).
+    :param queue_size: The files each queue between stages holds (default: 4 per worker).
+    :return: Dictionary of how many files were 'processed' and how many were 'skipped' as up to date.
+    :rtype: dict(int)
+    '''
+
+    # Check if the number of workers or the queue size weren't given.
+    workers = workers or os.cpu_count()
+    queue_size = queue_size or 4 * workers
+
+    # Setup a corpus reader.
+    # include_titles = False and include_abstracts = False should omit titles and abstracts.
+    # prefer_pdf_parses = True and prefer_pmc_parses = True should grab all the JSON files.
+    corpus_reader = CORD19CorpusReader(corpus_root, r'.*\.json', include_titles=False,
+                                       include_abstracts=False,
+                                       include_bodies=True,
+                                       prefer_pdf_parses=True,
+                                       prefer_pmc_parses=True,
+                                       **reader_arguments)
+
+    # Print the number of files.
+    # Should be 123105 + 89432 = 212537.
+    # print(corpus_reader.fileids())
+    # print('len(corpus_reader.fileids():', len(corpus_reader.fileids()))
+
+    # Go through the directories for each kind of output.
+    for kind in PRECOMPUTED_KINDS:
+
+        # Create the directory and its subdirectories, if they don't exist.
+        os.makedirs(os.path.join(output_directory, kind, 'document_parses/pdf_json'), exist_ok=True)
+        os.makedirs(os.path.join(output_directory, kind, 'document_parses/pmc_json'), exist_ok=True)
+
+    # Grab the file IDs.
+    fileids = corpus_reader.fileids()
+
+    # Grab the number of files.
+    file_count = len(fileids)
+
+    # Grab the metadata for all the fileids.
+    metadata_dictionary = corpus_reader.metadata(fileids)
+
+    # Load the manifest of files finished by earlier runs.
+    manifest = load_manifest(manifest_path)
+
+    # Keep track of how many files were processed and how many were already up to date.
+    counts = {'processed': 0, 'skipped': 0}
+
+    # Setup the queues between the stages.
+    document_queue = queue.Queue(queue_size)
+    result_queue = queue.Queue(queue_size)
+
+    # The errors the reading and writing stages run into, raised in the main thread.
+    errors = []
+
+    # Set when the main thread gives up on the files, so the reading stage stops.
+    stopping = threading.Event()
+
+    # Start the reading and writing stages.
+    read_thread = threading.Thread(target=read_documents, daemon=True, args=(
+        corpus_reader, fileids, metadata_dictionary, manifest, output_directory, lemmae, compressed, document_queue,
+        counts, errors, stopping))
+    write_thread = threading.Thread(target=write_outputs, args=(
+        result_queue, manifest, manifest_path, output_directory, lemmae, compressed, counts, file_count, errors))
+    read_thread.start()
+    write_thread.start()
+
+    # Start the workers.
+    executor = ProcessPoolExecutor(workers, initializer=initialize_worker, initargs=(corpus_reader,))
+
+    try:
+        # Dictionary of the files being worked on to their fileids and digests.
+        futures = {}
+        reading = True
+
+        while (reading or futures):
+
+            # Hand files to the workers until enough are in progress, or the files run out.
+            while (reading and len(futures) < queue_size):
+                item = get_while(document_queue, read_thread.is_alive)
+
+                # Check if there's no more files, and whether that's because the reading stage failed.
+                if (item is None):
+                    reading = False
+                    raise_stage_error(errors)
+                    break
+
+                (fileid, digest, file_text, metadatas) = item
+                future = executor.submit(compute_outputs, fileid, file_text, metadatas, lemmae, compressed)
+                futures[future] = (fileid, digest)
+
+            # Check if everything's finished.
+            if (not futures):
+                break
+
+            # Wait for some of the files to be finished.
+            (done, not_done) = wait(futures, return_when=FIRST_COMPLETED)
+
+            # Pass the finished files on to be written, waiting if the writing is too far behind.
+            for future in done:
+                (fileid, digest) = futures.pop(future)
+
+                # Check if the writing stage stopped, so the file can't be written.
+                if (not put_while(result_queue, (fileid, digest, future.result()), write_thread.is_alive)):
+                    raise_stage_error(errors)
+                    raise RuntimeError('The writing stage of the pipeline stopped.')
+
+    finally:
+        # Stop the reading stage, if it's still going.
+        stopping.set()
+
+        # Don't wait on files that won't be written if something went wrong.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        # Let the writing stage finish up the files it has, and save the manifest.
+        put_while(result_queue, None, write_thread.is_alive)
+        write_thread.join()
+
+    # Check if the writing stage failed on the last files.
+    raise_stage_error(errors)
+
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute data from the CORD-19 corpus.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes to parse and tokenize with (default: one per core).')
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Files each queue between stages holds (default: 4 per worker).')
+    parser.add_argument('--lemmae', action='store_true', help='Also write the Porter stemmed sentences.')
+    parser.add_argument('--compress', action='store_true', help='Compress the output files with gzip.')
+    arguments = parser.parse_args()
+
+    counts = precompute(root, precomputed_data, manifest_location, arguments.workers, arguments.queue_size,
+                        arguments.lemmae, arguments.compress)
+
+    # Display how much work was done.
+    print('Processed %d files, skipped %d up to date files.' % (counts['processed'], counts['skipped']))
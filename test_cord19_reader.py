@@ -0,0 +1,1115 @@
+################################################################################
+#                                                                              #
+#    CS 7740/8740                                                              #
+#    Fall 2020 - Spring 2021                                                   #
+#                                                                              #
+#    Class Project - Tests for the CORD-19 Corpus Reader                       #
+#    test_cord19_reader.py                                                     #
+#                                                                              #
+#    Started: Alex Morehead                                                    #
+#    2021-4-25                                                                 #
+#                                                                              #
+################################################################################
+
+'''
+Tests for the CORD-19 corpus reader. Unlike test_cord19.py, these don't need
+the real dataset: they run on a tiny corpus written to a temporary directory,
+and check that each of the faster ways of reading the corpus gives the same
+results as the plain one.
+
+Run them with:
+
+python -m pytest test_cord19_reader.py
+'''
+
+import collections
+import csv
+import json
+import os
+import queue
+import random
+import shutil
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from nltk.probability import FreqDist
+from nltk.tokenize import TreebankWordTokenizer, WordPunctTokenizer
+from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+import generate_corpus_computations
+from cord19 import CORD19CorpusReader, CORD19Document, CORD19MetadataIndex, CORD19SpanTokenizer
+
+# Words the sentences of the fixture corpus are made of.
+WORDS = (
+    'the virus protein ACE2 receptor binds cells in patients with severe disease and shows effects . '
+    'Results were significant ( p < 0.05 ) , e.g. in Dr. Smith\'s lab'
+).split()
+
+# The number of papers in the fixture corpus.
+PAPER_COUNT = 12
+
+
+def fixture_sentence(random_generator):
+    """
+    :return: A made up sentence of the fixture corpus.
+    :rtype: str
+    """
+
+    words = [random_generator.choice(WORDS) for i in range(random_generator.randint(4, 12))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def fixture_document(random_generator, paper_id, title, paper_number):
+    """
+    :return: A made up document parse of the fixture corpus, which cites a few
+        of the other papers by DOI.
+    :rtype: dict
+    """
+
+    def section(name):
+        return {
+            'text': ' '.join(fixture_sentence(random_generator) for i in range(random_generator.randint(1, 4))),
+            'cite_spans': [],
+            'ref_spans': [],
+            'section': name,
+        }
+
+    cited_numbers = random_generator.sample([n for n in range(PAPER_COUNT) if n != paper_number], 3)
+
+    return {
+        'paper_id': paper_id,
+        'metadata': {'title': title, 'authors': []},
+        'abstract': [section('Abstract')],
+        'body_text': [section('Section %d' % i) for i in range(random_generator.randint(1, 4))],
+        'bib_entries': {
+            'BIBREF%d' % i: {
+                'ref_id': 'b%d' % i,
+                'title': 'Paper %d' % cited_number,
+                'authors': [],
+                'year': 2020,
+                'venue': '',
+                'other_ids': {'DOI': ['10.1000/paper%d' % cited_number]},
+            }
+            for (i, cited_number) in enumerate(cited_numbers)
+        },
+        'ref_entries': {},
+        'back_matter': [],
+    }
+
+
+def write_fixture_corpus(directory):
+    """
+    Writes the fixture corpus to directory: a metadata.csv, and for each paper
+    a PDF parse, a PMC parse, or both.
+    """
+
+    random_generator = random.Random(0)
+    rows = []
+
+    for paper_number in range(PAPER_COUNT):
+        title = fixture_sentence(random_generator)
+        pdf_json_files = ''
+        pmc_json_files = ''
+
+        # Papers get a PDF parse, a PMC parse, and both in turn.
+        if (paper_number % 3 != 1):
+            sha = '%040x' % random_generator.getrandbits(160)
+            pdf_json_files = 'document_parses/pdf_json/%s.json' % sha
+            document = fixture_document(random_generator, sha, title, paper_number)
+            write_fixture_file(directory, pdf_json_files, document)
+        if (paper_number % 3 != 0):
+            pmcid = 'PMC%d' % (7000000 + paper_number)
+            pmc_json_files = 'document_parses/pmc_json/%s.xml.json' % pmcid
+            document = fixture_document(random_generator, pmcid, title, paper_number)
+            write_fixture_file(directory, pmc_json_files, document)
+
+        rows.append({
+            'cord_uid': 'uid%05d' % paper_number,
+            'sha': '',
+            'source_x': ['PMC', 'Medline', 'WHO'][paper_number % 3],
+            'title': title,
+            'doi': '10.1000/paper%d' % paper_number,
+            'pmcid': 'PMC%d' % (7000000 + paper_number) if pmc_json_files else '',
+            'pubmed_id': str(3000 + paper_number),
+            'license': ['cc-by', 'no-cc'][paper_number % 2],
+            'abstract': '',
+            'publish_time': ['2020', '2020-03-01', '2021-01-02'][paper_number % 3],
+            'authors': 'A; B',
+            'journal': ['Nature', 'Lancet', ''][paper_number % 3],
+            'mag_id': '',
+            'who_covidence_id': '',
+            'arxiv_id': '',
+            'pdf_json_files': pdf_json_files,
+            'pmc_json_files': pmc_json_files,
+            'url': '',
+            's2_id': '',
+        })
+
+    with open(os.path.join(directory, 'metadata.csv'), 'w', newline='', encoding='utf8') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+        csv_writer.writeheader()
+        csv_writer.writerows(rows)
+
+
+def write_fixture_file(directory, path, document):
+    """
+    Writes a document parse of the fixture corpus to its path under directory.
+    """
+
+    path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w', encoding='utf8') as parse_file:
+        json.dump(document, parse_file)
+
+
+class UnusedTokenizer(object):
+    """
+    Stands in for a tokenizer that shouldn't be needed.
+    """
+
+    def tokenize(self, text):
+        raise AssertionError('The text was tokenized again')
+
+
+@pytest.fixture(scope='session')
+def corpus_root(tmp_path_factory):
+    """
+    :return: The directory the fixture corpus is written to, once per session.
+    :rtype: str
+    """
+
+    directory = str(tmp_path_factory.mktemp('corpus'))
+    write_fixture_corpus(directory)
+    return directory
+
+
+@pytest.fixture
+def make_reader(corpus_root, tmp_path):
+    """
+    :return: A function making readers on the fixture corpus. Each test gets
+        its own cache directory, so nothing built by one test leaks into
+        another.
+    :rtype: function
+    """
+
+    def make_reader(root=corpus_root, cache_name='cache', **kwargs):
+        kwargs.setdefault('cache_dir', str(tmp_path / cache_name))
+        return CORD19CorpusReader(root, r'.*\.json', sent_tokenizer=PunktSentenceTokenizer(), **kwargs)
+
+    return make_reader
+
+
+def test_statistics_lengths(make_reader):
+    """
+    Views take their lengths from the corpus statistics when every file is in
+    them, and count the tokens as usual when some aren't.
+    """
+
+    reader = make_reader(prefer_pdf_parses=False, prefer_pmc_parses=True)
+    reader.build_statistics()
+    plain_reader = make_reader(prefer_pdf_parses=False, prefer_pmc_parses=True, cache_name='plain')
+
+    fileids = reader.fileids()
+    assert len(reader.words()) == len(plain_reader.words())
+    assert len(reader.sents(fileids[:3])) == len(plain_reader.sents(fileids[:3]))
+
+    # PDF parses passed over for a PMC parse aren't in the statistics.
+    every_reader = make_reader(prefer_pdf_parses=True, prefer_pmc_parses=True, cache_name='every')
+    passed_over = [fileid for fileid in every_reader.fileids() if fileid not in fileids]
+    assert passed_over
+    assert reader.corpus_statistics().document_counts('words', passed_over[:1]) is None
+
+    for accessor in ('words', 'sents', 'paras', 'word_spans', 'sent_spans'):
+        view = getattr(reader, accessor)([fileids[0], passed_over[0]])
+        plain_view = getattr(plain_reader, accessor)([fileids[0], passed_over[0]])
+        assert len(view) == len(plain_view)
+        assert list(view) == list(plain_view)
+
+
+def test_workers(make_reader):
+    """
+    Reading with a pool of worker processes gives the same tokens, and the
+    pool is kept for later reads until the view is read to the end.
+    """
+
+    reader = make_reader()
+    fileids = reader.fileids()
+
+    assert list(reader.words(workers=2)) == list(reader.words())
+    assert list(reader.sents(fileids[:5], workers=2)) == list(reader.sents(fileids[:5]))
+    assert list(reader.paras(fileids[-1], workers=2)) == list(reader.paras(fileids[-1]))
+
+    words = list(reader.words())
+    view = reader.words(workers=2)
+    assert view[3] == words[3]
+    executor = view._executor
+    assert executor is not None
+    assert view[len(words) // 2] == words[len(words) // 2]
+    assert view._executor is executor
+
+    assert len(view) == len(words)
+    assert view._executor is None
+    view.close()
+
+
+def test_index(make_reader):
+    """
+    search() finds every place a word is, and concordance() gives the same
+    lines from the token IDs as from tokenizing the files again.
+    """
+
+    reader = make_reader()
+    reader.build_index()
+    words = [word for sentence in reader.sents() for word in sentence]
+
+    for word in ('virus', 'ACE2', '(', 'Dr'):
+        assert sum(len(starts) for starts in reader.search(word).values()) == words.count(word)
+
+    # Phrases are found exactly where their words come one after another.
+    file_words = {fileid: [word for sentence in reader.sents(fileid) for word in sentence] for fileid in reader.fileids()}
+    for phrase in ('the virus', "smith ' s", '0 . 05 .', 'g . patients', 'virus virus'):
+        phrase_words = phrase.split()
+        expected_starts = {}
+        for (fileid, words) in file_words.items():
+            starts = [start for start in range(len(words)) if words[start:start + len(phrase_words)] == phrase_words]
+            if (starts):
+                expected_starts[fileid] = starts
+        assert reader.search(phrase) == expected_starts
+
+    tokenized_lines = reader.concordance('virus', lines=100)
+    assert tokenized_lines
+    assert all(line.query == 'virus' for (fileid, line) in tokenized_lines)
+
+    # With the token IDs built, the files shouldn't be tokenized again.
+    reader.build_token_ids()
+    reader._file_paragraphs = None
+    assert reader.concordance('virus', lines=100) == tokenized_lines
+
+
+def test_token_cache(make_reader):
+    """
+    words(), sents(), and paras() give the same tokens with the token cache,
+    and read them back from it without tokenizing.
+    """
+
+    plain_reader = make_reader(cache_name='plain')
+    words = list(plain_reader.words())
+    sents = list(plain_reader.sents())
+    paras = list(plain_reader.paras())
+
+    reader = make_reader(token_cache=True)
+    assert list(reader.words()) == words
+    assert list(reader.sents()) == sents
+    assert list(reader.paras()) == paras
+
+    # Work out the cache keys, and then take away the tokenizers, so everything has to come from the cache.
+    cached_reader = make_reader(token_cache=True)
+    cached_reader._tokenizer_fingerprints('words')
+    cached_reader._tokenizer_fingerprints('paras')
+    cached_reader._word_tokenizer = UnusedTokenizer()
+    cached_reader._sent_tokenizer = UnusedTokenizer()
+    assert list(cached_reader.words()) == words
+    assert list(cached_reader.sents()) == sents
+    assert list(cached_reader.paras()) == paras
+
+
+def test_documents(make_reader):
+    """
+    Each document is read and parsed once, and shared by raw(), citations(),
+    and the token views.
+    """
+
+    reader = make_reader(document_cache_size=4)
+    fileids = reader.fileids()
+
+    # Count how many times each file is read.
+    read_fileids = []
+    read_text = reader._read_text
+
+    def counted_read_text(fileid):
+        read_fileids.append(fileid)
+        return read_text(fileid)
+
+    reader._read_text = counted_read_text
+
+    with open(os.path.join(reader.root, fileids[0]), encoding='utf8') as parse_file:
+        parse = json.load(parse_file)
+
+    document = reader.document(fileids[0])
+    assert reader.document(fileids[0]) is document
+    assert document.title == parse['metadata']['title']
+    assert document.abstract == parse['abstract']
+    assert document.body_text == parse['body_text']
+    assert reader.citations(fileids[0]) == {fileids[0]: parse['bib_entries']}
+    assert reader.raw(fileids[0]).startswith(parse['metadata']['title'] + '\n' + parse['abstract'][0]['text'])
+    list(reader.words(fileids[0]))
+    list(reader.paras(fileids[0]))
+    assert read_fileids == [fileids[0]]
+
+    # Only the most recently used documents are kept.
+    for fileid in fileids[1:6]:
+        reader.document(fileid)
+    assert len(reader._documents) == 4
+    assert reader.document(fileids[0]) is not document
+    assert read_fileids.count(fileids[0]) == 2
+
+
+def test_partial_decoding(make_reader):
+    """
+    Documents decode only the parts that are used, and give the same values
+    as decoding the whole file, whatever the layout of the file.
+    """
+
+    reader = make_reader()
+    fileid = reader.fileids()[0]
+    list(reader.words(fileid))
+    assert 'bib_entries' not in reader.document(fileid)._values
+
+    with open(os.path.join(reader.root, fileid), encoding='utf8') as parse_file:
+        parse = json.load(parse_file)
+
+    # Keys out of order, a nested key with the same name as a top-level one, and spaces after the colons.
+    shuffled_parse = dict(reversed(list(parse.items())))
+    nested_parse = dict(parse, metadata=dict(parse['metadata'], abstract=[{'text': 'nested'}], body_text='nested'))
+
+    layouts = [
+        (json.dumps(parse, separators=(',', ':')), parse),
+        (json.dumps(shuffled_parse, separators=(',', ':')), shuffled_parse),
+        (json.dumps(nested_parse, separators=(',', ':')), nested_parse),
+        (json.dumps(parse, indent=2), parse),
+    ]
+
+    for (file_text, expected_parse) in layouts:
+        document = CORD19Document(fileid, file_text)
+        assert document.bib_entries == expected_parse['bib_entries']
+        assert document.body_text == expected_parse['body_text']
+        assert document.abstract == expected_parse['abstract']
+        assert document.title == expected_parse['metadata']['title']
+        assert document.back_matter == expected_parse['back_matter']
+
+
+def test_packed(make_reader, tmp_path):
+    """
+    A packed copy of the corpus reads the same as the corpus.
+    """
+
+    reader = make_reader()
+    reader.pack(str(tmp_path / 'packed'), shard_size=4096)
+    packed_reader = CORD19CorpusReader.from_packed(str(tmp_path / 'packed'), sent_tokenizer=PunktSentenceTokenizer(),
+                                                   cache_dir=str(tmp_path / 'packed_cache'))
+
+    fileids = reader.fileids()
+    assert packed_reader.fileids() == fileids
+    assert len(os.listdir(str(tmp_path / 'packed'))) > 3
+    assert packed_reader.raw() == reader.raw()
+    assert list(packed_reader.words()) == list(reader.words())
+    assert list(packed_reader.sents()) == list(reader.sents())
+    assert list(packed_reader.paras(fileids[:3])) == list(reader.paras(fileids[:3]))
+    assert list(packed_reader.words(workers=2)) == list(reader.words())
+    assert packed_reader.citations(fileids[:3]) == reader.citations(fileids[:3])
+    assert packed_reader.metadata(fileids) == reader.metadata(fileids)
+
+
+def write_fixture_archive(corpus_root, path):
+    """
+    Writes the fixture corpus into an archive at path, laid out by its name:
+    stored.zip and plain.tar hold the corpus in a directory, deflated.zip at
+    the top, and release.tar.gz like the CORD-19 releases, with the parse
+    files in a nested document_parses.tar.gz.
+    """
+
+    # Find the files of the corpus.
+    names = ['metadata.csv']
+    for (dirname, subdirs, filenames) in os.walk(os.path.join(corpus_root, 'document_parses')):
+        names.extend(os.path.relpath(os.path.join(dirname, filename), corpus_root) for filename in sorted(filenames))
+
+    if (path.endswith('.zip')):
+        (prefix, compression) = ('CORD-19/', zipfile.ZIP_STORED) if 'stored' in path else ('', zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(path, 'w', compression) as zip_file:
+            for name in names:
+                zip_file.write(os.path.join(corpus_root, name), prefix + name)
+
+    elif (path.endswith('plain.tar')):
+        with tarfile.open(path, 'w') as tar_file:
+            for name in names:
+                tar_file.add(os.path.join(corpus_root, name), '2021-05-31/' + name)
+
+    else:
+        parses_path = path + '.parses.tar.gz'
+        with tarfile.open(parses_path, 'w:gz') as tar_file:
+            for name in names[1:]:
+                tar_file.add(os.path.join(corpus_root, name), name)
+        with tarfile.open(path, 'w:gz') as tar_file:
+            tar_file.add(os.path.join(corpus_root, 'metadata.csv'), '2021-05-31/metadata.csv')
+            tar_file.add(parses_path, '2021-05-31/document_parses.tar.gz')
+
+
+@pytest.mark.parametrize('archive_name', ['stored.zip', 'deflated.zip', 'plain.tar', 'release.tar.gz'])
+def test_archive(make_reader, corpus_root, tmp_path, archive_name):
+    """
+    A release archive reads the same as the corpus extracted to a directory.
+    """
+
+    archive_path = str(tmp_path / archive_name)
+    write_fixture_archive(corpus_root, archive_path)
+
+    reader = make_reader()
+    archive_reader = make_reader(root=archive_path, cache_name='archive_cache')
+
+    fileids = reader.fileids()
+    assert archive_reader.fileids() == fileids
+    assert archive_reader.raw() == reader.raw()
+    assert list(archive_reader.words()) == list(reader.words())
+    assert list(archive_reader.sents(fileids[:4])) == list(reader.sents(fileids[:4]))
+    assert archive_reader.citations(fileids[:3]) == reader.citations(fileids[:3])
+    assert archive_reader.metadata(fileids) == reader.metadata(fileids)
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_precomputed(make_reader, tmp_path, compressed):
+    """
+    The outputs of generate_corpus_computations.py read back the same as the
+    reader's own tokens, citations, and metadata.
+    """
+
+    reader = make_reader(precomputed_dir=str(tmp_path / 'precomputed'))
+    fileids = reader.fileids()[:4]
+    metadata_dictionary = reader.metadata(fileids)
+
+    # Work out the outputs like the workers of generate_corpus_computations.py do, and write them where it does.
+    generate_corpus_computations.initialize_worker(make_reader(cache_name='worker'))
+
+    for fileid in fileids:
+        with open(os.path.join(reader.root, fileid), encoding='utf8') as parse_file:
+            outputs = generate_corpus_computations.compute_outputs(
+                fileid, parse_file.read(), metadata_dictionary[fileid], True, compressed)
+
+        output_locations = generate_corpus_computations.output_locations(
+            str(tmp_path / 'precomputed'), fileid, True, compressed)
+        for (kind, location) in output_locations.items():
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            with open(location, 'wb') as output_file:
+                output_file.write(outputs[kind])
+
+    assert list(reader.precomputed_sents(fileids)) == list(reader.sents(fileids))
+    assert list(reader.precomputed_words(fileids)) == list(reader.words(fileids))
+    assert reader.precomputed_citations(fileids) == reader.citations(fileids)
+    assert reader.precomputed_metadata(fileids) == metadata_dictionary
+    assert len(reader.precomputed_lemmae(fileids[0])) == len(reader.sents(fileids[0]))
+
+
+def test_manifest(make_reader, tmp_path, monkeypatch):
+    """
+    The manifest of generate_corpus_computations.py reads back as it was
+    saved, and starts over when it's for another OUTPUT_VERSION. Files whose
+    digests match it and whose outputs are all there are skipped, and the
+    rest are queued up to be processed again.
+    """
+
+    manifest_path = str(tmp_path / 'manifest.pickle')
+    assert generate_corpus_computations.load_manifest(manifest_path) == {}
+
+    generate_corpus_computations.save_manifest(manifest_path, {'a.json': b'digest'})
+    assert generate_corpus_computations.load_manifest(manifest_path) == {'a.json': b'digest'}
+
+    with monkeypatch.context() as patch:
+        patch.setattr(generate_corpus_computations, 'OUTPUT_VERSION', generate_corpus_computations.OUTPUT_VERSION + 1)
+        assert generate_corpus_computations.load_manifest(manifest_path) == {}
+
+    reader = make_reader()
+    fileids = reader.fileids()[:4]
+    output_directory = str(tmp_path / 'precomputed')
+
+    # Record every file as finished, with all its outputs written.
+    manifest = {}
+    for fileid in fileids:
+        with open(os.path.join(reader.root, fileid), encoding='utf8') as parse_file:
+            manifest[fileid] = CORD19Document(fileid, parse_file.read()).digest
+
+        for location in generate_corpus_computations.output_locations(output_directory, fileid, False, False).values():
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            open(location, 'wb').close()
+
+    # Then make the second file's digest stale, lose an output of the third, and forget the fourth.
+    manifest[fileids[1]] = b'stale'
+    os.remove(generate_corpus_computations.output_locations(output_directory, fileids[2], False, False)['words'])
+    del manifest[fileids[3]]
+
+    document_queue = queue.Queue()
+    counts = {'processed': 0, 'skipped': 0}
+    errors = []
+    generate_corpus_computations.read_documents(
+        reader, fileids, reader.metadata(fileids), manifest, output_directory, False, False, document_queue, counts,
+        errors, threading.Event())
+
+    queued_items = [document_queue.get() for i in range(document_queue.qsize())]
+    assert [item[0] for item in queued_items[:-1]] == fileids[1:]
+    assert queued_items[-1] is None
+    assert counts == {'processed': 0, 'skipped': 1}
+    assert errors == []
+
+
+def test_pipeline(corpus_root, tmp_path, monkeypatch):
+    """
+    The pipeline of generate_corpus_computations.py writes the outputs of
+    every file and skips them on the next run. An error in the reading stage
+    or in a worker is raised instead of leaving the pipeline waiting, and the
+    manifest is saved either way.
+    """
+
+    root = str(tmp_path / 'corpus')
+    shutil.copytree(corpus_root, root)
+    output_directory = str(tmp_path / 'precomputed')
+    manifest_path = str(tmp_path / 'manifest.pickle')
+    monkeypatch.setattr(generate_corpus_computations, 'queue_timeout', 0.1)
+
+    def precompute():
+
+        # Run the pipeline in a thread, so it failing to stop fails the test instead of hanging it.
+        executor = ThreadPoolExecutor(1)
+        try:
+            return executor.submit(
+                generate_corpus_computations.precompute, root, output_directory, manifest_path, workers=2,
+                sent_tokenizer=PunktSentenceTokenizer(), cache_dir=str(tmp_path / 'cache'),
+            ).result(timeout=120)
+        finally:
+            executor.shutdown(wait=False)
+
+    fileids = CORD19CorpusReader(root, r'.*\.json', prefer_pmc_parses=True, cache_dir=str(tmp_path / 'cache')).fileids()
+
+    assert precompute() == {'processed': len(fileids), 'skipped': 0}
+    assert set(generate_corpus_computations.load_manifest(manifest_path)) == set(fileids)
+    assert precompute() == {'processed': 0, 'skipped': len(fileids)}
+
+    # A file that isn't JSON fails in a worker.
+    with open(os.path.join(root, fileids[3]), 'w', encoding='utf8') as parse_file:
+        parse_file.write('{"paper_id": ')
+    os.remove(manifest_path)
+
+    with pytest.raises(ValueError):
+        precompute()
+    assert os.path.exists(manifest_path)
+    assert fileids[3] not in generate_corpus_computations.load_manifest(manifest_path)
+
+    # A file that isn't UTF-8 fails in the reading stage.
+    with open(os.path.join(root, fileids[3]), 'wb') as parse_file:
+        parse_file.write(b'{"paper_id": "\xff"}')
+    os.remove(manifest_path)
+
+    with pytest.raises(RuntimeError) as error_info:
+        precompute()
+    assert isinstance(error_info.value.__cause__, UnicodeDecodeError)
+    assert os.path.exists(manifest_path)
+    assert fileids[3] not in generate_corpus_computations.load_manifest(manifest_path)
+
+
+def test_token_ids(make_reader):
+    """
+    The token IDs decode to the words and sentences of sents().
+    """
+
+    reader = make_reader()
+    reader.build_token_ids(workers=2)
+    vocabulary = reader.vocabulary()
+    fileids = reader.fileids()
+
+    def decode(word_ids):
+        return [vocabulary[word_id] for word_id in word_ids]
+
+    sents = list(reader.sents())
+    assert decode(reader.word_ids()) == [word for sentence in sents for word in sentence]
+    assert [decode(sentence) for sentence in reader.sent_ids()] == sents
+    assert decode(reader.word_ids(fileids[2])) == [word for sentence in reader.sents(fileids[2]) for word in sentence]
+    assert [decode(sentence) for sentence in reader.sent_ids(fileids[1:3])] == list(reader.sents(fileids[1:3]))
+    assert len(vocabulary) == len(set(vocabulary))
+
+    # Another reader loads the same token IDs from the cache directory.
+    assert list(make_reader().word_ids()) == list(reader.word_ids())
+
+
+def test_freq_dist(make_reader):
+    """
+    freq_dist() counts the words of words(), with or without workers, and
+    counts them again from the cache without tokenizing.
+    """
+
+    reader = make_reader()
+    fileids = reader.fileids()
+    words = list(reader.words())
+
+    assert reader.freq_dist() == FreqDist(word.lower() for word in words)
+    assert reader.freq_dist(workers=2) == FreqDist(word.lower() for word in words)
+    assert reader.freq_dist(fileids[0], lower=False) == FreqDist(reader.words(fileids[0]))
+    assert reader.freq_dist(stopwords={'the', '.'}) == FreqDist(
+        word.lower() for word in words if word.lower() not in {'the', '.'})
+
+    # Work out the cache keys, and then take away the word tokenizer, so the counts have to come from the cache.
+    cached_reader = make_reader()
+    cached_reader._tokenizer_fingerprints('counts')
+    cached_reader._word_tokenizer = UnusedTokenizer()
+    assert cached_reader.freq_dist(fileids[2:]) == FreqDist(word.lower() for word in reader.words(fileids[2:]))
+
+
+def test_section_blocks(make_reader, tmp_path):
+    """
+    Reading sents() and paras() through from the start doesn't store where
+    their sections start, but once a file's length has been found, it and
+    the sentences in each section are known, so indexing sents() and paras()
+    only tokenizes the section holding the token.
+    """
+
+    plain_reader = make_reader(cache_name='plain', token_cache=True)
+    sents = list(plain_reader.sents())
+    paras = list(plain_reader.paras())
+
+    # Iterating doesn't ask the length, unlike list().
+    reader = make_reader()
+    fileids = reader.fileids()
+    assert [sentence for sentence in reader.sents()] == sents
+    assert [paragraph for paragraph in reader.paras(fileids[:3])] == list(plain_reader.paras(fileids[:3]))
+
+    # Neither the sequential passes nor the token cache store the sections.
+    assert not os.path.exists(str(tmp_path / 'cache' / 'sections'))
+    assert not os.path.exists(str(tmp_path / 'plain' / 'sections'))
+
+    # Finding the length reads the files through, and stores them.
+    assert list(make_reader().sents()) == sents
+    assert os.path.exists(str(tmp_path / 'cache' / 'sections'))
+
+    # Another reader finds the lengths from the cached block offsets.
+    cached_reader = make_reader()
+    tokenize_section = cached_reader._tokenize_section
+    cached_reader._tokenize_section = None
+    assert len(cached_reader.sents()) == len(sents)
+    assert len(cached_reader.paras()) == len(paras)
+
+    # Count the sections that get tokenized.
+    sections = []
+
+    def counted_tokenize_section(section):
+        sections.append(section)
+        return tokenize_section(section)
+
+    cached_reader._tokenize_section = counted_tokenize_section
+
+    for index in (0, len(sents) // 3, len(sents) - 1):
+        del sections[:]
+        assert cached_reader.sents()[index] == sents[index]
+        assert len(sections) == 1
+    for index in (1, len(paras) // 2):
+        del sections[:]
+        assert cached_reader.paras()[index] == paras[index]
+        assert len(sections) == 1
+
+
+def test_metadata_index(make_reader, corpus_root, tmp_path, monkeypatch, capsys):
+    """
+    metadata.csv is parsed once into an index in the cache directory, which
+    later readers use for the fileids, metadata(), and statistics() until
+    metadata.csv is touched or resized. A row with several PDF parses is
+    filed under each of them.
+    """
+
+    root = str(tmp_path / 'corpus')
+    shutil.copytree(corpus_root, root)
+    metadata_path = os.path.join(root, 'metadata.csv')
+
+    with open(metadata_path, newline='', encoding='utf8') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+
+    def write_rows(rows):
+        with open(metadata_path, 'w', newline='', encoding='utf8') as csv_file:
+            csv_writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+            csv_writer.writeheader()
+            csv_writer.writerows(rows)
+
+    # Give the first paper a second PDF parse.
+    first_parse = rows[0]['pdf_json_files']
+    second_parse = first_parse.replace('.json', '_2.json')
+    shutil.copy(os.path.join(root, first_parse), os.path.join(root, second_parse))
+    rows[0]['pdf_json_files'] = first_parse + '; ' + second_parse
+    write_rows(rows)
+
+    # Count how many times metadata.csv is parsed.
+    from_csv = CORD19MetadataIndex.from_csv.__func__
+    parse_count = [0]
+
+    def counting_from_csv(cls, path, encoding):
+        parse_count[0] += 1
+        return from_csv(cls, path, encoding)
+
+    monkeypatch.setattr(CORD19MetadataIndex, 'from_csv', classmethod(counting_from_csv))
+
+    reader = make_reader(root=root)
+    metadata = reader.metadata([first_parse, second_parse])
+    assert metadata[first_parse] == metadata[second_parse] == [rows[0]]
+    assert parse_count[0] == 1
+
+    # Another reader with the same cache directory doesn't parse metadata.csv again.
+    reader = make_reader(root=root)
+    assert reader.metadata(first_parse)[first_parse] == [rows[0]]
+    reader.statistics()
+    assert 'Rows: %d' % len(rows) in capsys.readouterr().out
+    assert parse_count[0] == 1
+
+    # Touching metadata.csv makes the index stale.
+    file_stat = os.stat(metadata_path)
+    os.utime(metadata_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10 ** 9))
+    make_reader(root=root).metadata()
+    assert parse_count[0] == 2
+
+    # So does resizing it, even if its modification time stays the same.
+    file_stat = os.stat(metadata_path)
+    write_rows(rows + [dict(rows[1], cord_uid='uid99999')])
+    os.utime(metadata_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+    reader = make_reader(root=root)
+    assert len(reader.metadata(fileids_only=False)) == len(rows) + 1
+    assert parse_count[0] == 3
+
+
+def test_compact_metadata(make_reader):
+    """
+    The compact rows of metadata() read the same as the dictionaries, through
+    indexing, keys(), get(), and dict(), and can't be changed.
+    """
+
+    reader = make_reader()
+    fileids = reader.fileids()
+
+    for (rows, compact_rows) in [
+        (reader.metadata(fileids[:5]), reader.metadata(fileids[:5], compact=True)),
+        (reader.metadata(fileids_only=False), reader.metadata(fileids_only=False, compact=True)),
+    ]:
+        assert list(compact_rows) == list(rows)
+
+        for (key, key_rows) in rows.items():
+            assert len(compact_rows[key]) == len(key_rows) > 0
+
+            for (row, compact_row) in zip(key_rows, compact_rows[key]):
+                assert list(compact_row.keys()) == list(row.keys())
+                assert [compact_row[fieldname] for fieldname in row] == list(row.values())
+                assert [compact_row.get(fieldname) for fieldname in row] == list(row.values())
+                assert compact_row.get('no_such_column', 'default') == 'default'
+                assert dict(compact_row) == row
+
+    compact_row = reader.metadata(fileids[0], compact=True)[fileids[0]][0]
+    with pytest.raises(TypeError):
+        compact_row['title'] = 'Changed'
+    with pytest.raises(TypeError):
+        del compact_row['title']
+    with pytest.raises(AttributeError):
+        compact_row.title = 'Changed'
+
+
+def test_select(make_reader):
+    """
+    select() and group_counts() agree with going through every metadata row.
+    """
+
+    reader = make_reader()
+    metadata = reader.metadata()
+
+    def matching(predicate):
+        return [fileid for fileid in reader.fileids() if any(predicate(row) for row in metadata[fileid])]
+
+    queries = [
+        (dict(publish_time=('2020-02', '2020-12')), lambda row: '2020-02' <= row['publish_time'][:7] <= '2020-12'),
+        (dict(journal='Nature'), lambda row: row['journal'] == 'Nature'),
+        (dict(journal=['Nature', 'Lancet'], license='cc-by'),
+         lambda row: row['journal'] in ('Nature', 'Lancet') and row['license'] == 'cc-by'),
+        (dict(source_x='PMC', has_pdf=True), lambda row: row['source_x'] == 'PMC' and bool(row['pdf_json_files'])),
+        (dict(has_pmc=False), lambda row: not row['pmc_json_files']),
+        (dict(has_pdf=True, has_pmc=True, publish_time=('2021', None)),
+         lambda row: row['pdf_json_files'] and row['pmc_json_files'] and row['publish_time'] >= '2021'),
+    ]
+
+    for (criteria, predicate) in queries:
+        assert reader.select(**criteria) == matching(predicate) != []
+    assert reader.select(journal='Nature', fileids=reader.fileids()[:5]) == [
+        fileid for fileid in matching(lambda row: row['journal'] == 'Nature') if fileid in reader.fileids()[:5]]
+
+    rows = [row for fileid in metadata for row in metadata[fileid]]
+    assert reader.group_counts('journal') == collections.Counter(row['journal'] for row in rows)
+    assert reader.group_counts('publish_time', key=lambda value: value[:4]) == collections.Counter(
+        row['publish_time'][:4] for row in rows)
+
+    with pytest.raises(ValueError):
+        reader.select(no_such_column='x')
+
+
+def test_fileids_manifest(make_reader, corpus_root, tmp_path):
+    """
+    A reader resolves the same fileids from the cached manifest without
+    loading metadata.csv, and notices when the corpus changes.
+    """
+
+    root = str(tmp_path / 'corpus')
+    shutil.copytree(corpus_root, root)
+
+    fileids = make_reader(root=root).fileids()
+    reader = make_reader(root=root)
+    assert reader.fileids() == fileids
+    assert reader._metadata_index is None
+    assert reader.startup_time() > 0
+
+    # Add a parse file, which every fileid is taken from when both parses are preferred.
+    all_fileids = make_reader(root=root, prefer_pmc_parses=True).fileids()
+    shutil.copy(os.path.join(root, fileids[0]), os.path.join(root, 'document_parses', 'pdf_json', 'added.json'))
+    assert make_reader(root=root, prefer_pmc_parses=True).fileids() == sorted(
+        all_fileids + ['document_parses/pdf_json/added.json'])
+
+    # Change metadata.csv, so the preferences have to be resolved again.
+    with open(os.path.join(root, 'metadata.csv'), 'a', encoding='utf8') as csv_file:
+        csv_file.write('\n')
+    reader = make_reader(root=root)
+    assert reader.fileids() == fileids
+    assert reader._metadata_index is not None
+
+
+def test_citation_graph(make_reader):
+    """
+    cites(), cited_by(), and most_cited() agree with matching the DOIs in
+    the citations of each file to metadata.csv.
+    """
+
+    reader = make_reader()
+    reader.build_citation_graph(workers=2)
+    metadata = reader.metadata()
+
+    # Match each paper's cited DOIs to cord_uids.
+    cord_uids = {row['doi']: row['cord_uid'] for fileid in metadata for row in metadata[fileid]}
+    cites = {}
+    cited_by = collections.defaultdict(set)
+    for fileid in reader.fileids():
+        cord_uid = metadata[fileid][0]['cord_uid']
+        cites[cord_uid] = {cord_uids[entry['other_ids']['DOI'][0]] for entry in reader.citations(fileid)[fileid].values()}
+        for cited_cord_uid in cites[cord_uid]:
+            cited_by[cited_cord_uid].add(cord_uid)
+
+    graph_reader = make_reader()
+    for fileid in graph_reader.fileids():
+        cord_uid = metadata[fileid][0]['cord_uid']
+        assert set(graph_reader.cites(fileid)) == cites[cord_uid]
+        assert sorted(graph_reader.cites(cord_uid)) == sorted(graph_reader.cites(fileid))
+        assert set(graph_reader.cited_by(cord_uid)) == cited_by[cord_uid]
+
+    most_cited = graph_reader.most_cited(3)
+    assert [count for (cord_uid, count) in most_cited] == sorted((len(citing) for citing in cited_by.values()),
+                                                                  reverse=True)[:3]
+    assert all(len(cited_by[cord_uid]) == count for (cord_uid, count) in most_cited)
+
+
+def test_prefetch(make_reader):
+    """
+    Reading documents ahead gives the same tokens, and every document
+    iterated over is one that was read ahead.
+    """
+
+    plain_reader = make_reader(cache_name='plain')
+    fileids = plain_reader.fileids()
+
+    reader = make_reader(prefetch=4, prefetch_threads=2, document_cache_size=2)
+    assert list(reader.words()) == list(plain_reader.words())
+    stats = reader.prefetch_stats()
+    assert stats['hits'] == len(fileids)
+    assert stats['misses'] == 0
+
+    assert list(reader.sents()) == list(plain_reader.sents())
+    assert list(reader.paras(fileids[3:7])) == list(plain_reader.paras(fileids[3:7]))
+
+    undecoded_reader = make_reader(prefetch=2, prefetch_decode=False, workers=2, cache_name='undecoded')
+    assert list(undecoded_reader.words()) == list(plain_reader.words())
+
+    # Documents still being read count against the budget of bytes, so with a budget smaller than any file, only one
+    # is read ahead at a time. Its share is given back once it's used.
+    small_reader = make_reader(prefetch=4, prefetch_bytes=1, cache_name='small')
+    prefetcher = small_reader._prefetcher
+    prefetcher.schedule(fileids)
+    assert len(prefetcher._futures) == 1
+    assert prefetcher._buffered_bytes == int(
+        os.path.getsize(os.path.join(small_reader.root, fileids[0])) * prefetcher.DECODED_SIZE_RATIO)
+
+    assert list(small_reader.words()) == list(plain_reader.words())
+    assert small_reader.prefetch_stats()['hits'] == len(fileids)
+    assert prefetcher._buffered_bytes == 0
+
+    with pytest.raises(ValueError):
+        plain_reader.prefetch_stats()
+
+
+def test_profile(make_reader):
+    """
+    While a reader is profiled, each stage of reading the corpus counts the
+    calls that go through it and tells the callbacks, and once profiling is
+    turned off nothing more is counted.
+    """
+
+    # Prefer both parses, so metadata.csv isn't parsed until metadata() needs it.
+    reader = make_reader(prefer_pmc_parses=True)
+    fileids = reader.fileids()
+
+    with pytest.raises(ValueError):
+        reader.profile_stats()
+
+    called_stages = []
+    profile = reader.profile(callback=lambda stage, seconds, byte_count: called_stages.append(stage))
+    assert all(counters['calls'] == 0 for counters in reader.profile_stats().values())
+
+    text = reader.raw(fileids[0])
+    list(reader.words(fileids[1]))
+    list(reader.sents(fileids[2]))
+    reader.citations(fileids[3])
+    reader.metadata(fileids[4])
+
+    stats = reader.profile_stats()
+    for stage in ('open', 'json', 'sentences', 'words', 'csv', 'raw', 'citations', 'metadata', 'blocks'):
+        assert stats[stage]['calls'] > 0, stage
+    assert stats['raw'] == dict(stats['raw'], calls=1, bytes=len(text))
+    assert stats['metadata']['calls'] == stats['csv']['calls'] == 1
+    assert collections.Counter(called_stages) == {stage: counters['calls'] for (stage, counters) in stats.items()
+                                                  if counters['calls'] > 0}
+
+    # The same profile keeps adding up while profiling stays on.
+    assert reader.profile() is profile
+    reader.raw(fileids[0])
+    assert reader.profile_stats()['raw']['calls'] == 2
+
+    # Once it's off, nothing more is counted or called back.
+    called_stage_count = len(called_stages)
+    stats = profile.stats()
+    assert reader.profile(False) is None
+    reader.raw(fileids[5])
+    list(reader.sents(fileids[6]))
+    reader.metadata(fileids[7])
+    assert profile.stats() == stats
+    assert len(called_stages) == called_stage_count
+
+    with pytest.raises(ValueError):
+        reader.profile_stats()
+
+
+def test_span_tokenizer(make_reader):
+    """
+    The batched tokenizer gives the same sentences and words as tokenizing
+    each sentence of each section, and its offsets slice them out of the text.
+    """
+
+    word_tokenizer = WordPunctTokenizer()
+    sent_tokenizer = PunktSentenceTokenizer()
+    span_tokenizer = CORD19SpanTokenizer(word_tokenizer, sent_tokenizer)
+    assert CORD19SpanTokenizer.supports(word_tokenizer, sent_tokenizer)
+    assert not CORD19SpanTokenizer.supports(TreebankWordTokenizer(), sent_tokenizer)
+
+    # Made up sections, full of periods, quotes, and whitespace.
+    random_generator = random.Random(1)
+    alphabet = list('abc XYZ..!?)("\'\n\t;:-\u00e91') + ['Dr.', 'e.g.', ' ', 'word', 'The']
+
+    for trial in range(300):
+        sections = [
+            ''.join(random_generator.choice(alphabet) for i in range(random_generator.randint(0, 60)))
+            for j in range(random_generator.randint(0, 5))
+        ]
+        paragraphs = [[word_tokenizer.tokenize(sentence) for sentence in sent_tokenizer.tokenize(section)]
+                      for section in sections]
+
+        assert span_tokenizer.tokenize(sections).paragraphs() == paragraphs
+
+        # The words are only sliced out of the text once they're asked for.
+        token_spans = span_tokenizer.tokenize(sections, offsets=True)
+        assert token_spans._sentences is None
+        words = [word for paragraph in paragraphs for sentence in paragraph for word in sentence]
+        bounds = token_spans.token_bounds
+        assert [token_spans.text[bounds[2 * i]:bounds[2 * i + 1]] for i in range(len(bounds) // 2)] == words
+        assert token_spans.paragraphs() == paragraphs
+
+        # The spans are a view over the offsets, which indexes like the list of them.
+        word_spans = list(token_spans.word_spans())
+        assert [token_spans.section_text(section)[start:end] for (section, start, end) in word_spans] == words
+        assert [token_spans.word_spans()[i] for i in range(len(word_spans))] == word_spans
+
+    # The reader's sentences are the same with the batched tokenizer as with the per-sentence loop.
+    reader = make_reader()
+    loop_reader = make_reader(cache_name='loop')
+    loop_reader._span_tokenizer = False
+    fileids = reader.fileids()
+    assert list(reader.sents()) == list(loop_reader.sents())
+    assert list(reader.paras(fileids[:4])) == list(loop_reader.paras(fileids[:4]))
+    assert isinstance(reader._span_tokenizer, CORD19SpanTokenizer)
+
+
+@pytest.mark.parametrize('word_tokenizer', [WordPunctTokenizer(), TreebankWordTokenizer()])
+def test_spans(make_reader, word_tokenizer):
+    """
+    The offsets from word_spans() and sent_spans() slice the words and
+    sentences of sents() out of the text of their sections.
+    """
+
+    reader = make_reader(word_tokenizer=word_tokenizer)
+    fileids = reader.fileids()
+
+    for fileid in fileids[:6]:
+        document = reader.document(fileid)
+
+        def section_text(section_number):
+            (part, number) = reader.section_parts(fileid)[section_number]
+            return document.title if (part == 'title') else getattr(document, part)[number]['text']
+
+        sents = list(reader.sents(fileid))
+        sent_spans = reader.sent_spans(fileid)
+        assert len(sent_spans) == len(sents)
+        assert [section_text(section)[start:end] for (section, start, end) in sent_spans] == [
+            sentence for section in range(len(reader.section_parts(fileid)))
+            for sentence in reader._sent_tokenizer.tokenize(section_text(section))]
+
+        # Treebank changes some quotes as it tokenizes, so only the number of its words is the same.
+        word_spans = reader.word_spans(fileid)
+        words = [section_text(section)[start:end] for (section, start, end) in word_spans]
+        if (isinstance(word_tokenizer, WordPunctTokenizer)):
+            assert words == [word for sentence in sents for word in sentence]
+        else:
+            assert len(words) == sum(len(sentence) for sentence in sents)
+
+        assert list(reader.token_spans(fileid).word_spans()) == list(word_spans)
+
+    # Each file's spans are let go of once the view moves on to the next file.
+    word_spans = reader.word_spans()
+    assert list(reader.word_spans(workers=2)) == list(word_spans)
+    assert all(view._cache[2] is None for view in word_spans._pieces[:-1])
+    assert list(reader.sent_spans(fileids[:3], workers=2)) == list(reader.sent_spans(fileids[:3]))
+
+
+def test_iter_documents(make_reader):
+    """
+    iter_documents() gives a record for each file, in order, in batches if
+    asked, with the same tokens as the matching views.
+    """
+
+    reader = make_reader()
+    fileids = reader.fileids()
+    metadata = reader.metadata(fileids)
+
+    records = list(reader.iter_documents())
+    assert [record.fileid for record in records] == fileids
+    assert [record.cord_uid for record in records] == [metadata[fileid][0]['cord_uid'] for fileid in fileids]
+    assert records[0].title == reader.document(fileids[0]).title
+    assert [text for (part, name, text) in records[0].sections] == [
+        section['text'] for section in reader.document(fileids[0]).abstract + reader.document(fileids[0]).body_text]
+
+    batches = list(reader.iter_documents(batch_size=5, tokens='sents'))
+    assert [len(batch) for batch in batches] == [5, 5, len(fileids) - 10]
+    assert [sentence for batch in batches for record in batch for sentence in record.tokens] == list(reader.sents())
+
+    batches = list(reader.iter_documents(batch_size=4, tokens='words', workers=2))
+    assert [word for batch in batches for record in batch for word in record.tokens] == list(reader.words())
+
+    records = list(reader.iter_documents(fileids[:3], tokens='paras'))
+    assert [record.tokens for record in records] == [list(reader.paras(fileid)) for fileid in fileids[:3]]
+
+    with pytest.raises(ValueError):
+        reader.iter_documents(tokens='lemmae')
+    with pytest.raises(ValueError):
+        reader.iter_documents(batch_size=0)